@@ -1,3 +1,7 @@
 """
 Инициализация backend пакета.
-"""
\ No newline at end of file
+"""
+import time
+
+# Точка отсчёта отчёта о запуске (backend.startup)
+IMPORT_STARTED = time.perf_counter()
@@ -1,20 +1,91 @@
 """
 Конфигурация приложения.
 """
-import os
-from pydantic_settings import BaseSettings
-from dotenv import load_dotenv
-
-load_dotenv()
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     """
     Класс настроек приложения.
+
+    Значения берутся из переменных окружения, затем из файла .env;
+    .env читается при создании настроек, без load_dotenv() при импорте.
     """
-    OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
-    OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o")
-    OPENAI_VISION_MODEL: str = os.getenv("OPENAI_VISION_MODEL", "gpt-4o")
-    API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
-    API_PORT: int = int(os.getenv("API_PORT", "8000"))
+    model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
+
+    OPENAI_API_KEY: str = ""
+    OPENAI_MODEL: str = "gpt-4o"
+    OPENAI_VISION_MODEL: str = "gpt-4o"
+    OPENAI_RPM: int = 500
+    OPENAI_TPM: int = 30000
+    OPENAI_MAX_IN_FLIGHT: int = 8
+    OPENAI_MAX_RETRIES: int = 5
+    OPENAI_RETRY_BASE_DELAY: float = 1.0
+    OPENAI_RETRY_MAX_DELAY: float = 60.0
+    OPENAI_COMPLETION_TOKENS: int = 800
+    OPENAI_IMAGE_TOKENS: int = 1100
+    API_HOST: str = "0.0.0.0"
+    API_PORT: int = 8000
+    BROWSER_POOL_SIZE: int = 2
+    BROWSER_MAX_USES: int = 50
+    BROWSER_LEASE_TIMEOUT: float = 30.0
+    PARSER_PAGE_LOAD_TIMEOUT: float = 20.0
+    PARSER_READY_STRATEGY: str = "content"
+    PARSER_READY_TIMEOUT: float = 8.0
+    PARSER_NETWORK_IDLE_MS: int = 500
+    PARSER_MIN_PARAGRAPH_LENGTH: int = 50
+    PARSER_HTTP_ENABLED: bool = True
+    PARSER_HTTP_TIMEOUT: float = 10.0
+    PARSER_HTTP_MAX_BYTES: int = 2000000
+    PARSER_HTTP_CACHE_DIR: str = "http_cache"
+    PARSER_HTTP_CACHE_MAX_MB: int = 200
+    PARSER_MAX_WORKERS: int = 4
+    PARSER_EXTRACT_FIELDS: str = "title,h1,first_paragraph"
+    PARSER_MAX_HEADINGS: int = 30
+    CRAWL_MAX_PAGES: int = 30
+    CRAWL_PAGE_LIMIT: int = 500
+    CRAWL_MAX_DEPTH: int = 2
+    CRAWL_CONCURRENCY: int = 8
+    CRAWL_HOST_CONCURRENCY: int = 2
+    CRAWL_HOST_DELAY: float = 0.5
+    CRAWL_USER_AGENT: str = "CompetitorMonitor"
+    CRAWL_MAX_SITEMAPS: int = 10
+    IMAGE_MAX_UPLOAD_MB: int = 20
+    IMAGE_MAX_SIDE: int = 1536
+    IMAGE_FORMAT: str = "JPEG"
+    IMAGE_QUALITY: int = 85
+    IMAGE_MAX_PIXELS: int = 50000000
+    IMAGE_SIMILAR_MAX_DISTANCE: int = 10
+    DEEP_CHUNK_TOKENS: int = 1500
+    DEEP_MAX_CHUNKS: int = 20
+    DEEP_CONCURRENCY: int = 4
+    ANALYSIS_CACHE_MAX_ITEMS: int = 1000
+    ANALYSIS_CACHE_TTL: float = 86400.0
+    ANALYSIS_CACHE_DIR: str = ""
+    ANALYSIS_CACHE_MAX_DISK_MB: int = 100
+    SIMILARITY_ENABLED: bool = True
+    SIMILARITY_THRESHOLD: float = 0.8
+    SIMILARITY_NUM_PERM: int = 64
+    SIMILARITY_SHINGLE_SIZE: int = 3
+    SIMILARITY_MIN_SHINGLES: int = 5
+    SIMILARITY_MAX_ITEMS: int = 10000
+    HISTORY_DB_PATH: str = "history.db"
+    HISTORY_RETENTION_DAYS: int = 180
+    HISTORY_MAX_ITEMS: int = 0
+    BATCH_CONCURRENCY: int = 4
+    BATCH_MAX_CONCURRENCY: int = 16
+    BATCH_MAX_ITEMS: int = 500
+    JOBS_DB_PATH: str = "jobs.db"
+    JOB_WORKERS: int = 2
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_DELAY: float = 5.0
+    JOB_LEASE_SECONDS: float = 300.0
+    JOB_POLL_INTERVAL: float = 1.0
+    MONITORS_DB_PATH: str = "monitors.db"
+    MONITOR_MIN_INTERVAL: int = 60
+    MONITOR_CONCURRENCY: int = 2
+    MONITOR_POLL_INTERVAL: float = 5.0
+    SHARED_STORE_URL: str = ""
+    SHARED_STORE_FACTORY: str = ""
+    SHARED_STORE_MAX_ITEMS: int = 100000
 
 settings = Settings()
@@ -0,0 +1,41 @@
+"""
+Зависимости FastAPI: сервисы создаются при первом запросе, которому они нужны.
+
+Провайдеры асинхронные, чтобы FastAPI вызывал их прямо в event loop, а
+не переходил на каждый запрос в пул потоков, как для обычных функций.
+"""
+from backend.services.analysis_service import AnalysisService, get_analysis_service
+from backend.services.crawl_service import CrawlService, get_crawl_service
+from backend.services.history_service import HistoryService, get_history_service
+from backend.services.job_service import JobService, get_job_service
+from backend.services.monitor_service import MonitorService, get_monitor_service
+from backend.services.openai_service import OpenAIService, get_openai_service
+from backend.services.parser_service import ParserService, get_parser_service
+
+
+async def analysis_service() -> AnalysisService:
+    return get_analysis_service()
+
+
+async def crawl_service() -> CrawlService:
+    return get_crawl_service()
+
+
+async def history_service() -> HistoryService:
+    return get_history_service()
+
+
+async def job_service() -> JobService:
+    return get_job_service()
+
+
+async def monitor_service() -> MonitorService:
+    return get_monitor_service()
+
+
+async def openai_service() -> OpenAIService:
+    return get_openai_service()
+
+
+async def parser_service() -> ParserService:
+    return get_parser_service()
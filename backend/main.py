@@ -2,22 +2,44 @@
 Главный модуль FastAPI приложения.
 Мультимодальный ассистент мониторинга конкурентов.
 """
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import asyncio
+import json
+from datetime import datetime
+from typing import List, Optional
+from fastapi import Depends, FastAPI, UploadFile, File, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from backend.config import settings
+from backend import dependencies
+from backend.middleware import MetricsMiddleware, UploadLimitMiddleware
 from backend.models.schemas import (
+    BatchRequest,
+    CrawlRequest,
+    CrawlResponse,
     TextAnalysisRequest,
     TextAnalysisResponse,
     ImageAnalysisResponse,
     ParseDemoRequest,
     ParseDemoResponse,
-    HistoryResponse
+    HistoryItem,
+    HistoryResponse,
+    HistorySearchHit,
+    HistorySearchResponse,
+    JobRequest,
+    JobStatus,
+    MonitorRequest,
+    MonitorStatus
 )
-from backend.services.openai_service import openai_service
-from backend.services.parser_service import parser_service
-from backend.services.history_service import history_service
+from backend.services.openai_service import OpenAIService
+from backend.services.parser_service import ParserService, get_parser_service
+from backend.services.history_service import HistoryService, get_history_service
+from backend.services.analysis_service import AnalysisService
+from backend.services.crawl_service import CrawlService
+from backend.services.job_service import JobService, get_job_service
+from backend.services.monitor_service import MonitorService, get_monitor_service
+from backend.services.metrics import metrics
+from backend.startup import startup_report
 
 app = FastAPI(
     title="Мониторинг конкурентов",
@@ -35,6 +57,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(
+    UploadLimitMiddleware,
+    max_bytes=settings.IMAGE_MAX_UPLOAD_MB * 1024 * 1024,
+    paths=("/analyze_image",),
+)
+
+app.add_middleware(MetricsMiddleware)
+
 @app.get("/")
 async def root():
     """
@@ -43,93 +73,354 @@ async def root():
     return FileResponse("frontend/index.html")
 
 @app.post("/analyze_text", response_model=TextAnalysisResponse)
-async def analyze_text(request: TextAnalysisRequest):
+async def analyze_text(
+    request: TextAnalysisRequest,
+    analysis_service: AnalysisService = Depends(dependencies.analysis_service),
+):
     """
     Анализирует текст конкурента.
     """
-    if len(request.text) < 10:
-        return TextAnalysisResponse(success=False, error="Текст слишком короткий")
-    analysis = openai_service.analyze_text(request.text)
-    # Сохраняем в историю
-    from backend.models.schemas import HistoryItem
-    import uuid
-    from datetime import datetime
-    history_service.save_history(HistoryItem(
-        id=str(uuid.uuid4()),
-        timestamp=datetime.now(),
-        request_type="text",
-        request_summary=request.text[:50],
-        response_summary=analysis.summary
-    ))
-    return TextAnalysisResponse(success=True, analysis=analysis)
+    return await analysis_service.analyze_text(request.text)
+
+def _sse(events) -> StreamingResponse:
+    """
+    Оборачивает поток событий {"event", "data"} в ответ Server-Sent Events.
+    """
+    async def lines():
+        async for event in events:
+            data = json.dumps(event["data"], ensure_ascii=False, default=str)
+            yield f"event: {event['event']}\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/analyze_text/stream")
+async def analyze_text_stream(
+    request: TextAnalysisRequest,
+    analysis_service: AnalysisService = Depends(dependencies.analysis_service),
+):
+    """
+    Анализирует текст конкурента с потоковой выдачей (SSE): событие
+    section на каждую готовую секцию анализа, затем done или error.
+    """
+    return _sse(analysis_service.stream_text(request.text))
 
 @app.post("/analyze_image", response_model=ImageAnalysisResponse)
-async def analyze_image(file: UploadFile = File(...)):
+async def analyze_image(
+    file: UploadFile = File(...),
+    analysis_service: AnalysisService = Depends(dependencies.analysis_service),
+):
     """
-    Анализирует изображение конкурента.
+    Анализирует изображение конкурента. Перед анализом изображение
+    уменьшается и перекодируется; размер загрузки ограничен IMAGE_MAX_UPLOAD_MB.
     """
     if file.content_type not in ["image/png", "image/jpeg", "image/jpg", "image/gif", "image/webp"]:
         return ImageAnalysisResponse(success=False, error="Недопустимый формат изображения")
+    # Размер тела уже ограничен UploadLimitMiddleware
     image_bytes = await file.read()
-    analysis = openai_service.analyze_image(image_bytes)
-    from backend.models.schemas import HistoryItem
-    import uuid
-    from datetime import datetime
-    history_service.save_history(HistoryItem(
-        id=str(uuid.uuid4()),
-        timestamp=datetime.now(),
-        request_type="image",
-        request_summary=file.filename,
-        response_summary=analysis.description
-    ))
-    return ImageAnalysisResponse(success=True, analysis=analysis)
+    return await analysis_service.analyze_image(image_bytes, file.filename, file.content_type)
 
 @app.post("/parse_demo", response_model=ParseDemoResponse)
-async def parse_demo(request: ParseDemoRequest):
-    """
-    Парсит сайт и анализирует контент.
-    """
-    parsed = parser_service.parse(request.url)
-    if parsed["error"]:
-        return ParseDemoResponse(success=False, error=parsed["error"])
-    # Анализируем текст из title, h1, первого абзаца
-    text = f"{parsed['title']} {parsed['h1']} {parsed['first_paragraph']}"
-    analysis = openai_service.analyze_text(text)
-    from backend.models.schemas import HistoryItem
-    import uuid
-    from datetime import datetime
-    history_service.save_history(HistoryItem(
-        id=str(uuid.uuid4()),
-        timestamp=datetime.now(),
-        request_type="parse",
-        request_summary=request.url,
-        response_summary=analysis.summary
-    ))
-    return ParseDemoResponse(success=True, parsed=parsed, analysis=analysis)
+async def parse_demo(
+    request: ParseDemoRequest,
+    analysis_service: AnalysisService = Depends(dependencies.analysis_service),
+):
+    """
+    Парсит сайт и анализирует контент. С deep=true анализируется весь
+    текст страницы по фрагментам.
+    """
+    return await analysis_service.parse_and_analyze(request.url, request.deep)
+
+@app.post("/parse_demo/stream")
+async def parse_demo_stream(
+    request: ParseDemoRequest,
+    analysis_service: AnalysisService = Depends(dependencies.analysis_service),
+):
+    """
+    Парсит сайт и анализирует контент с потоковой выдачей (SSE): событие
+    parsed с извлечённым контентом, section на каждую готовую секцию
+    анализа, затем done или error.
+    """
+    return _sse(analysis_service.stream_parse(request.url, request.deep))
+
+@app.post("/crawl", response_model=CrawlResponse)
+async def crawl(request: CrawlRequest, crawl_service: CrawlService = Depends(dependencies.crawl_service)):
+    """
+    Обходит сайт конкурента от стартовой страницы или sitemap.xml по
+    ссылкам того же сайта и анализирует собранный контент. В stats —
+    число страниц, время обхода и страниц в секунду.
+    """
+    return await crawl_service.crawl(request.url, request.max_pages, request.max_depth, request.analyze)
+
+@app.post("/batch")
+async def batch(
+    request: BatchRequest,
+    analysis_service: AnalysisService = Depends(dependencies.analysis_service),
+):
+    """
+    Пакетно анализирует тексты и сайты.
+
+    Ответ — NDJSON: по строке BatchItemResult на каждый элемент, в порядке
+    завершения, без ожидания самого медленного элемента.
+    """
+    total = len(request.texts) + len(request.urls)
+    if total == 0:
+        raise HTTPException(status_code=400, detail="Пустой пакет")
+    if total > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Не больше {settings.BATCH_MAX_ITEMS} элементов в пакете")
+    concurrency = min(request.concurrency or settings.BATCH_CONCURRENCY, settings.BATCH_MAX_CONCURRENCY)
+
+    async def lines():
+        async for result in analysis_service.run_batch(request.texts, request.urls, concurrency):
+            yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/jobs", response_model=JobStatus, status_code=202)
+async def submit_job(request: JobRequest, job_service: JobService = Depends(dependencies.job_service)):
+    """
+    Ставит парсинг с анализом или анализ текста в фоновую очередь.
+    Сразу возвращает задачу с id; результат — через GET /jobs/{id}.
+    """
+    payload = {"text": request.text} if request.kind == "text" else {"url": request.url, "deep": request.deep}
+    job = await job_service.submit_async(request.kind, payload, request.priority, request.max_attempts)
+    return JobStatus(**job)
+
+@app.get("/jobs", response_model=List[JobStatus])
+async def list_jobs(
+    status: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    job_service: JobService = Depends(dependencies.job_service),
+):
+    """
+    Последние фоновые задачи.
+    """
+    jobs = await asyncio.to_thread(job_service.list_jobs, status, limit)
+    return [JobStatus(**job) for job in jobs]
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=60, description="Ждать завершения до N секунд"),
+    job_service: JobService = Depends(dependencies.job_service),
+):
+    """
+    Состояние фоновой задачи. С параметром wait запрос ждёт завершения
+    задачи (long polling) не дольше указанного времени.
+    """
+    if wait:
+        job = await job_service.wait(job_id, wait)
+    else:
+        job = await asyncio.to_thread(job_service.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return JobStatus(**job)
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, job_service: JobService = Depends(dependencies.job_service)):
+    """
+    Отменяет задачу, которая ещё стоит в очереди.
+    """
+    if not await asyncio.to_thread(job_service.cancel, job_id):
+        raise HTTPException(status_code=409, detail="Задача не найдена или уже выполняется")
+    return {"success": True}
+
+@app.post("/monitors", response_model=MonitorStatus)
+async def add_monitor(
+    request: MonitorRequest,
+    monitor_service: MonitorService = Depends(dependencies.monitor_service),
+):
+    """
+    Ставит сайт на мониторинг: страница перепарсивается каждые
+    interval_minutes, а анализ выполняется, только если контент изменился.
+    Повторная регистрация того же URL обновляет настройки.
+    """
+    try:
+        monitor = await monitor_service.add_async(request.url, request.interval_minutes * 60, request.full_text)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return MonitorStatus(**monitor)
+
+@app.get("/monitors", response_model=List[MonitorStatus])
+async def list_monitors(monitor_service: MonitorService = Depends(dependencies.monitor_service)):
+    """
+    Сайты на мониторинге в порядке ближайшей проверки.
+    """
+    monitors = await asyncio.to_thread(monitor_service.list_monitors)
+    return [MonitorStatus(**monitor) for monitor in monitors]
+
+@app.post("/monitors/{monitor_id}/run")
+async def run_monitor(
+    monitor_id: str,
+    monitor_service: MonitorService = Depends(dependencies.monitor_service),
+):
+    """
+    Назначает внеочередную проверку сайта.
+    """
+    if not await monitor_service.run_now_async(monitor_id):
+        raise HTTPException(status_code=404, detail="Монитор не найден")
+    return {"success": True}
+
+@app.delete("/monitors/{monitor_id}")
+async def remove_monitor(
+    monitor_id: str,
+    monitor_service: MonitorService = Depends(dependencies.monitor_service),
+):
+    """
+    Снимает сайт с мониторинга.
+    """
+    if not await asyncio.to_thread(monitor_service.remove, monitor_id):
+        raise HTTPException(status_code=404, detail="Монитор не найден")
+    return {"success": True}
 
 @app.get("/history", response_model=HistoryResponse)
-async def get_history():
+async def get_history(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    request_type: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    history_service: HistoryService = Depends(dependencies.history_service),
+):
     """
-    Возвращает историю последних запросов.
+    Возвращает страницу истории запросов, начиная с последних.
+    Для следующей страницы передайте next_cursor из ответа в параметре cursor.
     """
-    items = history_service.load_history()
-    from backend.models.schemas import HistoryItem
+    try:
+        items, next_cursor, total = await history_service.query_history_async(
+            limit=limit,
+            cursor=cursor,
+            request_type=request_type,
+            date_from=date_from,
+            date_to=date_to,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     result = [HistoryItem(**item) for item in items]
-    return HistoryResponse(items=result, total=len(result))
+    return HistoryResponse(items=result, total=total, next_cursor=next_cursor)
+
+@app.get("/history/search", response_model=HistorySearchResponse)
+async def search_history(
+    q: str = Query(..., min_length=1, description="Слова для поиска (формы слова находятся по основе); «слово*» — поиск по префиксу"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    request_type: Optional[str] = None,
+    history_service: HistoryService = Depends(dependencies.history_service),
+):
+    """
+    Полнотекстовый поиск по сохранённым запросам и анализам
+    (сильные и слабые стороны, УТП, рекомендации, резюме).
+    """
+    hits, total = await history_service.search_history_async(
+        query=q,
+        limit=limit,
+        offset=offset,
+        request_type=request_type,
+    )
+    result = [
+        HistorySearchHit(
+            item=HistoryItem(**{key: hit[key] for key in HistoryItem.model_fields}),
+            snippet=hit["snippet"],
+            rank=hit["rank"],
+        )
+        for hit in hits
+    ]
+    next_offset = offset + limit if offset + limit < total else None
+    return HistorySearchResponse(hits=result, total=total, next_offset=next_offset)
 
 @app.delete("/history")
-async def clear_history():
+async def clear_history(history_service: HistoryService = Depends(dependencies.history_service)):
     """
     Очищает историю запросов.
     """
-    history_service.clear_history()
+    await history_service.clear_history_async()
     return {"success": True, "message": "История очищена"}
 
+@app.get("/parser/stats")
+async def parser_stats(parser_service: ParserService = Depends(dependencies.parser_service)):
+    """
+    Статистика пула браузеров парсера.
+    """
+    return parser_service.stats()
+
+@app.get("/cache/stats")
+async def cache_stats(openai_service: OpenAIService = Depends(dependencies.openai_service)):
+    """
+    Статистика кэша результатов анализа, объединения одинаковых запросов,
+    индекса почти повторов текста (similar) и общего хранилища процессов
+    (shared_store; None, если оно не настроено). Счётчики — этого воркера,
+    shared_store — общий для всех.
+    """
+    shared = openai_service.cache.shared
+    return {
+        **openai_service.cache.stats(),
+        "inflight": openai_service.inflight.stats(),
+        "similar": openai_service.similar.stats(),
+        "shared_store": await asyncio.to_thread(shared.stats) if shared is not None else None,
+    }
+
+@app.get("/openai/stats")
+async def openai_stats(openai_service: OpenAIService = Depends(dependencies.openai_service)):
+    """
+    Статистика ограничителя вызовов модели: очередь, одновременные
+    вызовы, повторы, ответы 429 и время ожидания.
+    """
+    return openai_service.limiter.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """
+    Метрики в текстовом формате Prometheus: длительность запросов по
+    маршрутам, этапы парсинга, вызовы модели и очередь ограничителя,
+    запись истории, кэши и пул браузеров.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/startup")
+async def startup_stats():
+    """
+    Отчёт о запуске: сколько секунд от импорта пакета backend заняли
+    импорт приложения, обработчик startup и первый ответ /health, и
+    когда и за сколько был создан каждый сервис.
+    """
+    return startup_report.report()
+
+@app.on_event("startup")
+async def startup():
+    """
+    Готовит базу истории (схема, перенос history.json) и запускает
+    воркеры фоновых задач и планировщик мониторинга при старте приложения.
+    Сервисы анализа, парсер и клиент модели создаются позже, при первом
+    запросе или первой задаче.
+    """
+    await asyncio.to_thread(get_history_service().initialize)
+    await get_job_service().start()
+    await get_monitor_service().start()
+    startup_report.mark("startup_complete")
+
+@app.on_event("shutdown")
+async def shutdown():
+    """
+    Останавливает мониторинг и воркеры задач и закрывает браузеры пула
+    при остановке приложения.
+    """
+    await get_monitor_service().stop()
+    await get_job_service().stop()
+    parser_service = get_parser_service.existing()
+    if parser_service is not None:
+        parser_service.close()
+
 @app.get("/health")
 async def health_check():
     """
     Проверка работоспособности сервиса.
     """
+    startup_report.mark("first_health")
     return {"status": "healthy", "version": "1.0.0"}
 
 app.mount("/static", StaticFiles(directory="frontend"), name="static")
+
+startup_report.mark("app_imported")
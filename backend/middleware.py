@@ -0,0 +1,112 @@
+"""
+ASGI middleware приложения.
+"""
+import time
+from fastapi import HTTPException
+from backend.services.metrics import metrics
+
+REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds",
+    "Длительность обработки HTTP-запроса до отправки тела ответа целиком",
+    ("method", "route", "status"),
+)
+
+
+class UploadLimitMiddleware:
+    """
+    Ограничивает размер тела запроса для выбранных путей.
+
+    Запрос с заголовком Content-Length больше лимита отклоняется сразу,
+    без чтения тела. Иначе тело считается по мере поступления, и как
+    только лимит превышен, чтение прерывается с ошибкой 413 — файл не
+    буферизуется целиком ни в памяти, ни на диске.
+    """
+    def __init__(self, app, max_bytes: int, paths: tuple):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(send)
+            return
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Исключение поднимается внутри обработчика маршрута
+                    # и превращается в ответ 413 обработчиком HTTPException
+                    raise HTTPException(status_code=413, detail=self._detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    def _detail(self) -> str:
+        return f"Файл больше {self.max_bytes // (1024 * 1024)} МБ"
+
+    async def _reject(self, send):
+        body = ('{"detail": "%s"}' % self._detail()).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+class MetricsMiddleware:
+    """
+    Замеряет длительность HTTP-запросов по маршрутам.
+
+    Метка route — шаблон пути маршрута (/jobs/{job_id}), а не сам путь,
+    чтобы число рядов не росло с числом разных URL. Запросы к
+    подключённым приложениям (Mount, например /static) помечаются
+    префиксом, ненайденные пути — «unmatched». Для потоковых ответов
+    учитывается время до последнего фрагмента.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        root_path = scope.get("root_path", "")
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=self._route(scope, root_path),
+                status=status,
+            )
+
+    @staticmethod
+    def _route(scope, root_path: str) -> str:
+        # Маршрутизатор дописывает найденный маршрут в scope
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        mount_path = scope.get("root_path", "")
+        if mount_path != root_path:
+            return mount_path[len(root_path):]
+        return "unmatched"
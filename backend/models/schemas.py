@@ -2,8 +2,8 @@
 Pydantic схемы для API.
 """
 from datetime import datetime
-from typing import Optional, List
-from pydantic import BaseModel, Field
+from typing import Any, Dict, Literal, Optional, List
+from pydantic import BaseModel, Field, model_validator
 
 class TextAnalysisRequest(BaseModel):
     """
@@ -16,6 +16,43 @@ class ParseDemoRequest(BaseModel):
     Запрос на парсинг URL.
     """
     url: str = Field(..., description="URL для парсинга")
+    deep: bool = Field(False, description="Глубокий режим: анализ всего текста страницы по фрагментам")
+
+class CrawlRequest(BaseModel):
+    """
+    Запрос на обход сайта.
+    """
+    url: str = Field(..., description="Стартовая страница сайта или sitemap.xml")
+    max_pages: Optional[int] = Field(None, ge=1, description="Бюджет загружаемых страниц (по умолчанию CRAWL_MAX_PAGES)")
+    max_depth: Optional[int] = Field(None, ge=0, description="Переходов по ссылкам от стартовых страниц (по умолчанию CRAWL_MAX_DEPTH)")
+    analyze: bool = Field(True, description="Анализировать собранный контент")
+
+class BatchRequest(BaseModel):
+    """
+    Пакетный запрос: тексты для анализа и URL для парсинга с анализом.
+    """
+    texts: List[str] = Field(default_factory=list, description="Тексты для анализа")
+    urls: List[str] = Field(default_factory=list, description="URL для парсинга и анализа")
+    concurrency: Optional[int] = Field(None, ge=1, description="Максимум одновременно обрабатываемых элементов")
+
+class JobRequest(BaseModel):
+    """
+    Запрос на постановку фоновой задачи.
+    """
+    kind: Literal["text", "parse"] = Field(..., description="text — анализ текста, parse — парсинг и анализ сайта")
+    text: Optional[str] = Field(None, min_length=10, description="Текст для анализа (kind=text)")
+    url: Optional[str] = Field(None, description="URL для парсинга (kind=parse)")
+    deep: bool = Field(False, description="Глубокий режим парсинга (kind=parse)")
+    priority: int = Field(0, description="Приоритет: больше — раньше")
+    max_attempts: Optional[int] = Field(None, ge=1, le=10, description="Число попыток")
+
+    @model_validator(mode="after")
+    def check_payload(self):
+        if self.kind == "text" and not self.text:
+            raise ValueError("Для задачи text нужно поле text")
+        if self.kind == "parse" and not self.url:
+            raise ValueError("Для задачи parse нужно поле url")
+        return self
 
 class CompetitorAnalysis(BaseModel):
     """
@@ -43,6 +80,9 @@ class ParsedContent(BaseModel):
     title: str = Field("", description="Title страницы")
     h1: str = Field("", description="Главный заголовок (h1)")
     first_paragraph: str = Field("", description="Первый абзац")
+    meta_description: Optional[str] = Field(None, description="meta description (если включено в PARSER_EXTRACT_FIELDS)")
+    headings: Optional[List[str]] = Field(None, description="Подзаголовки h2/h3 (если включено в PARSER_EXTRACT_FIELDS)")
+    tier: str = Field("", description="Уровень парсинга: http или browser")
     error: Optional[str] = None
 
 class TextAnalysisResponse(BaseModel):
@@ -68,6 +108,49 @@ class ParseDemoResponse(BaseModel):
     success: bool = True
     parsed: Optional[ParsedContent] = None
     analysis: Optional[CompetitorAnalysis] = None
+    chunks: Optional[int] = Field(None, description="Число проанализированных фрагментов (глубокий режим)")
+    error: Optional[str] = None
+
+class CrawledPage(BaseModel):
+    """
+    Страница, загруженная при обходе сайта.
+    """
+    url: str
+    depth: int = Field(..., description="Переходов по ссылкам от стартовой страницы")
+    title: str = ""
+    h1: str = ""
+    first_paragraph: str = ""
+    tier: str = ""
+    duplicate_of: Optional[str] = Field(None, description="Страница с тем же canonical, собранная раньше")
+    error: Optional[str] = None
+
+class CrawlResponse(BaseModel):
+    """
+    Ответ на обход сайта.
+    """
+    success: bool = True
+    pages: List[CrawledPage] = Field(default_factory=list)
+    analysis: Optional[CompetitorAnalysis] = None
+    chunks: Optional[int] = Field(None, description="Число проанализированных фрагментов")
+    stats: Dict[str, Any] = Field(
+        default_factory=dict,
+        description=(
+            "pages (загружено), ok, errors, duplicates, robots (запрещено robots.txt), "
+            "budget (не загружено сверх бюджета), seconds, pages_per_second"
+        ),
+    )
+    error: Optional[str] = None
+
+class BatchItemResult(BaseModel):
+    """
+    Результат обработки одного элемента пакета (строка NDJSON).
+    """
+    index: int = Field(..., description="Номер элемента: сначала тексты, затем URL")
+    kind: str = Field(..., description="Тип элемента: text или url")
+    input: str
+    success: bool = True
+    parsed: Optional[ParsedContent] = None
+    analysis: Optional[CompetitorAnalysis] = None
     error: Optional[str] = None
 
 class HistoryItem(BaseModel):
@@ -79,10 +162,69 @@ class HistoryItem(BaseModel):
     request_type: str
     request_summary: str
     response_summary: str
+    request_payload: Optional[Dict[str, Any]] = Field(None, description="Полные данные запроса")
+    response_payload: Optional[Dict[str, Any]] = Field(None, description="Полный результат анализа")
 
 class HistoryResponse(BaseModel):
     """
-    Ответ со списком истории.
+    Ответ со страницей истории.
     """
     items: List[HistoryItem]
+    total: int = Field(..., description="Общее число записей, подходящих под фильтр")
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы; None — страниц больше нет")
+
+class HistorySearchHit(BaseModel):
+    """
+    Найденный элемент истории.
+    """
+    item: HistoryItem
+    snippet: str = Field("", description="Фрагмент текста с найденными словами в [скобках]")
+    rank: float = Field(0.0, description="Релевантность bm25 (меньше — релевантнее)")
+
+class HistorySearchResponse(BaseModel):
+    """
+    Ответ полнотекстового поиска по истории.
+    """
+    hits: List[HistorySearchHit]
     total: int
+    next_offset: Optional[int] = Field(None, description="Смещение следующей страницы; None — страниц больше нет")
+
+class JobStatus(BaseModel):
+    """
+    Состояние фоновой задачи.
+    """
+    id: str
+    kind: str
+    status: str = Field(..., description="queued, running, succeeded, failed или cancelled")
+    priority: int
+    attempts: int
+    max_attempts: int
+    payload: Dict[str, Any]
+    result: Optional[Dict[str, Any]] = Field(None, description="Ответ анализа (как у /analyze_text или /parse_demo)")
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+class MonitorRequest(BaseModel):
+    """
+    Запрос на мониторинг сайта конкурента.
+    """
+    url: str = Field(..., description="URL сайта")
+    interval_minutes: int = Field(180, ge=1, description="Интервал между проверками в минутах")
+    full_text: bool = Field(False, description="Отслеживать изменения всего текста, а не только title, h1 и первого абзаца")
+
+class MonitorStatus(BaseModel):
+    """
+    Состояние мониторинга сайта.
+    """
+    id: str
+    url: str
+    interval_seconds: int
+    full_text: bool
+    next_run_at: datetime
+    last_checked_at: Optional[datetime] = None
+    last_changed_at: Optional[datetime] = Field(None, description="Когда контент последний раз изменился и был проанализирован")
+    last_error: Optional[str] = None
+    checks: int = Field(..., description="Всего проверок")
+    changes: int = Field(..., description="Проверок с изменениями (с вызовом модели)")
+    created_at: datetime
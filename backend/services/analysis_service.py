@@ -0,0 +1,372 @@
+"""
+Сценарии анализа: парсинг, запрос к модели и запись в историю.
+"""
+import asyncio
+import re
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+from backend.config import settings
+from backend.models.schemas import (
+    BatchItemResult,
+    CompetitorAnalysis,
+    HistoryItem,
+    ImageAnalysisResponse,
+    ParseDemoResponse,
+    ParsedContent,
+    TextAnalysisResponse,
+)
+from backend.services.chunking import chunk_text
+from backend.services.history_service import HistoryService, get_history_service
+from backend.services.image_service import ImageService, get_image_service
+from backend.services.openai_service import OpenAIService, get_openai_service
+from backend.services.parser_service import ParserService, get_parser_service
+from backend.startup import lazy_service
+
+MIN_TEXT_LENGTH = 10
+
+# Сколько пунктов каждого списка оставлять после слияния анализов фрагментов
+MERGED_LIST_LIMIT = 7
+
+
+def _words(item: str) -> frozenset:
+    return frozenset(re.findall(r"\w+", item.lower()))
+
+
+def _dedupe(items: List[str], limit: int, threshold: float = 0.8) -> List[str]:
+    """
+    Убирает повторы из списка с сохранением порядка: пункт считается
+    повтором, если множества его слов и уже взятого пункта совпадают
+    не меньше чем на threshold (коэффициент Жаккара).
+    """
+    kept, kept_words = [], []
+    for item in items:
+        words = _words(item)
+        if not words:
+            continue
+        if any(len(words & other) / len(words | other) >= threshold for other in kept_words):
+            continue
+        kept.append(item.strip())
+        kept_words.append(words)
+        if len(kept) >= limit:
+            break
+    return kept
+
+
+def page_text(parsed: dict) -> str:
+    """
+    Текст страницы для анализа: title, h1, первый абзац и, если парсер
+    их извлекал (PARSER_EXTRACT_FIELDS), meta description и подзаголовки.
+    """
+    parts = [parsed["title"], parsed["h1"], parsed["first_paragraph"]]
+    if parsed.get("meta_description"):
+        parts.append(parsed["meta_description"])
+    parts.extend(parsed.get("headings") or [])
+    return " ".join(parts)
+
+
+def merge_analyses(analyses: List[CompetitorAnalysis]) -> CompetitorAnalysis:
+    """
+    Сливает анализы фрагментов страницы в один: списки объединяются
+    по кругу (первый пункт каждого фрагмента, затем вторые и т.д.) без
+    повторов, резюме — уникальные резюме фрагментов.
+
+    Args:
+        analyses (list): Анализы фрагментов в порядке следования на странице.
+
+    Returns:
+        CompetitorAnalysis: Общий анализ.
+    """
+    if len(analyses) == 1:
+        return analyses[0]
+    merged = {}
+    for field in ("strengths", "weaknesses", "unique_offers", "recommendations"):
+        columns = [getattr(analysis, field) for analysis in analyses]
+        interleaved = [column[i] for i in range(max(map(len, columns), default=0)) for column in columns if i < len(column)]
+        merged[field] = _dedupe(interleaved, MERGED_LIST_LIMIT)
+    summaries = _dedupe([analysis.summary for analysis in analyses], 3)
+    merged["summary"] = " ".join(summaries)
+    return CompetitorAnalysis(**merged)
+
+
+class AnalysisService:
+    """
+    Общие сценарии для эндпоинтов и пакетной обработки: каждый сценарий
+    получает данные, вызывает модель и сохраняет результат в историю.
+    """
+    def __init__(
+        self,
+        openai: Optional[OpenAIService] = None,
+        parser: Optional[ParserService] = None,
+        history: Optional[HistoryService] = None,
+        images: Optional[ImageService] = None,
+    ):
+        self.openai = openai if openai is not None else get_openai_service()
+        self.parser = parser if parser is not None else get_parser_service()
+        self.history = history if history is not None else get_history_service()
+        self.images = images if images is not None else get_image_service()
+
+    async def analyze_text(self, text: str) -> TextAnalysisResponse:
+        """
+        Анализирует текст конкурента и сохраняет результат в историю.
+
+        Args:
+            text (str): Текст конкурента.
+
+        Returns:
+            TextAnalysisResponse: Результат анализа или ошибка.
+        """
+        if len(text) < MIN_TEXT_LENGTH:
+            return TextAnalysisResponse(success=False, error="Текст слишком короткий")
+        analysis = await self.openai.analyze_text_async(text)
+        await self.history.save_history_async(HistoryItem(
+            id=str(uuid.uuid4()),
+            timestamp=datetime.now(),
+            request_type="text",
+            request_summary=text[:50],
+            response_summary=analysis.summary,
+            request_payload={"text": text},
+            response_payload=analysis.model_dump()
+        ))
+        return TextAnalysisResponse(success=True, analysis=analysis)
+
+    async def analyze_image(self, image_bytes: bytes, filename: str, content_type: str) -> ImageAnalysisResponse:
+        """
+        Уменьшает и перекодирует изображение конкурента, анализирует его
+        и сохраняет результат в историю.
+
+        Args:
+            image_bytes (bytes): Изображение.
+            filename (str): Имя загруженного файла.
+            content_type (str): MIME-тип изображения.
+
+        Returns:
+            ImageAnalysisResponse: Результат анализа или ошибка.
+        """
+        try:
+            prepared = await asyncio.to_thread(self.images.preprocess, image_bytes)
+        except ValueError as e:
+            return ImageAnalysisResponse(success=False, error=str(e))
+        analysis = await self.openai.analyze_image_async(prepared["data"], fingerprint=prepared["fingerprint"])
+        await self.history.save_history_async(HistoryItem(
+            id=str(uuid.uuid4()),
+            timestamp=datetime.now(),
+            request_type="image",
+            request_summary=filename,
+            response_summary=analysis.description,
+            request_payload={
+                "filename": filename,
+                "content_type": content_type,
+                "original_bytes": prepared["original_bytes"],
+                "original_size": prepared["original_size"],
+                "bytes": len(prepared["data"]),
+                "size": f"{prepared['width']}x{prepared['height']}",
+                "phash": prepared["phash"],
+            },
+            response_payload=analysis.model_dump()
+        ))
+        return ImageAnalysisResponse(success=True, analysis=analysis)
+
+    async def parse_and_analyze(self, url: str, deep: bool = False) -> ParseDemoResponse:
+        """
+        Парсит сайт, анализирует извлечённый текст и сохраняет результат в историю.
+
+        Args:
+            url (str): URL сайта.
+            deep (bool): Анализировать весь текст страницы по фрагментам.
+
+        Returns:
+            ParseDemoResponse: Извлечённый контент и анализ или ошибка.
+        """
+        parsed = await self.parser.parse_async(url, full_text=deep)
+        if parsed["error"]:
+            return ParseDemoResponse(success=False, error=parsed["error"])
+        return await self.analyze_parsed(url, parsed, deep)
+
+    async def analyze_parsed(self, url: str, parsed: dict, deep: bool = False) -> ParseDemoResponse:
+        """
+        Анализирует уже извлечённый контент страницы и сохраняет результат в историю.
+
+        Args:
+            url (str): URL сайта.
+            parsed (dict): Результат ParserService.parse() без ошибки.
+            deep (bool): Анализировать весь текст (parsed["full_text"]) по фрагментам.
+
+        Returns:
+            ParseDemoResponse: Извлечённый контент и анализ.
+        """
+        parsed = dict(parsed)
+        full_text = parsed.pop("full_text", "")
+        text = page_text(parsed)
+        chunks = None
+        if deep and full_text:
+            analysis, chunks = await self.analyze_long_text(f"{parsed['title']}. {full_text}")
+        else:
+            analysis = await self.openai.analyze_text_async(text)
+        await self.history.save_history_async(HistoryItem(
+            id=str(uuid.uuid4()),
+            timestamp=datetime.now(),
+            request_type="parse",
+            request_summary=url,
+            response_summary=analysis.summary,
+            request_payload={"url": url, "parsed": parsed, "deep": deep, "chunks": chunks},
+            response_payload=analysis.model_dump()
+        ))
+        return ParseDemoResponse(success=True, parsed=parsed, analysis=analysis, chunks=chunks)
+
+    async def analyze_long_text(self, text: str) -> Tuple[CompetitorAnalysis, int]:
+        """
+        Map-reduce анализ длинного текста: текст делится на фрагменты по
+        DEEP_CHUNK_TOKENS токенов, фрагменты анализируются параллельно (не
+        больше DEEP_CONCURRENCY одновременно), результаты сливаются в один
+        анализ. Анализ каждого фрагмента кэшируется отдельно, так что после
+        небольшой правки страницы модель вызывается только для изменившихся
+        фрагментов.
+
+        Args:
+            text (str): Полный текст страницы.
+
+        Returns:
+            tuple: Слитый анализ и число проанализированных фрагментов.
+        """
+        chunks = chunk_text(text, settings.DEEP_CHUNK_TOKENS)[:settings.DEEP_MAX_CHUNKS]
+        semaphore = asyncio.Semaphore(settings.DEEP_CONCURRENCY)
+
+        async def analyze_chunk(chunk: str) -> CompetitorAnalysis:
+            async with semaphore:
+                return await self.openai.analyze_text_async(chunk)
+
+        analyses = await asyncio.gather(*(analyze_chunk(chunk) for chunk in chunks))
+        return merge_analyses(analyses), len(chunks)
+
+    async def stream_text(self, text: str) -> AsyncIterator[dict]:
+        """
+        Потоковый анализ текста: события для Server-Sent Events.
+
+        Args:
+            text (str): Текст конкурента.
+
+        Yields:
+            dict: {"event": "section", "data": {"name", "value"}} по мере
+                готовности секций, затем "done" с полным анализом или "error".
+        """
+        if len(text) < MIN_TEXT_LENGTH:
+            yield {"event": "error", "data": {"error": "Текст слишком короткий"}}
+            return
+        async for event in self._stream_analysis(text, "text", text[:50], {"text": text}):
+            yield event
+
+    async def stream_parse(self, url: str, deep: bool = False) -> AsyncIterator[dict]:
+        """
+        Потоковый парсинг и анализ сайта: сначала событие "parsed" с
+        извлечённым контентом, затем секции анализа. В глубоком режиме
+        "parsed" отдаётся сразу после парсинга, а секции — после слияния
+        анализов всех фрагментов.
+
+        Args:
+            url (str): URL сайта.
+            deep (bool): Анализировать весь текст страницы по фрагментам.
+
+        Yields:
+            dict: События "parsed", "section", "done" или "error".
+        """
+        parsed = await self.parser.parse_async(url, full_text=deep)
+        if parsed["error"]:
+            yield {"event": "error", "data": {"error": parsed["error"]}}
+            return
+        yield {"event": "parsed", "data": ParsedContent(**parsed).model_dump()}
+        if deep:
+            try:
+                response = await self.analyze_parsed(url, parsed, deep=True)
+            except Exception as e:
+                yield {"event": "error", "data": {"error": str(e)}}
+                return
+            for name, value in response.analysis.model_dump().items():
+                yield {"event": "section", "data": {"name": name, "value": value}}
+            yield {"event": "done", "data": response.analysis.model_dump()}
+            return
+        text = page_text(parsed)
+        async for event in self._stream_analysis(text, "parse", url, {"url": url, "parsed": parsed}):
+            yield event
+
+    async def _stream_analysis(self, text: str, request_type: str, summary: str, payload: dict) -> AsyncIterator[dict]:
+        """
+        Отдаёт секции анализа по мере генерации и сохраняет итог в историю.
+        """
+        sections = {}
+        try:
+            async for name, value in self.openai.stream_text_analysis(text):
+                sections[name] = value
+                yield {"event": "section", "data": {"name": name, "value": value}}
+            analysis = CompetitorAnalysis.model_validate(sections)
+        except Exception as e:
+            yield {"event": "error", "data": {"error": str(e)}}
+            return
+        await self.history.save_history_async(HistoryItem(
+            id=str(uuid.uuid4()),
+            timestamp=datetime.now(),
+            request_type=request_type,
+            request_summary=summary,
+            response_summary=analysis.summary,
+            request_payload=payload,
+            response_payload=analysis.model_dump()
+        ))
+        yield {"event": "done", "data": analysis.model_dump()}
+
+    async def _run_batch_item(self, index: int, kind: str, value: str, semaphore: asyncio.Semaphore) -> BatchItemResult:
+        """
+        Обрабатывает один элемент пакета; исключение превращается в ошибку элемента.
+        """
+        async with semaphore:
+            try:
+                if kind == "text":
+                    response = await self.analyze_text(value)
+                    parsed = None
+                else:
+                    response = await self.parse_and_analyze(value)
+                    parsed = response.parsed
+            except Exception as e:
+                return BatchItemResult(index=index, kind=kind, input=value, success=False, error=str(e))
+        return BatchItemResult(
+            index=index,
+            kind=kind,
+            input=value,
+            success=response.success,
+            parsed=parsed,
+            analysis=response.analysis,
+            error=response.error,
+        )
+
+    async def run_batch(self, texts: List[str], urls: List[str], concurrency: int) -> AsyncIterator[BatchItemResult]:
+        """
+        Обрабатывает пакет текстов и URL, одновременно — не больше concurrency
+        элементов, и отдаёт результаты по мере готовности.
+
+        Индексы элементов сквозные: сначала тексты, затем URL.
+
+        Args:
+            texts (list): Тексты для анализа.
+            urls (list): URL для парсинга и анализа.
+            concurrency (int): Максимум одновременно обрабатываемых элементов.
+
+        Yields:
+            BatchItemResult: Результат очередного завершённого элемента.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        items = [("text", text) for text in texts] + [("url", url) for url in urls]
+        tasks = [
+            asyncio.ensure_future(self._run_batch_item(index, kind, value, semaphore))
+            for index, (kind, value) in enumerate(items)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Клиент отключился или генератор закрыт досрочно — незавершённые элементы не нужны
+            for task in tasks:
+                task.cancel()
+
+
+@lazy_service
+def get_analysis_service() -> AnalysisService:
+    return AnalysisService()
@@ -0,0 +1,244 @@
+"""
+Пул переиспользуемых headless-сессий Chrome для ParserService.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from queue import Empty, SimpleQueue
+
+from backend.config import settings
+from backend.services.metrics import metrics, service_stats
+from backend.startup import lazy_service
+
+# Типы хранилищ, очищаемые между запросами через CDP
+_STORAGE_TYPES = "cookies,local_storage,session_storage,indexeddb,websql,service_workers,cache_storage"
+
+
+class BrowserSession:
+    """
+    Запущенный экземпляр Chrome и счётчик его использований.
+    """
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+
+
+class BrowserPool:
+    """
+    Ограниченный пул «тёплых» сессий Chrome.
+
+    Сессия выдаётся на время одного запроса через lease(), после чего
+    очищается (cookies, storage, вкладка) и возвращается в пул. Сессия
+    пересоздаётся после max_uses использований или если браузер упал.
+    """
+    def __init__(self, size: int, max_uses: int, lease_timeout: float, page_load_timeout: float):
+        self.size = size
+        self.max_uses = max_uses
+        self.lease_timeout = lease_timeout
+        self.page_load_timeout = page_load_timeout
+        self._idle: SimpleQueue = SimpleQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._alive = 0
+        self._in_use = 0
+        self._leases = 0
+        self._created = 0
+        self._recycled_max_uses = 0
+        self._recycled_crashed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _create_session(self) -> BrowserSession:
+        """
+        Запускает новый headless Chrome.
+
+        Returns:
+            BrowserSession: Новая сессия.
+        """
+        # Selenium импортируется при запуске первого браузера, а не при старте приложения
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+
+        chrome_options = Options()
+        chrome_options.add_argument('--headless')
+        chrome_options.add_argument('--disable-gpu')
+        chrome_options.add_argument('--no-sandbox')
+        chrome_options.add_argument('--window-size=1920,1080')
+        # Не ждём полной загрузки в driver.get: готовность страницы
+        # определяет ParserService по выбранной стратегии
+        chrome_options.page_load_strategy = "eager"
+        driver = webdriver.Chrome(options=chrome_options)
+        driver.set_page_load_timeout(self.page_load_timeout)
+        with self._lock:
+            self._alive += 1
+            self._created += 1
+        return BrowserSession(driver)
+
+    def _discard(self, session: BrowserSession, reason: str = ""):
+        """
+        Закрывает сессию и учитывает её в статистике пересозданий.
+
+        Args:
+            session (BrowserSession): Закрываемая сессия.
+            reason (str): "max_uses", "crashed" или пустая строка при закрытии пула.
+        """
+        try:
+            session.driver.quit()
+        except Exception:
+            pass
+        with self._lock:
+            self._alive -= 1
+            if reason == "crashed":
+                self._recycled_crashed += 1
+            elif reason == "max_uses":
+                self._recycled_max_uses += 1
+
+    @staticmethod
+    def _is_alive(session: BrowserSession) -> bool:
+        """
+        Проверяет, что браузер всё ещё отвечает.
+        """
+        try:
+            session.driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _reset(session: BrowserSession):
+        """
+        Очищает состояние сессии перед следующим запросом: cookies,
+        хранилища текущего origin и саму вкладку.
+        """
+        driver = session.driver
+        try:
+            origin = driver.execute_script("return window.location.origin")
+            if origin and origin != "null":
+                driver.execute_cdp_cmd(
+                    "Storage.clearDataForOrigin",
+                    {"origin": origin, "storageTypes": _STORAGE_TYPES},
+                )
+        except Exception:
+            pass
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        old_handle = driver.current_window_handle
+        driver.switch_to.new_window("tab")
+        new_handle = driver.current_window_handle
+        driver.switch_to.window(old_handle)
+        driver.close()
+        driver.switch_to.window(new_handle)
+
+    def _release(self, session: BrowserSession, failed: bool):
+        """
+        Возвращает сессию в пул или пересоздаёт её.
+        """
+        session.uses += 1
+        if self._closed:
+            self._discard(session)
+            return
+        if failed and not self._is_alive(session):
+            self._discard(session, "crashed")
+            return
+        if session.uses >= self.max_uses:
+            self._discard(session, "max_uses")
+            return
+        try:
+            self._reset(session)
+        except Exception:
+            self._discard(session, "crashed")
+            return
+        self._idle.put(session)
+
+    @contextmanager
+    def lease(self):
+        """
+        Выдаёт WebDriver из пула на время блока with.
+
+        Raises:
+            TimeoutError: Если свободная сессия не появилась за lease_timeout.
+
+        Yields:
+            webdriver.Chrome: Подготовленный к работе драйвер.
+        """
+        if self._closed:
+            raise RuntimeError("Пул браузеров закрыт")
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.lease_timeout):
+            raise TimeoutError("Нет свободных сессий браузера")
+        waited = time.monotonic() - started
+        with self._lock:
+            self._leases += 1
+            self._in_use += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        session = None
+        failed = False
+        try:
+            try:
+                session = self._idle.get_nowait()
+            except Empty:
+                session = self._create_session()
+            yield session.driver
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            if session is not None:
+                self._release(session, failed)
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        """
+        Возвращает статистику пула.
+
+        Returns:
+            dict: Размер пула, ожидание и количество пересозданий.
+        """
+        with self._lock:
+            return {
+                "size": self.size,
+                "alive": self._alive,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "leases": self._leases,
+                "created": self._created,
+                "wait_seconds_total": round(self._wait_total, 4),
+                "wait_seconds_avg": round(self._wait_total / self._leases, 4) if self._leases else 0.0,
+                "wait_seconds_max": round(self._wait_max, 4),
+                "recycled_max_uses": self._recycled_max_uses,
+                "recycled_crashed": self._recycled_crashed,
+            }
+
+    def close(self):
+        """
+        Закрывает все простаивающие сессии. Занятые сессии будут закрыты
+        при возврате в пул.
+        """
+        self._closed = True
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except Empty:
+                break
+            self._discard(session)
+
+
+@lazy_service
+def get_browser_pool() -> BrowserPool:
+    return BrowserPool(
+        size=settings.BROWSER_POOL_SIZE,
+        max_uses=settings.BROWSER_MAX_USES,
+        lease_timeout=settings.BROWSER_LEASE_TIMEOUT,
+        page_load_timeout=settings.PARSER_PAGE_LOAD_TIMEOUT,
+    )
+
+
+metrics.gauge("browser_pool_in_use", "Занятые сессии браузера", lambda: service_stats(get_browser_pool).get("in_use"))
+metrics.gauge("browser_pool_idle", "Свободные сессии браузера", lambda: service_stats(get_browser_pool).get("idle"))
+metrics.gauge(
+    "browser_pool_wait_seconds_total", "Суммарное ожидание свободной сессии браузера",
+    lambda: service_stats(get_browser_pool).get("wait_seconds_total"), type_name="counter",
+)
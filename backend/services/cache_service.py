@@ -0,0 +1,305 @@
+"""
+Кэш результатов анализа с адресацией по содержимому.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Union
+from backend.config import settings
+from backend.services.metrics import metrics, service_stats
+from backend.services.shared_store import SharedStore, shared_store
+from backend.startup import lazy_service
+
+
+def normalize_text(text: str) -> str:
+    """
+    Нормализует текст для построения ключа кэша: Unicode NFC и схлопывание пробелов.
+
+    Args:
+        text (str): Исходный текст.
+
+    Returns:
+        str: Нормализованный текст.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class AnalysisCache:
+    """
+    Многоуровневый кэш: LRU в памяти, необязательное общее хранилище
+    процессов (SharedStore) и необязательный каталог на диске.
+
+    Ключ — хэш нормализованного входа, имени модели и системного промпта,
+    поэтому смена модели или промпта автоматически инвалидирует записи.
+    Значения хранятся как JSON-совместимые словари. При нескольких
+    воркерах результат, полученный одним из них, находят все остальные
+    через общее хранилище; его сбой считается промахом, а не ошибкой анализа.
+    """
+    NAMESPACE = "analysis"
+
+    def __init__(
+        self,
+        max_items: int,
+        ttl_seconds: float,
+        cache_dir: str = "",
+        max_disk_bytes: int = 0,
+        shared: Optional[SharedStore] = None,
+    ):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_disk_bytes = max_disk_bytes
+        self.shared = shared
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        self._counters = {
+            "memory_hits": 0,
+            "shared_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "shared_errors": 0,
+        }
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(self.cache_dir) if entry.is_file())
+
+    @staticmethod
+    def make_key(kind: str, payload: Union[str, bytes], model: str, system_prompt: str) -> str:
+        """
+        Строит ключ кэша.
+
+        Args:
+            kind (str): Тип анализа ("text", "image").
+            payload (str | bytes): Нормализованный вход или его отпечаток.
+            model (str): Имя модели.
+            system_prompt (str): Системный промпт.
+
+        Returns:
+            str: Hex-дайджест SHA-256.
+        """
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        digest = hashlib.sha256()
+        for part in (kind.encode(), model.encode(), system_prompt.encode("utf-8"), payload):
+            digest.update(len(part).to_bytes(8, "big"))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Ищет значение сначала в памяти, затем в общем хранилище и на диске.
+
+        Args:
+            key (str): Ключ кэша.
+
+        Returns:
+            dict | None: Сохранённое значение или None.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+                self._counters["expired"] += 1
+        value = self._shared_get(key)
+        counter = "shared_hits"
+        if value is None:
+            value = self._disk_get(key, now)
+            counter = "disk_hits"
+        with self._lock:
+            if value is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters[counter] += 1
+            self._memory_set(key, value, now + self.ttl_seconds)
+        return value
+
+    def set(self, key: str, value: dict):
+        """
+        Сохраняет значение в памяти и, если включены, в общем хранилище и на диске.
+
+        Args:
+            key (str): Ключ кэша.
+            value (dict): JSON-совместимое значение.
+        """
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._memory_set(key, value, expires_at)
+        self._shared_set(key, value)
+        self._disk_set(key, value, expires_at)
+
+    async def aget(self, key: str) -> Optional[dict]:
+        """
+        get() для асинхронного кода: обращения к общему хранилищу и к
+        файлам на диске выполняются в потоке, не блокируя цикл событий.
+        """
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: dict):
+        """
+        set() для асинхронного кода, выполняемый в потоке.
+        """
+        await asyncio.to_thread(self.set, key, value)
+
+    def _memory_set(self, key: str, value: dict, expires_at: float):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _shared_get(self, key: str) -> Optional[dict]:
+        if self.shared is None:
+            return None
+        try:
+            return self.shared.get(self.NAMESPACE, key)
+        except Exception:
+            with self._lock:
+                self._counters["shared_errors"] += 1
+            return None
+
+    def _shared_set(self, key: str, value: dict):
+        if self.shared is None:
+            return
+        try:
+            self.shared.set(self.NAMESPACE, key, value, self.ttl_seconds)
+        except Exception:
+            with self._lock:
+                self._counters["shared_errors"] += 1
+
+    def _disk_get(self, key: str, now: float) -> Optional[dict]:
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get("expires_at", 0) <= now:
+            self._disk_remove(path)
+            with self._lock:
+                self._counters["expired"] += 1
+            return None
+        return record.get("value")
+
+    def _disk_set(self, key: str, value: dict, expires_at: float):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        data = json.dumps({"expires_at": expires_at, "value": value}, ensure_ascii=False, default=str).encode("utf-8")
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            old_size = path.stat().st_size if path.exists() else 0
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_bytes += len(data) - old_size
+            over_limit = self.max_disk_bytes and self._disk_bytes > self.max_disk_bytes
+        if over_limit:
+            self._evict_disk()
+
+    def _disk_remove(self, path: Path):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            self._disk_bytes -= size
+
+    def _evict_disk(self):
+        """
+        Удаляет самые старые файлы, пока размер кэша не опустится до 90% лимита.
+        """
+        entries = sorted(
+            (entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        target = self.max_disk_bytes * 0.9
+        for entry in entries:
+            if self._disk_bytes <= target:
+                break
+            self._disk_remove(Path(entry.path))
+            with self._lock:
+                self._counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        """
+        Возвращает счётчики попаданий и размер кэша.
+
+        Returns:
+            dict: Статистика кэша.
+        """
+        with self._lock:
+            hits = self._counters["memory_hits"] + self._counters["shared_hits"] + self._counters["disk_hits"]
+            lookups = hits + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "disk_bytes": self._disk_bytes if self.cache_dir else 0,
+            }
+
+    def clear(self):
+        """
+        Очищает все уровни кэша.
+        """
+        with self._lock:
+            self._memory.clear()
+        if self.shared is not None:
+            self.shared.clear(self.NAMESPACE)
+        if self.cache_dir:
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(".json"):
+                    self._disk_remove(Path(entry.path))
+
+
+@lazy_service
+def get_analysis_cache() -> AnalysisCache:
+    return AnalysisCache(
+        max_items=settings.ANALYSIS_CACHE_MAX_ITEMS,
+        ttl_seconds=settings.ANALYSIS_CACHE_TTL,
+        cache_dir=settings.ANALYSIS_CACHE_DIR,
+        max_disk_bytes=settings.ANALYSIS_CACHE_MAX_DISK_MB * 1024 * 1024,
+        shared=shared_store(),
+    )
+
+
+def _lookup_counts() -> dict:
+    stats = service_stats(get_analysis_cache)
+    if not stats:
+        return {}
+    return {
+        ("memory_hit",): stats["memory_hits"],
+        ("shared_hit",): stats["shared_hits"],
+        ("disk_hit",): stats["disk_hits"],
+        ("miss",): stats["misses"],
+    }
+
+
+metrics.gauge(
+    "analysis_cache_requests_total", "Обращения к кэшу анализа по результату",
+    _lookup_counts, ("result",), type_name="counter",
+)
+metrics.gauge("analysis_cache_hit_ratio", "Доля попаданий в кэш анализа", lambda: service_stats(get_analysis_cache).get("hit_ratio"))
+metrics.gauge("analysis_cache_memory_items", "Записей в памяти кэша анализа", lambda: service_stats(get_analysis_cache).get("memory_items"))
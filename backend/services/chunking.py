@@ -0,0 +1,77 @@
+"""
+Разбиение длинного текста страницы на фрагменты для анализа по частям.
+"""
+import re
+import zlib
+from typing import List
+from backend.services.rate_limiter import estimate_tokens
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?…])\s+")
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Делит текст на предложения по завершающим знакам препинания.
+
+    Args:
+        text (str): Текст.
+
+    Returns:
+        list: Непустые предложения.
+    """
+    return [sentence for sentence in (part.strip() for part in _SENTENCE_END_RE.split(text)) if sentence]
+
+
+def _split_long(sentence: str, max_tokens: int) -> List[str]:
+    """
+    Делит предложение длиннее max_tokens по словам.
+    """
+    parts, current = [], []
+    for word in sentence.split():
+        if current and estimate_tokens(" ".join(current + [word])) > max_tokens:
+            parts.append(" ".join(current))
+            current = []
+        current.append(word)
+    if current:
+        parts.append(" ".join(current))
+    return parts
+
+
+def chunk_text(text: str, max_tokens: int, min_tokens: int = 0, boundary_divisor: int = 8) -> List[str]:
+    """
+    Делит текст на фрагменты не длиннее max_tokens токенов по границам предложений.
+
+    Границы выбираются по содержимому: фрагмент заканчивается на
+    предложении, crc32 которого делится на boundary_divisor (если во
+    фрагменте уже не меньше min_tokens), или когда следующее предложение
+    не помещается. Поэтому правка в одном месте страницы меняет только
+    свой фрагмент, а остальные совпадают с прежними и берутся из кэша
+    анализа.
+
+    Args:
+        text (str): Текст.
+        max_tokens (int): Максимальный размер фрагмента.
+        min_tokens (int): Минимальный размер фрагмента для границы по содержимому;
+            по умолчанию половина max_tokens.
+        boundary_divisor (int): Делитель для границ по содержимому.
+
+    Returns:
+        list: Фрагменты текста.
+    """
+    if not min_tokens:
+        min_tokens = max_tokens // 2
+    chunks, current, current_tokens = [], [], 0
+    for sentence in split_sentences(text):
+        for piece in _split_long(sentence, max_tokens) if estimate_tokens(sentence) > max_tokens else [sentence]:
+            tokens = estimate_tokens(piece)
+            if current and current_tokens + tokens > max_tokens:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+            if current_tokens >= min_tokens and zlib.crc32(piece.encode("utf-8")) % boundary_divisor == 0:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
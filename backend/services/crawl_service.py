@@ -0,0 +1,382 @@
+"""
+Обход сайта конкурента: страницы на глубине одного-двух переходов от главной или из sitemap.xml.
+"""
+import asyncio
+import time
+import uuid
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+from backend.config import settings
+from backend.models.schemas import CrawledPage, CrawlResponse, HistoryItem
+from backend.services.analysis_service import AnalysisService, get_analysis_service, page_text
+from backend.services.metrics import metrics
+from backend.startup import lazy_service
+
+# Параметры меток рекламных кампаний: на контент не влияют
+_TRACKING_PARAMS = {"gclid", "yclid", "fbclid", "_openstat", "ysclid"}
+
+CRAWL_PAGES = metrics.counter(
+    "crawl_pages_total",
+    "Страницы обхода: ok, error, duplicate (тот же canonical), robots (запрещены robots.txt), budget (сверх бюджета)",
+    ("outcome",),
+)
+
+
+def canonical_url(url: str) -> Optional[str]:
+    """
+    Каноническая форма URL для поиска повторов: схема и хост в нижнем
+    регистре, без порта по умолчанию, фрагмента, точечных сегментов
+    пути и меток кампаний (utm_*, gclid, …), параметры отсортированы.
+
+    Args:
+        url (str): Абсолютный URL.
+
+    Returns:
+        str | None: Канонический URL или None, если это не http(s)-адрес.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if scheme not in ("http", "https") or not host:
+        return None
+    netloc = host if port is None or (scheme, port) in (("http", 80), ("https", 443)) else f"{host}:{port}"
+    path = urlsplit(urljoin("http://host", parts.path or "/")).path
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in _TRACKING_PARAMS
+    ))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def _site(host: str) -> str:
+    return host[4:] if host.startswith("www.") else host
+
+
+class HostGate:
+    """
+    Вежливость к одному хосту: не больше concurrency одновременных
+    запросов и не меньше delay секунд между началами запросов.
+    """
+    def __init__(self, concurrency: int, delay: float):
+        self.delay = delay
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._next_start = 0.0
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        try:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.delay
+            if start > now:
+                await asyncio.sleep(start - now)
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    async def __aexit__(self, *exc_info):
+        self._semaphore.release()
+
+
+class _CrawlRun:
+    """
+    Состояние одного обхода: очередь в ширину, уже виденные URL,
+    правила robots.txt и ограничители по хостам.
+    """
+    def __init__(self, service: "CrawlService", root: str, max_pages: int, max_depth: int):
+        self.service = service
+        self.site = _site(urlsplit(root).hostname)
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.seen = set()
+        self.content_urls: Dict[str, str] = {}
+        self.pages: List[CrawledPage] = []
+        self.parsed: List[dict] = []
+        self.fetched = 0
+        self.counts = {"ok": 0, "error": 0, "duplicate": 0, "robots": 0, "budget": 0}
+        self._robots: Dict[str, asyncio.Task] = {}
+        self._gates: Dict[str, HostGate] = {}
+
+    def enqueue(self, url: str, depth: int):
+        url = canonical_url(url)
+        if url is None or url in self.seen or _site(urlsplit(url).hostname) != self.site:
+            return
+        self.seen.add(url)
+        self.queue.put_nowait((url, depth))
+
+    def host_gate(self, url: str) -> HostGate:
+        netloc = urlsplit(url).netloc
+        if netloc not in self._gates:
+            self._gates[netloc] = HostGate(self.service.host_concurrency, self.service.host_delay)
+        return self._gates[netloc]
+
+    async def load_robots(self, origin: str) -> RobotFileParser:
+        # robots.txt — тоже запрос к хосту: идёт через его ограничитель
+        gate = self.host_gate(origin)
+        async with gate:
+            robots = await asyncio.to_thread(self.service.load_robots, origin)
+        # Crawl-delay из robots.txt соблюдается, если он больше нашего
+        crawl_delay = robots.crawl_delay(self.service.user_agent) or 0
+        gate.delay = max(gate.delay, float(crawl_delay))
+        return robots
+
+    async def robots(self, url: str) -> RobotFileParser:
+        origin = "{0.scheme}://{0.netloc}".format(urlsplit(url))
+        if origin not in self._robots:
+            self._robots[origin] = asyncio.ensure_future(self.load_robots(origin))
+        return await self._robots[origin]
+
+    async def gate(self, url: str) -> HostGate:
+        # Ограничитель хоста с учётом Crawl-delay: сначала читается robots.txt
+        await self.robots(url)
+        return self.host_gate(url)
+
+    async def sitemap_urls(self, url: str) -> List[str]:
+        """
+        Адреса страниц из sitemap.xml; вложенные индексы sitemap читаются
+        в ширину, не больше max_sitemaps файлов.
+        """
+        pending = [url]
+        urls = []
+        loaded = 0
+        while pending and loaded < self.service.max_sitemaps and len(urls) < self.service.page_limit:
+            sitemap = pending.pop(0)
+            if not (await self.robots(sitemap)).can_fetch(self.service.user_agent, sitemap):
+                continue
+            async with await self.gate(sitemap):
+                nested, pages = await asyncio.to_thread(self.service.load_sitemap, sitemap)
+            loaded += 1
+            pending.extend(nested)
+            urls.extend(pages)
+        return urls[:self.service.page_limit]
+
+    async def worker(self):
+        while True:
+            url, depth = await self.queue.get()
+            try:
+                await self.visit(url, depth)
+            except Exception as e:
+                # Сбой одной страницы не останавливает обход
+                self.pages.append(CrawledPage(url=url, depth=depth, error=str(e)))
+                self.counts["error"] += 1
+                CRAWL_PAGES.inc(outcome="error")
+            finally:
+                self.queue.task_done()
+
+    async def visit(self, url: str, depth: int):
+        if not (await self.robots(url)).can_fetch(self.service.user_agent, url):
+            self.counts["robots"] += 1
+            CRAWL_PAGES.inc(outcome="robots")
+            return
+        if self.fetched >= self.max_pages:
+            self.counts["budget"] += 1
+            CRAWL_PAGES.inc(outcome="budget")
+            return
+        self.fetched += 1
+        async with await self.gate(url):
+            parsed = await self.service.analysis.parser.parse_async(
+                url, links=True, user_agent=self.service.user_agent
+            )
+        page = CrawledPage(url=url, depth=depth, **parsed)
+        self.pages.append(page)
+        if parsed["error"]:
+            self.counts["error"] += 1
+            CRAWL_PAGES.inc(outcome="error")
+            return
+        # Страница с тем же canonical, что и уже собранная, — повтор
+        content_url = canonical_url(parsed.get("canonical") or "") or url
+        if content_url in self.content_urls:
+            page.duplicate_of = self.content_urls[content_url]
+            self.counts["duplicate"] += 1
+            CRAWL_PAGES.inc(outcome="duplicate")
+            return
+        self.content_urls[content_url] = url
+        self.seen.add(content_url)
+        self.parsed.append(parsed)
+        self.counts["ok"] += 1
+        CRAWL_PAGES.inc(outcome="ok")
+        if depth < self.max_depth:
+            for link in parsed.get("links", []):
+                self.enqueue(link, depth + 1)
+
+    async def run(self, seeds: List[str]):
+        for seed in seeds:
+            self.enqueue(seed, 0)
+        workers = [asyncio.create_task(self.worker()) for _ in range(self.service.concurrency)]
+        try:
+            await self.queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+
+class CrawlService:
+    """
+    Обход сайта конкурента с анализом собранного контента.
+
+    Обход начинается с URL (или со страниц из sitemap.xml, если URL
+    указывает на .xml) и идёт в ширину по ссылкам того же сайта — хост
+    без учёта www — до max_depth переходов и не больше max_pages
+    загруженных страниц. Страницы грузятся параллельно (concurrency), но
+    к одному хосту — не больше host_concurrency одновременно и не чаще
+    раза в host_delay секунд; robots.txt соблюдается, включая Crawl-delay.
+    URL сравниваются в канонической форме, страницы с уже собранным
+    <link rel="canonical"> считаются повторами. Текст уникальных страниц
+    анализируется по фрагментам, как в глубоком режиме /parse_demo.
+    """
+    def __init__(
+        self,
+        analysis: Optional[AnalysisService] = None,
+        max_pages: int = settings.CRAWL_MAX_PAGES,
+        page_limit: int = settings.CRAWL_PAGE_LIMIT,
+        max_depth: int = settings.CRAWL_MAX_DEPTH,
+        concurrency: int = settings.CRAWL_CONCURRENCY,
+        host_concurrency: int = settings.CRAWL_HOST_CONCURRENCY,
+        host_delay: float = settings.CRAWL_HOST_DELAY,
+        user_agent: str = settings.CRAWL_USER_AGENT,
+        max_sitemaps: int = settings.CRAWL_MAX_SITEMAPS,
+    ):
+        self._analysis = analysis
+        self.max_pages = max_pages
+        self.page_limit = page_limit
+        self.max_depth = max_depth
+        self.concurrency = concurrency
+        self.host_concurrency = host_concurrency
+        self.host_delay = host_delay
+        self.user_agent = user_agent
+        self.max_sitemaps = max_sitemaps
+
+    @property
+    def analysis(self) -> AnalysisService:
+        if self._analysis is None:
+            self._analysis = get_analysis_service()
+        return self._analysis
+
+    @property
+    def _headers(self) -> dict:
+        # Обход представляется своим агентом — тем, для которого читается robots.txt
+        return {"User-Agent": self.user_agent}
+
+    def load_robots(self, origin: str) -> RobotFileParser:
+        """
+        Загружает robots.txt хоста. Как в RFC 9309: ответ 4xx — обход
+        разрешён, 5xx или недоступный сервер — запрещён.
+
+        Args:
+            origin (str): Схема и хост, например https://example.com.
+
+        Returns:
+            RobotFileParser: Правила для проверки URL.
+        """
+        robots = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            response = self.analysis.parser.http.get(f"{origin}/robots.txt", headers=self._headers)
+        except Exception:
+            robots.disallow_all = True
+            return robots
+        if response.status_code >= 500:
+            robots.disallow_all = True
+        elif response.status_code >= 400:
+            robots.allow_all = True
+        else:
+            robots.parse(response.text.splitlines())
+        return robots
+
+    def load_sitemap(self, url: str) -> Tuple[List[str], List[str]]:
+        """
+        Загружает sitemap.xml.
+
+        Args:
+            url (str): URL файла sitemap.
+
+        Returns:
+            tuple: Вложенные sitemap (для индекса) и адреса страниц.
+        """
+        try:
+            response = self.analysis.parser.http.get(url, headers=self._headers)
+            if response.status_code != 200:
+                return [], []
+            root = ElementTree.fromstring(response.content)
+        except Exception:
+            return [], []
+        locations = [loc.text.strip() for loc in root.iterfind(".//{*}loc") if loc.text and loc.text.strip()]
+        if root.tag.endswith("sitemapindex"):
+            return locations, []
+        return [], locations
+
+    async def crawl(
+        self,
+        url: str,
+        max_pages: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        analyze: bool = True,
+    ) -> CrawlResponse:
+        """
+        Обходит сайт, анализирует собранный контент и сохраняет результат в историю.
+
+        Args:
+            url (str): Стартовая страница или sitemap.xml.
+            max_pages (int | None): Бюджет страниц (не больше page_limit).
+            max_depth (int | None): Глубина переходов по ссылкам.
+            analyze (bool): Анализировать контент; без анализа — только обход.
+
+        Returns:
+            CrawlResponse: Страницы, анализ и статистика обхода или ошибка.
+        """
+        url = url.strip()
+        if not url.startswith("http"):
+            url = "https://" + url
+        root = canonical_url(url)
+        if root is None:
+            return CrawlResponse(success=False, error="Некорректный URL")
+        started = time.perf_counter()
+        run = _CrawlRun(
+            self,
+            root,
+            min(max_pages or self.max_pages, self.page_limit),
+            self.max_depth if max_depth is None else max_depth,
+        )
+        seeds = await run.sitemap_urls(root) if urlsplit(root).path.endswith(".xml") else [root]
+        await run.run(seeds)
+        seconds = time.perf_counter() - started
+        stats = {
+            "pages": run.fetched,
+            "ok": run.counts["ok"],
+            "errors": run.counts["error"],
+            "duplicates": run.counts["duplicate"],
+            "robots": run.counts["robots"],
+            "budget": run.counts["budget"],
+            "seconds": round(seconds, 3),
+            "pages_per_second": round(run.fetched / seconds, 2) if seconds > 0 else 0.0,
+        }
+        response = CrawlResponse(success=bool(run.parsed), pages=run.pages, stats=stats)
+        if not run.parsed:
+            response.error = "Не удалось получить ни одной страницы"
+            return response
+        if analyze:
+            text = "\n\n".join(page_text(parsed) for parsed in run.parsed)
+            response.analysis, response.chunks = await self.analysis.analyze_long_text(text)
+            await self.analysis.history.save_history_async(HistoryItem(
+                id=str(uuid.uuid4()),
+                timestamp=datetime.now(),
+                request_type="crawl",
+                request_summary=url,
+                response_summary=response.analysis.summary,
+                request_payload={"url": url, "pages": [page.url for page in run.pages], "stats": stats},
+                response_payload=response.analysis.model_dump(),
+            ))
+        return response
+
+
+@lazy_service
+def get_crawl_service() -> CrawlService:
+    return CrawlService()
@@ -1,34 +1,481 @@
 """
 Сервис для работы с историей запросов.
 """
+import asyncio
+import base64
 import json
-import uuid
-from datetime import datetime
+import sqlite3
+import threading
+from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Optional, Tuple
+from backend.config import settings
 from backend.models.schemas import HistoryItem
+from backend.services.metrics import metrics
+from backend.services.sqlite_store import SQLiteStore
+from backend.startup import lazy_service
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id TEXT PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    request_type TEXT NOT NULL,
+    request_summary TEXT NOT NULL,
+    response_summary TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history(timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_history_type_timestamp ON history(request_type, timestamp, id);
+"""
+
+# Полные данные запроса и ответа и их текст для полнотекстового поиска
+_PAYLOAD_COLUMNS = {
+    "request_payload": "TEXT",
+    "response_payload": "TEXT",
+    "request_text": "TEXT NOT NULL DEFAULT ''",
+    "response_text": "TEXT NOT NULL DEFAULT ''",
+}
+
+# Индекс FTS5 поверх history (external content): содержимое берётся из
+# таблицы, а триггеры поддерживают индекс при вставке, удалении и очистке
+_FTS_SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE history_fts USING fts5(
+        request_text,
+        response_text,
+        content='history',
+        content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER history_fts_insert AFTER INSERT ON history BEGIN
+        INSERT INTO history_fts(rowid, request_text, response_text)
+        VALUES (new.rowid, new.request_text, new.response_text);
+    END
+    """,
+    """
+    CREATE TRIGGER history_fts_delete AFTER DELETE ON history BEGIN
+        INSERT INTO history_fts(history_fts, rowid, request_text, response_text)
+        VALUES ('delete', old.rowid, old.request_text, old.response_text);
+    END
+    """,
+    """
+    CREATE TRIGGER history_fts_update AFTER UPDATE ON history BEGIN
+        INSERT INTO history_fts(history_fts, rowid, request_text, response_text)
+        VALUES ('delete', old.rowid, old.request_text, old.response_text);
+        INSERT INTO history_fts(rowid, request_text, response_text)
+        VALUES (new.rowid, new.request_text, new.response_text);
+    END
+    """,
+)
+
+HISTORY_WRITE_SECONDS = metrics.histogram(
+    "history_write_seconds",
+    "Время записи элемента истории в SQLite (вместе с индексом FTS)",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+
+_COLUMNS = "id, timestamp, request_type, request_summary, response_summary"
+_INSERT_COLUMNS = _COLUMNS + ", request_payload, response_payload, request_text, response_text"
+_INSERT_SQL = f"INSERT OR REPLACE INTO history ({_INSERT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+
+def _timestamp(value: datetime) -> str:
+    """
+    Переводит время в ISO-строку фиксированного формата, чтобы строки
+    сортировались так же, как даты. Время с часовым поясом приводится
+    к локальному, в котором хранятся записи.
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value.isoformat(timespec="microseconds")
+
+
+def encode_cursor(timestamp: str, item_id: str) -> str:
+    """
+    Кодирует позицию последней выданной записи в непрозрачный курсор.
+
+    Args:
+        timestamp (str): Время записи в формате базы.
+        item_id (str): Идентификатор записи.
+
+    Returns:
+        str: Курсор для следующей страницы.
+    """
+    raw = json.dumps([timestamp, item_id], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Раскодирует курсор страницы.
+
+    Args:
+        cursor (str): Курсор из предыдущего ответа.
+
+    Raises:
+        ValueError: Если курсор повреждён.
+
+    Returns:
+        tuple: Время и идентификатор последней выданной записи.
+    """
+    try:
+        timestamp, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception as e:
+        raise ValueError("Некорректный курсор") from e
+    return str(timestamp), str(item_id)
+
+
+def _flatten_text(payload) -> str:
+    """
+    Собирает все строковые значения вложенной структуры в один текст для индекса.
+    """
+    if isinstance(payload, str):
+        return payload
+    if isinstance(payload, dict):
+        values = payload.values()
+    elif isinstance(payload, (list, tuple)):
+        values = payload
+    else:
+        return ""
+    return "\n".join(filter(None, (_flatten_text(value) for value in values)))
+
+
+# Окончания русских слов, которые отбрасываются перед поиском по префиксу;
+# длинные проверяются раньше коротких
+_RU_ENDINGS = sorted((
+    "ами", "ями", "ого", "его", "ому", "ему", "ыми", "ими", "иях", "ией", "ах", "ях", "ам", "ям", "ом", "ем",
+    "ой", "ей", "ий", "ый", "ая", "яя", "ое", "ее", "ые", "ие", "ую", "юю", "ов", "ев", "а", "я", "о", "е",
+    "у", "ю", "ы", "и", "ь",
+), key=len, reverse=True)
+_MIN_STEM = 3
+
+
+def _is_cyrillic(word: str) -> bool:
+    return any("а" <= char <= "я" or char == "ё" for char in word)
+
+
+def stem(word: str) -> str:
+    """
+    Отбрасывает окончание русского слова, чтобы по префиксу находились
+    все его формы: «доставка» → «доставк» (доставки, доставку, доставкой).
+    Основа не короче трёх букв; слова на других языках не меняются.
+
+    Args:
+        word (str): Слово.
+
+    Returns:
+        str: Основа в нижнем регистре.
+    """
+    word = word.lower()
+    if not _is_cyrillic(word):
+        return word
+    for ending in _RU_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= _MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def fts_query(query: str) -> str:
+    """
+    Превращает пользовательский запрос в безопасное выражение FTS5:
+    слова объединяются по И, каждое ищется по префиксу основы, так что
+    «доставка» находит и «доставки», и «доставку». Слово со звёздочкой
+    на конце («достав*») ищется по префиксу как есть.
+
+    Args:
+        query (str): Строка поиска.
+
+    Returns:
+        str: Выражение для MATCH.
+    """
+    terms = []
+    for word in query.split():
+        explicit = word.endswith("*")
+        word = word.rstrip("*")
+        if not explicit:
+            word = stem(word)
+        word = word.replace('"', '""')
+        if word:
+            terms.append(f'"{word}"*')
+    return " ".join(terms)
+
 
 class HistoryService:
     """
     Управление историей запросов пользователя.
+
+    История хранится в SQLite в режиме WAL: запись — одна вставка, читатели
+    не блокируют писателей, а несколько процессов могут писать в одну базу.
+    Старые записи удаляются по политике хранения (HISTORY_RETENTION_DAYS,
+    HISTORY_MAX_ITEMS) раз в PRUNE_EVERY вставок.
     """
     HISTORY_FILE = Path("history.json")
-    MAX_ITEMS = 10
+    PRUNE_EVERY = 100
+
+    def __init__(
+        self,
+        db_path: str = settings.HISTORY_DB_PATH,
+        retention_days: int = settings.HISTORY_RETENTION_DAYS,
+        max_items: int = settings.HISTORY_MAX_ITEMS,
+    ):
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self.max_items = max_items
+        # INSERT OR REPLACE должен запускать триггер удаления для индекса FTS
+        self.store = SQLiteStore(db_path, pragmas=("recursive_triggers=ON",))
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._inserts = 0
+
+    def _open(self) -> sqlite3.Connection:
+        """
+        Возвращает соединение текущего потока, создавая его при необходимости.
+
+        Returns:
+            sqlite3.Connection: Соединение с базой истории.
+        """
+        return self.store.connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Возвращает соединение текущего потока с готовой схемой.
+
+        Returns:
+            sqlite3.Connection: Соединение с базой истории.
+        """
+        if not self._initialized:
+            self.initialize()
+        return self._open()
+
+    def initialize(self):
+        """
+        Создаёт схему, переносит старый history.json и применяет политику хранения.
+        Вызывается при старте приложения; повторные вызовы ничего не делают.
+        """
+        with self._init_lock:
+            if self._initialized:
+                return
+            conn = self._open()
+            conn.executescript(_SCHEMA)
+            self._migrate_schema(conn)
+            self._migrate_json(conn)
+            self._prune(conn)
+            self._initialized = True
+
+    def _migrate_schema(self, conn: sqlite3.Connection):
+        """
+        Добавляет колонки с полными данными и индекс FTS5 в базы,
+        созданные ранними версиями. Для старых записей в индекс попадают
+        их краткие описания.
+        """
+        with self.store.transaction():
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(history)")}
+            for column, definition in _PAYLOAD_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE history ADD COLUMN {column} {definition}")
+            has_fts = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'history_fts'"
+            ).fetchone()
+            if not has_fts:
+                conn.execute(
+                    "UPDATE history SET request_text = request_summary, response_text = response_summary "
+                    "WHERE request_text = '' AND response_text = ''"
+                )
+                for statement in _FTS_SCHEMA:
+                    conn.execute(statement)
+                conn.execute("INSERT INTO history_fts(history_fts) VALUES ('rebuild')")
+
+    def _migrate_json(self, conn: sqlite3.Connection):
+        """
+        Переносит записи из history.json в базу и переименовывает файл.
+        """
+        if not self.HISTORY_FILE.exists():
+            return
+        try:
+            with self.HISTORY_FILE.open("r", encoding="utf-8") as f:
+                items = [HistoryItem(**item) for item in json.load(f)]
+        except Exception:
+            return
+        with self.store.transaction():
+            conn.executemany(
+                _INSERT_SQL.replace("INSERT OR REPLACE", "INSERT OR IGNORE"),
+                [self._row(item) for item in items],
+            )
+        try:
+            self.HISTORY_FILE.rename(self.HISTORY_FILE.with_suffix(".json.migrated"))
+        except OSError:
+            # Файл уже перенёс другой процесс
+            pass
+
+    def _prune(self, conn: sqlite3.Connection):
+        """
+        Удаляет записи старше retention_days и сверх max_items.
+        """
+        if self.retention_days > 0:
+            cutoff = _timestamp(datetime.now() - timedelta(days=self.retention_days))
+            conn.execute("DELETE FROM history WHERE timestamp < ?", (cutoff,))
+        if self.max_items > 0:
+            conn.execute(
+                "DELETE FROM history WHERE rowid IN "
+                "(SELECT rowid FROM history ORDER BY timestamp DESC LIMIT -1 OFFSET ?)",
+                (self.max_items,),
+            )
+
+    @staticmethod
+    def _row(item: HistoryItem) -> tuple:
+        request_text = _flatten_text(item.request_payload) or item.request_summary
+        response_text = _flatten_text(item.response_payload) or item.response_summary
+        return (
+            item.id,
+            _timestamp(item.timestamp),
+            item.request_type,
+            item.request_summary,
+            item.response_summary,
+            json.dumps(item.request_payload, ensure_ascii=False, default=str) if item.request_payload is not None else None,
+            json.dumps(item.response_payload, ensure_ascii=False, default=str) if item.response_payload is not None else None,
+            request_text,
+            response_text,
+        )
 
     def load_history(self) -> list:
         """
-        Загружает историю из файла.
+        Загружает историю из базы.
 
         Returns:
             list: Список элементов истории.
         """
-        if self.HISTORY_FILE.exists():
-            try:
-                with self.HISTORY_FILE.open("r", encoding="utf-8") as f:
-                    data = json.load(f)
-                return data
-            except Exception:
-                return []
-        return []
+        conn = self._connect()
+        rows = conn.execute(f"SELECT {_COLUMNS} FROM history ORDER BY timestamp, id").fetchall()
+        return [dict(row) for row in rows]
+
+    def query_history(
+        self,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        request_type: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+    ) -> Tuple[list, Optional[str], int]:
+        """
+        Возвращает страницу истории от новых записей к старым.
+
+        Пагинация по ключу (timestamp, id): каждая страница читается
+        по индексу с позиции курсора, без OFFSET и без чтения всей таблицы.
+
+        Args:
+            limit (int): Размер страницы.
+            cursor (str | None): Курсор из предыдущего ответа.
+            request_type (str | None): Фильтр по типу запроса.
+            date_from (datetime | None): Не раньше этого времени.
+            date_to (datetime | None): Не позже этого времени.
+
+        Raises:
+            ValueError: Если курсор повреждён.
+
+        Returns:
+            tuple: Элементы страницы, курсор следующей страницы (или None) и общее число записей по фильтру.
+        """
+        conditions = []
+        params = []
+        if request_type:
+            conditions.append("request_type = ?")
+            params.append(request_type)
+        if date_from:
+            conditions.append("timestamp >= ?")
+            params.append(_timestamp(date_from))
+        if date_to:
+            conditions.append("timestamp <= ?")
+            params.append(_timestamp(date_to))
+        filters = " AND ".join(conditions) or "1"
+        conn = self._connect()
+        total = conn.execute(f"SELECT COUNT(*) FROM history WHERE {filters}", params).fetchone()[0]
+        page_conditions = filters
+        page_params = list(params)
+        if cursor:
+            timestamp, item_id = decode_cursor(cursor)
+            page_conditions += " AND (timestamp, id) < (?, ?)"
+            page_params += [timestamp, item_id]
+        rows = conn.execute(
+            f"SELECT {_COLUMNS} FROM history WHERE {page_conditions} "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?",
+            page_params + [limit + 1],
+        ).fetchall()
+        items = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor(last["timestamp"], last["id"])
+        return items, next_cursor, total
+
+    async def query_history_async(self, **kwargs) -> Tuple[list, Optional[str], int]:
+        """
+        Асинхронный вариант query_history().
+
+        Returns:
+            tuple: См. query_history().
+        """
+        return await asyncio.to_thread(lambda: self.query_history(**kwargs))
+
+    def search_history(
+        self,
+        query: str,
+        limit: int = 20,
+        offset: int = 0,
+        request_type: Optional[str] = None,
+    ) -> Tuple[list, int]:
+        """
+        Ищет по полному тексту запросов и ответов через индекс FTS5.
+
+        Результаты отсортированы по релевантности (bm25) и содержат полные
+        данные запроса и ответа и фрагмент текста с найденными словами.
+
+        Args:
+            query (str): Строка поиска.
+            limit (int): Размер страницы.
+            offset (int): Смещение страницы.
+            request_type (str | None): Фильтр по типу запроса.
+
+        Returns:
+            tuple: Найденные записи и общее число совпадений.
+        """
+        match = fts_query(query)
+        if not match:
+            return [], 0
+        conditions = "history_fts MATCH ?"
+        params = [match]
+        if request_type:
+            conditions += " AND h.request_type = ?"
+            params.append(request_type)
+        conn = self._connect()
+        total = conn.execute(
+            f"SELECT COUNT(*) FROM history_fts JOIN history h ON h.rowid = history_fts.rowid WHERE {conditions}",
+            params,
+        ).fetchone()[0]
+        rows = conn.execute(
+            "SELECT h.id, h.timestamp, h.request_type, h.request_summary, h.response_summary, "
+            "h.request_payload, h.response_payload, "
+            "snippet(history_fts, -1, '[', ']', '…', 16) AS snippet, bm25(history_fts) AS rank "
+            f"FROM history_fts JOIN history h ON h.rowid = history_fts.rowid WHERE {conditions} "
+            "ORDER BY rank LIMIT ? OFFSET ?",
+            params + [limit, offset],
+        ).fetchall()
+        hits = []
+        for row in rows:
+            hit = dict(row)
+            for column in ("request_payload", "response_payload"):
+                hit[column] = json.loads(hit[column]) if hit[column] else None
+            hits.append(hit)
+        return hits, total
+
+    async def search_history_async(self, **kwargs) -> Tuple[list, int]:
+        """
+        Асинхронный вариант search_history().
+
+        Returns:
+            tuple: См. search_history().
+        """
+        return await asyncio.to_thread(lambda: self.search_history(**kwargs))
 
     def save_history(self, item: HistoryItem):
         """
@@ -37,18 +484,43 @@ class HistoryService:
         Args:
             item (HistoryItem): Элемент истории.
         """
-        history = self.load_history()
-        history.append(item.model_dump())
-        if len(history) > self.MAX_ITEMS:
-            history = history[-self.MAX_ITEMS:]
-        with self.HISTORY_FILE.open("w", encoding="utf-8") as f:
-            json.dump(history, f, ensure_ascii=False, indent=2, default=str)
+        conn = self._connect()
+        with HISTORY_WRITE_SECONDS.time():
+            conn.execute(_INSERT_SQL, self._row(item))
+        self._inserts += 1
+        if self._inserts % self.PRUNE_EVERY == 0:
+            self._prune(conn)
+
+    async def load_history_async(self) -> list:
+        """
+        Асинхронно загружает историю, не блокируя event loop.
+
+        Returns:
+            list: Список элементов истории.
+        """
+        return await asyncio.to_thread(self.load_history)
+
+    async def save_history_async(self, item: HistoryItem):
+        """
+        Асинхронно сохраняет новый элемент истории, не блокируя event loop.
+
+        Args:
+            item (HistoryItem): Элемент истории.
+        """
+        await asyncio.to_thread(self.save_history, item)
 
     def clear_history(self):
         """
         Очищает историю запросов.
         """
-        if self.HISTORY_FILE.exists():
-            self.HISTORY_FILE.unlink()
+        self._connect().execute("DELETE FROM history")
+
+    async def clear_history_async(self):
+        """
+        Асинхронно очищает историю запросов.
+        """
+        await asyncio.to_thread(self.clear_history)
 
-history_service = HistoryService()
+@lazy_service
+def get_history_service() -> HistoryService:
+    return HistoryService()
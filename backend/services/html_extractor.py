@@ -0,0 +1,221 @@
+"""
+Потоковое извлечение контента из HTML без браузера.
+"""
+import re
+from html.parser import HTMLParser
+
+# Теги, текст внутри которых не виден пользователю
+_SKIP_TAGS = {"script", "style", "template", "svg", "noscript"}
+
+# id корневых контейнеров типичных SPA (React, Vue, Next.js, Nuxt, Gatsby)
+_APP_ROOT_IDS = {"root", "app", "__next", "__nuxt", "___gatsby"}
+
+# Если видимого текста меньше, а признаки SPA есть — страница рендерится в JS
+_JS_RENDERED_MAX_TEXT = 200
+
+# Заголовки, которые попадают в headings
+_HEADING_TAGS = {"h2", "h3"}
+
+# Больше ссылок с одной страницы не собираем
+MAX_LINKS = 1000
+
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+
+def sniff_charset(head: bytes) -> str:
+    """
+    Ищет кодировку в <meta charset> первых байтов документа.
+
+    Args:
+        head (bytes): Начало HTML-документа.
+
+    Returns:
+        str: Название кодировки или пустая строка.
+    """
+    match = _META_CHARSET_RE.search(head)
+    return match.group(1).decode("ascii") if match else ""
+
+
+def _normalize(text: str) -> str:
+    """
+    Схлопывает пробельные символы.
+    """
+    return " ".join(text.split())
+
+
+class PageExtractor(HTMLParser):
+    """
+    Потоковый парсер: извлекает title, h1 и первый абзац длиной не
+    меньше min_paragraph_length, meta description, а также признаки
+    JS-рендеринга. С collect_text=True дополнительно собирает весь
+    видимый текст, с collect_headings=True — тексты h2/h3 (не больше
+    max_headings), с collect_links=True — ссылки (href как в разметке),
+    <base href>, <link rel="canonical"> и запрет nofollow в meta robots.
+
+    Данные подаются через feed() частями по мере загрузки; как только
+    все поля найдены, done становится True и чтение можно прекратить.
+    """
+    def __init__(
+        self,
+        min_paragraph_length: int = 50,
+        collect_text: bool = False,
+        collect_headings: bool = False,
+        max_headings: int = 30,
+        collect_links: bool = False,
+    ):
+        super().__init__(convert_charrefs=True)
+        self.min_paragraph_length = min_paragraph_length
+        self.collect_text = collect_text
+        self.collect_headings = collect_headings
+        self.max_headings = max_headings
+        self.collect_links = collect_links
+        self._text_parts = []
+        self.title = ""
+        self.h1 = ""
+        self.first_paragraph = ""
+        self.meta_description = ""
+        self.headings = []
+        self.links = []
+        self.base_href = ""
+        self.canonical = ""
+        self.nofollow = False
+        self.visible_chars = 0
+        self.has_app_root = False
+        self.requires_javascript = False
+        self._skip_depth = 0
+        self._in_noscript = False
+        self._title_parts = None
+        self._h1_parts = None
+        self._h1_depth = 0
+        self._p_parts = None
+        self._heading_parts = None
+
+    @property
+    def done(self) -> bool:
+        """
+        Все поля найдены. При сборе полного текста, заголовков или ссылок
+        документ читается до конца. meta description стоит в head, до первого
+        абзаца, поэтому его отдельно не ждём.
+        """
+        if self.collect_text or self.collect_headings or self.collect_links:
+            return False
+        return bool(self.title and self.h1 and self.first_paragraph)
+
+    @property
+    def full_text(self) -> str:
+        """
+        Весь видимый текст страницы (только при collect_text=True).
+        """
+        return _normalize(" ".join(self._text_parts))
+
+    @property
+    def looks_js_rendered(self) -> bool:
+        """
+        Страница, судя по разметке, собирается JavaScript'ом на клиенте.
+        """
+        return self.visible_chars < _JS_RENDERED_MAX_TEXT and (self.has_app_root or self.requires_javascript)
+
+    def _finish_paragraph(self):
+        if self._p_parts is None:
+            return
+        text = _normalize("".join(self._p_parts))
+        self._p_parts = None
+        if not self.first_paragraph and len(text) >= self.min_paragraph_length:
+            self.first_paragraph = text
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skip_depth += 1
+            if tag == "noscript":
+                self._in_noscript = True
+            return
+        if self._skip_depth:
+            return
+        if tag in ("div", "main", "body") and not self.has_app_root:
+            element_id = dict(attrs).get("id")
+            if element_id in _APP_ROOT_IDS:
+                self.has_app_root = True
+        if tag == "meta":
+            attributes = dict(attrs)
+            name = (attributes.get("name") or "").lower()
+            if name == "description" and not self.meta_description:
+                self.meta_description = _normalize(attributes.get("content") or "")
+            elif name == "robots" and "nofollow" in (attributes.get("content") or "").lower():
+                self.nofollow = True
+        elif self.collect_links and tag in ("a", "link", "base"):
+            self._link(tag, dict(attrs))
+        elif tag == "title" and not self.title:
+            self._title_parts = []
+        elif tag == "h1":
+            if self._h1_parts is not None:
+                self._h1_depth += 1
+            elif not self.h1:
+                self._h1_parts = []
+                self._h1_depth = 1
+        elif tag == "p":
+            self._finish_paragraph()
+            if not self.first_paragraph:
+                self._p_parts = []
+        elif tag == "br" and self._p_parts is not None:
+            self._p_parts.append("\n")
+        elif tag in _HEADING_TAGS and self.collect_headings and len(self.headings) < self.max_headings:
+            self._heading_parts = []
+
+    def _link(self, tag: str, attributes: dict):
+        href = (attributes.get("href") or "").strip()
+        if not href:
+            return
+        rel = (attributes.get("rel") or "").lower().split()
+        if tag == "base":
+            self.base_href = self.base_href or href
+        elif tag == "link":
+            if "canonical" in rel and not self.canonical:
+                self.canonical = href
+        elif "nofollow" not in rel and len(self.links) < MAX_LINKS:
+            self.links.append(href)
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+            if tag == "noscript":
+                self._in_noscript = False
+            return
+        if self._skip_depth:
+            return
+        if tag == "title" and self._title_parts is not None:
+            self.title = _normalize("".join(self._title_parts))
+            self._title_parts = None
+        elif tag == "h1" and self._h1_parts is not None:
+            self._h1_depth -= 1
+            if self._h1_depth <= 0:
+                self.h1 = _normalize("".join(self._h1_parts))
+                self._h1_parts = None
+        elif tag == "p":
+            self._finish_paragraph()
+        elif tag in _HEADING_TAGS and self._heading_parts is not None:
+            text = _normalize("".join(self._heading_parts))
+            self._heading_parts = None
+            if text:
+                self.headings.append(text)
+
+    def handle_data(self, data):
+        if self._in_noscript and "javascript" in data.lower():
+            self.requires_javascript = True
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+            return
+        if self._skip_depth:
+            return
+        self.visible_chars += len(data.strip())
+        if self.collect_text:
+            self._text_parts.append(data)
+        if self._h1_parts is not None:
+            self._h1_parts.append(data)
+        if self._p_parts is not None:
+            self._p_parts.append(data)
+        if self._heading_parts is not None:
+            self._heading_parts.append(data)
+
+    def close(self):
+        super().close()
+        self._finish_paragraph()
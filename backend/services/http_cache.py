@@ -0,0 +1,285 @@
+"""
+Дисковый кэш HTTP-ответов с условными запросами (ETag / Last-Modified).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit
+from backend.config import settings
+from backend.services.metrics import metrics, service_stats
+from backend.startup import lazy_service
+
+
+class HttpCache:
+    """
+    Кэш страниц для HTTP-уровня парсера.
+
+    Для каждого URL на диске лежат валидаторы ответа (ETag,
+    Last-Modified), тело страницы и уже извлечённый из неё контент.
+    При повторном запросе парсер отправляет If-None-Match /
+    If-Modified-Since и на ответ 304 берёт извлечённый контент из кэша,
+    не скачивая и не разбирая страницу заново.
+
+    Размер каталога ограничен max_bytes: при превышении удаляются
+    записи, к которым дольше всего не обращались. Каталог может быть
+    общим для нескольких воркеров, поэтому перед вытеснением размер
+    пересчитывается по файлам, а счётчик процесса лишь решает, когда
+    это делать: при превышении лимита или раз в RESCAN_SECONDS. Пустой
+    cache_dir отключает кэш.
+    """
+    RESCAN_SECONDS = 10.0
+
+    def __init__(self, cache_dir: str = "", max_bytes: int = 0):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._scanned_at = time.monotonic()
+        self._evictions = 0
+        self._hosts = {}
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._bytes = sum(entry.stat().st_size for entry in os.scandir(self.cache_dir) if entry.is_file())
+
+    @property
+    def enabled(self) -> bool:
+        return self.cache_dir is not None
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _meta_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _body_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.body"
+
+    def lookup(self, url: str) -> Optional[dict]:
+        """
+        Возвращает запись кэша для URL и отмечает обращение к ней.
+
+        Args:
+            url (str): URL страницы.
+
+        Returns:
+            dict | None: Валидаторы, кодировка и извлечённый контент или None.
+        """
+        if not self.enabled:
+            return None
+        path = self._meta_path(self._key(url))
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    @staticmethod
+    def validators(entry: dict) -> dict:
+        """
+        Заголовки условного запроса для записи кэша.
+
+        Args:
+            entry (dict): Запись кэша.
+
+        Returns:
+            dict: If-None-Match и/или If-Modified-Since.
+        """
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def read_body(self, url: str) -> Optional[bytes]:
+        """
+        Читает сохранённое тело страницы.
+
+        Args:
+            url (str): URL страницы.
+
+        Returns:
+            bytes | None: Тело или None, если его нет.
+        """
+        try:
+            return self._body_path(self._key(url)).read_bytes()
+        except OSError:
+            return None
+
+    def store(self, url: str, entry: dict, body: Optional[bytes] = None):
+        """
+        Сохраняет запись кэша и, если передано, тело страницы.
+
+        Args:
+            url (str): URL страницы.
+            entry (dict): Валидаторы, кодировка, извлечённый контент.
+            body (bytes | None): Тело страницы.
+        """
+        if not self.enabled:
+            return
+        key = self._key(url)
+        written = self._write(self._meta_path(key), json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+        if body is not None:
+            written += self._write(self._body_path(key), body)
+        with self._lock:
+            self._bytes += written
+            over_limit = self.max_bytes and (
+                self._bytes > self.max_bytes or time.monotonic() - self._scanned_at > self.RESCAN_SECONDS
+            )
+        if over_limit:
+            self._evict()
+
+    def _write(self, path: Path, data: bytes) -> int:
+        """
+        Атомарно записывает файл.
+
+        Returns:
+            int: Изменение размера кэша в байтах.
+        """
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            old_size = path.stat().st_size if path.exists() else 0
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return 0
+        return len(data) - old_size
+
+    def _remove(self, path: Path):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            self._bytes -= size
+
+    def _evict(self):
+        """
+        Пересчитывает размер каталога и, если он больше лимита, удаляет
+        записи, к которым дольше всего не обращались, пока размер не
+        опустится до 90% лимита.
+        """
+        total = 0
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            try:
+                stat = entry.stat()
+            except OSError:
+                # Файл успел удалить другой воркер
+                continue
+            total += stat.st_size
+            if entry.name.endswith(".json"):
+                entries.append((stat.st_mtime, entry.name[:-len(".json")]))
+        with self._lock:
+            self._bytes = total
+            self._scanned_at = time.monotonic()
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        for _, key in sorted(entries):
+            if self._bytes <= target:
+                break
+            self._remove(self._meta_path(key))
+            self._remove(self._body_path(key))
+            with self._lock:
+                self._evictions += 1
+
+    def record(
+        self,
+        url: str,
+        not_modified: bool,
+        conditional: bool = False,
+        bytes_downloaded: int = 0,
+        bytes_saved: int = 0,
+        parse_seconds_saved: float = 0.0,
+    ):
+        """
+        Учитывает запрос в статистике хоста.
+
+        Args:
+            url (str): URL страницы.
+            not_modified (bool): Сервер ответил 304.
+            conditional (bool): Запрос был условным.
+            bytes_downloaded (int): Скачано байт тела.
+            bytes_saved (int): Не скачано байт благодаря 304.
+            parse_seconds_saved (float): Сэкономленное время разбора.
+        """
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            stats = self._hosts.setdefault(host, {
+                "requests": 0,
+                "conditional": 0,
+                "not_modified": 0,
+                "bytes_downloaded": 0,
+                "bytes_saved": 0,
+                "parse_seconds_saved": 0.0,
+            })
+            stats["requests"] += 1
+            stats["conditional"] += int(conditional)
+            stats["not_modified"] += int(not_modified)
+            stats["bytes_downloaded"] += bytes_downloaded
+            stats["bytes_saved"] += bytes_saved
+            stats["parse_seconds_saved"] += parse_seconds_saved
+
+    def stats(self) -> dict:
+        """
+        Возвращает размер кэша, общие счётчики и счётчики по хостам.
+
+        Returns:
+            dict: Статистика кэша.
+        """
+        with self._lock:
+            hosts = {host: dict(stats, parse_seconds_saved=round(stats["parse_seconds_saved"], 4))
+                     for host, stats in self._hosts.items()}
+            totals = {
+                field: sum(stats[field] for stats in self._hosts.values())
+                for field in ("requests", "conditional", "not_modified", "bytes_downloaded", "bytes_saved")
+            }
+            totals["parse_seconds_saved"] = round(sum(stats["parse_seconds_saved"] for stats in self._hosts.values()), 4)
+            return {
+                "enabled": self.enabled,
+                "disk_bytes": self._bytes,
+                "evictions": self._evictions,
+                **totals,
+                "hosts": hosts,
+            }
+
+
+@lazy_service
+def get_http_cache() -> HttpCache:
+    return HttpCache(
+        cache_dir=settings.PARSER_HTTP_CACHE_DIR,
+        max_bytes=settings.PARSER_HTTP_CACHE_MAX_MB * 1024 * 1024,
+    )
+
+
+def _request_counts() -> dict:
+    stats = service_stats(get_http_cache)
+    if not stats:
+        return {}
+    return {
+        ("not_modified",): stats["not_modified"],
+        ("downloaded",): stats["requests"] - stats["not_modified"],
+    }
+
+
+metrics.gauge(
+    "http_cache_requests_total",
+    "Запросы HTTP-уровня парсера: not_modified — ответ 304 из кэша",
+    _request_counts,
+    ("result",),
+    type_name="counter",
+)
+metrics.gauge(
+    "http_cache_bytes_saved_total", "Байт, не скачанных благодаря 304",
+    lambda: service_stats(get_http_cache).get("bytes_saved"), type_name="counter",
+)
+metrics.gauge("http_cache_disk_bytes", "Размер HTTP-кэша на диске", lambda: service_stats(get_http_cache).get("disk_bytes"))
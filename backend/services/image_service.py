@@ -0,0 +1,166 @@
+"""
+Подготовка изображений к анализу: уменьшение, перекодирование, перцептивный хэш.
+"""
+import io
+from typing import TYPE_CHECKING, Tuple
+from backend.config import settings
+from backend.startup import lazy_service
+
+if TYPE_CHECKING:
+    # Pillow импортируется при обработке первого изображения
+    from PIL import Image
+
+# Форматы, в которые перекодируется изображение, и их MIME-типы
+OUTPUT_FORMATS = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+
+def dhash(image: "Image.Image", size: int = 8) -> str:
+    """
+    Разностный перцептивный хэш (dHash): изображение уменьшается до
+    (size + 1) x size в оттенках серого, каждый бит — сравнение соседних
+    пикселей по горизонтали. Пересжатие, изменение размера и мелкие
+    правки его не меняют.
+
+    Args:
+        image (Image.Image): Изображение.
+        size (int): Сторона хэша; size * size бит.
+
+    Returns:
+        str: Хэш в hex.
+    """
+    from PIL import Image
+
+    small = image.convert("L").resize((size + 1, size), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:0{size * size // 4}x}"
+
+
+def hamming(first: str, second: str) -> int:
+    """
+    Число различающихся бит двух хэшей в hex.
+    """
+    return bin(int(first, 16) ^ int(second, 16)).count("1")
+
+
+class ImageService:
+    """
+    Готовит загруженное изображение к отправке в модель: поворачивает по
+    EXIF, уменьшает до max_side по большей стороне, перекодирует в
+    output_format с заданным качеством без метаданных (EXIF, ICC, XMP)
+    и считает перцептивные хэши: короткий dHash находит в кэше кандидатов
+    среди почти одинаковых баннеров, подробный (DETAIL_HASH_SIZE)
+    подтверждает совпадение.
+    """
+    DETAIL_HASH_SIZE = 16
+
+    def __init__(
+        self,
+        max_side: int = settings.IMAGE_MAX_SIDE,
+        output_format: str = settings.IMAGE_FORMAT,
+        quality: int = settings.IMAGE_QUALITY,
+        max_pixels: int = settings.IMAGE_MAX_PIXELS,
+    ):
+        output_format = output_format.upper()
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Неподдерживаемый формат изображения: {output_format}")
+        self.max_side = max_side
+        self.output_format = output_format
+        self.quality = quality
+        self.max_pixels = max_pixels
+
+    def _open(self, image_bytes: bytes) -> Tuple["Image.Image", str]:
+        """
+        Открывает изображение с защитой от «бомб» распаковки.
+
+        Raises:
+            ValueError: Если файл не является изображением или слишком велик.
+
+        Returns:
+            tuple: Изображение и его исходный размер "ШxВ".
+        """
+        from PIL import Image, ImageOps
+
+        try:
+            image = Image.open(io.BytesIO(image_bytes))
+        except Exception:
+            raise ValueError("Не удалось прочитать изображение")
+        width, height = image.size
+        if width * height > self.max_pixels:
+            raise ValueError(f"Слишком большое разрешение: {width}x{height}")
+        # JPEG можно декодировать сразу в уменьшенном масштабе (1/2, 1/4, 1/8)
+        image.draft("RGB", (self.max_side, self.max_side))
+        try:
+            image.load()
+        except Exception:
+            raise ValueError("Не удалось прочитать изображение")
+        return ImageOps.exif_transpose(image), f"{width}x{height}"
+
+    def _flatten(self, image: "Image.Image") -> "Image.Image":
+        """
+        Приводит изображение к режиму, который поддерживает выходной формат;
+        для JPEG прозрачность накладывается на белый фон.
+        """
+        from PIL import Image
+
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        if self.output_format == "JPEG":
+            if has_alpha:
+                rgba = image.convert("RGBA")
+                background = Image.new("RGB", rgba.size, (255, 255, 255))
+                background.paste(rgba, mask=rgba.getchannel("A"))
+                return background
+            return image.convert("RGB")
+        return image.convert("RGBA" if has_alpha else "RGB")
+
+    def preprocess(self, image_bytes: bytes) -> dict:
+        """
+        Уменьшает, перекодирует изображение и считает его перцептивный хэш.
+
+        Args:
+            image_bytes (bytes): Загруженное изображение.
+
+        Raises:
+            ValueError: Если файл не является изображением или слишком велик.
+
+        Returns:
+            dict: data (bytes), content_type, width, height,
+                original_bytes, original_size ("ШxВ"), phash и
+                fingerprint (phash, подробный хэш detail и пропорции aspect).
+        """
+        from PIL import Image
+
+        image, original_size = self._open(image_bytes)
+        image = self._flatten(image)
+        gray = image.convert("L")
+        phash = dhash(gray)
+        fingerprint = {
+            "phash": phash,
+            "detail": dhash(gray, self.DETAIL_HASH_SIZE),
+            "aspect": round(image.width / image.height, 4),
+        }
+        image.thumbnail((self.max_side, self.max_side), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        save_options = {"optimize": True}
+        if self.output_format in ("JPEG", "WEBP"):
+            save_options["quality"] = self.quality
+        image.save(buffer, format=self.output_format, **save_options)
+        return {
+            "data": buffer.getvalue(),
+            "content_type": OUTPUT_FORMATS[self.output_format],
+            "width": image.width,
+            "height": image.height,
+            "original_bytes": len(image_bytes),
+            "original_size": original_size,
+            "phash": phash,
+            "fingerprint": fingerprint,
+        }
+
+
+@lazy_service
+def get_image_service() -> ImageService:
+    return ImageService()
@@ -0,0 +1,430 @@
+"""
+Фоновые задачи: очередь с приоритетами, повторами и хранением в SQLite.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from backend.config import settings
+from backend.services.analysis_service import AnalysisService, get_analysis_service
+from backend.services.sqlite_store import SQLiteStore, now_timestamp
+from backend.startup import lazy_service
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_after TEXT NOT NULL,
+    lease_until TEXT,
+    lease_token TEXT,
+    result TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, priority DESC, run_after, created_at);
+"""
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = ("text", "parse")
+FINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+def _shift(seconds: float) -> str:
+    """
+    Время через seconds секунд в формате базы.
+    """
+    return (datetime.now() + timedelta(seconds=seconds)).isoformat(timespec="microseconds")
+
+
+class JobService:
+    """
+    Очередь задач «парсинг + анализ» и «анализ текста».
+
+    Задачи хранятся в SQLite, поэтому очередь переживает перезапуск.
+    Воркеры забирают задачу атомарно (BEGIN IMMEDIATE) по приоритету —
+    больше значит раньше — и держат её под арендой lease_until, которую
+    продлевают, пока задача выполняется. Если процесс упал посреди
+    выполнения, после окончания аренды задачу заберёт другой воркер.
+    Каждый захват получает свой lease_token, и итог сохраняется, только
+    если аренда всё ещё у этого захвата: потерявший аренду воркер не
+    перезапишет результат нового. Неудачная попытка повторяется с
+    экспоненциальной задержкой, пока не исчерпано max_attempts.
+    """
+    def __init__(
+        self,
+        analysis: Optional[AnalysisService] = None,
+        db_path: str = settings.JOBS_DB_PATH,
+        workers: int = settings.JOB_WORKERS,
+        max_attempts: int = settings.JOB_MAX_ATTEMPTS,
+        retry_delay: float = settings.JOB_RETRY_DELAY,
+        lease_seconds: float = settings.JOB_LEASE_SECONDS,
+        poll_interval: float = settings.JOB_POLL_INTERVAL,
+    ):
+        self._analysis = analysis
+        self.store = SQLiteStore(db_path)
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._initialized = False
+
+    @property
+    def analysis(self) -> AnalysisService:
+        # Сервис анализа (а с ним парсер и клиент модели) создаётся при
+        # первой задаче, а не при запуске воркеров
+        if self._analysis is None:
+            self._analysis = get_analysis_service()
+        return self._analysis
+
+    def initialize(self):
+        """
+        Создаёт схему базы задач.
+        """
+        if not self._initialized:
+            conn = self.store.connect()
+            conn.executescript(_SCHEMA)
+            # Базы ранних версий: колонка токена аренды
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "lease_token" not in columns:
+                try:
+                    conn.execute("ALTER TABLE jobs ADD COLUMN lease_token TEXT")
+                except sqlite3.OperationalError:
+                    # Колонку уже добавил другой процесс
+                    pass
+            self._initialized = True
+
+    async def start(self):
+        """
+        Запускает воркеры в текущем event loop.
+        """
+        await asyncio.to_thread(self.initialize)
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """
+        Останавливает воркеры. Незавершённые задачи вернутся в очередь
+        после окончания аренды.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def submit(self, kind: str, payload: dict, priority: int = 0, max_attempts: Optional[int] = None) -> dict:
+        """
+        Ставит задачу в очередь.
+
+        Args:
+            kind (str): Тип задачи: "text" или "parse".
+            payload (dict): Данные задачи ({"text": ...} или {"url": ...}).
+            priority (int): Приоритет; больше — раньше.
+            max_attempts (int | None): Число попыток; по умолчанию JOB_MAX_ATTEMPTS.
+
+        Raises:
+            ValueError: Если тип задачи неизвестен.
+
+        Returns:
+            dict: Созданная задача.
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Неизвестный тип задачи: {kind}")
+        self.initialize()
+        now = now_timestamp()
+        job_id = str(uuid.uuid4())
+        self.store.connect().execute(
+            "INSERT INTO jobs (id, kind, payload, priority, status, max_attempts, run_after, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(payload, ensure_ascii=False), priority,
+             max_attempts or self.max_attempts, now, now, now),
+        )
+        return self.get(job_id)
+
+    async def submit_async(self, kind: str, payload: dict, priority: int = 0, max_attempts: Optional[int] = None) -> dict:
+        """
+        Асинхронно ставит задачу в очередь и будит воркеры.
+
+        Returns:
+            dict: Созданная задача.
+        """
+        job = await asyncio.to_thread(self.submit, kind, payload, priority, max_attempts)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        Возвращает задачу по идентификатору.
+
+        Args:
+            job_id (str): Идентификатор задачи.
+
+        Returns:
+            dict | None: Задача или None, если не найдена.
+        """
+        self.initialize()
+        row = self.store.connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """
+        Ждёт завершения задачи не дольше timeout секунд (long polling).
+
+        Args:
+            job_id (str): Идентификатор задачи.
+            timeout (float): Максимальное ожидание в секундах.
+
+        Returns:
+            dict | None: Текущее состояние задачи.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await asyncio.to_thread(self.get, job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in FINAL_STATUSES or remaining <= 0:
+                return job
+            event = self._finished.setdefault(job_id, asyncio.Event())
+            try:
+                # Событие срабатывает, если задачу выполнил этот процесс;
+                # раз в poll_interval перечитываем базу на случай других процессов
+                await asyncio.wait_for(event.wait(), min(remaining, self.poll_interval))
+            except asyncio.TimeoutError:
+                # Задачу может выполнить другой процесс или она не завершится
+                # вовсе: событие не должно оставаться в словаре навсегда.
+                # Другие ожидающие той же задачи создадут его заново
+                if self._finished.get(job_id) is event:
+                    del self._finished[job_id]
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> list:
+        """
+        Возвращает последние задачи.
+
+        Args:
+            status (str | None): Фильтр по статусу.
+            limit (int): Максимум задач.
+
+        Returns:
+            list: Задачи от новых к старым.
+        """
+        self.initialize()
+        if status:
+            rows = self.store.connect().execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+            ).fetchall()
+        else:
+            rows = self.store.connect().execute(
+                "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Отменяет задачу, ещё не взятую в работу.
+
+        Args:
+            job_id (str): Идентификатор задачи.
+
+        Returns:
+            bool: True, если задача была в очереди и отменена.
+        """
+        self.initialize()
+        cursor = self.store.connect().execute(
+            "UPDATE jobs SET status = 'cancelled', updated_at = ? WHERE id = ? AND status = 'queued'",
+            (now_timestamp(), job_id),
+        )
+        return cursor.rowcount > 0
+
+    def _claim(self) -> Optional[dict]:
+        """
+        Атомарно забирает самую приоритетную готовую задачу.
+
+        Задача с истёкшей арендой, исчерпавшая попытки, завершается
+        ошибкой, а не забирается снова: иначе задача, которая роняет или
+        вешает процесс, ходила бы по воркерам бесконечно.
+
+        Returns:
+            dict | None: Задача или None, если очередь пуста.
+        """
+        now = now_timestamp()
+        with self.store.transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, lease_until = NULL, lease_token = NULL, updated_at = ? "
+                "WHERE status = 'running' AND lease_until < ? AND attempts >= max_attempts",
+                ("Аренда истекла на последней попытке: воркер остановился или завис", now, now),
+            )
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE (status = 'queued' AND run_after <= ?) "
+                "OR (status = 'running' AND lease_until < ?) "
+                "ORDER BY priority DESC, run_after, created_at LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, lease_token = ?, "
+                "updated_at = ? WHERE id = ?",
+                (_shift(self.lease_seconds), uuid.uuid4().hex, now, row["id"]),
+            )
+            return self._to_dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+
+    def _renew(self, job: dict) -> bool:
+        """
+        Продлевает аренду выполняющейся задачи.
+
+        Returns:
+            bool: False, если аренда уже потеряна (задачу забрал другой воркер).
+        """
+        cursor = self.store.connect().execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running' AND lease_token = ?",
+            (_shift(self.lease_seconds), job["id"], job["lease_token"]),
+        )
+        return cursor.rowcount > 0
+
+    def _finish(self, job: dict, result: Optional[dict], error: Optional[str]) -> bool:
+        """
+        Сохраняет итог попытки: успех, повтор с задержкой или окончательную ошибку.
+
+        Returns:
+            bool: False, если аренда потеряна и итог не сохранён.
+        """
+        now = now_timestamp()
+        conn = self.store.connect()
+        owned = "WHERE id = ? AND status = 'running' AND lease_token = ?"
+        if error is None:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'succeeded', result = ?, error = NULL, lease_until = NULL, "
+                f"lease_token = NULL, updated_at = ? {owned}",
+                (json.dumps(result, ensure_ascii=False, default=str), now, job["id"], job["lease_token"]),
+            )
+        elif job["attempts"] < job["max_attempts"]:
+            delay = self.retry_delay * 2 ** (job["attempts"] - 1)
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', error = ?, run_after = ?, lease_until = NULL, "
+                f"lease_token = NULL, updated_at = ? {owned}",
+                (error, _shift(delay), now, job["id"], job["lease_token"]),
+            )
+        else:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, lease_until = NULL, "
+                f"lease_token = NULL, updated_at = ? {owned}",
+                (error, now, job["id"], job["lease_token"]),
+            )
+        return cursor.rowcount > 0
+
+    async def _keep_lease(self, job: dict, work: asyncio.Task) -> bool:
+        """
+        Продлевает аренду каждую треть её срока, пока задача выполняется.
+        Если аренда потеряна, выполнение прерывается: задачу уже
+        выполняет другой воркер.
+
+        Returns:
+            bool: True, если аренда потеряна.
+        """
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                owned = await asyncio.to_thread(self._renew, job)
+            except Exception:
+                # База временно недоступна: попробуем на следующем шаге
+                continue
+            if not owned:
+                work.cancel()
+                return True
+
+    async def _execute(self, job: dict):
+        """
+        Выполняет задачу через AnalysisService и сохраняет результат,
+        продлевая аренду на всё время выполнения.
+        """
+        if job["kind"] == "text":
+            work = asyncio.create_task(self.analysis.analyze_text(job["payload"]["text"]))
+        else:
+            work = asyncio.create_task(
+                self.analysis.parse_and_analyze(job["payload"]["url"], job["payload"].get("deep", False))
+            )
+        keeper = asyncio.create_task(self._keep_lease(job, work))
+        try:
+            response = await work
+            result = response.model_dump(mode="json")
+            error = None if response.success else (response.error or "Неизвестная ошибка")
+        except asyncio.CancelledError:
+            if keeper.done() and not keeper.cancelled() and keeper.result():
+                # Аренда потеряна: итог сохранит воркер, забравший задачу
+                return
+            # Останавливают сам воркер: задача вернётся в очередь по аренде
+            work.cancel()
+            raise
+        except Exception as e:
+            result, error = None, str(e)
+        finally:
+            keeper.cancel()
+        try:
+            await asyncio.to_thread(self._finish, job, result, error)
+        except Exception:
+            # Итог не сохранён (например, база занята): задача вернётся
+            # в очередь по аренде, воркер продолжает работу
+            logger.exception("Не удалось сохранить итог задачи %s", job["id"])
+        event = self._finished.pop(job["id"], None)
+        if event is not None:
+            event.set()
+
+    async def _worker(self):
+        """
+        Цикл воркера: забрать задачу, выполнить, повторить; без задач —
+        ждать новой постановки или poll_interval.
+        """
+        while True:
+            try:
+                job = await asyncio.to_thread(self._claim)
+            except Exception:
+                logger.exception("Не удалось забрать задачу из очереди")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            try:
+                await self._execute(job)
+            except Exception:
+                logger.exception("Сбой выполнения задачи %s", job["id"])
+
+    def stats(self) -> dict:
+        """
+        Возвращает число задач по статусам.
+
+        Returns:
+            dict: Статус -> количество.
+        """
+        self.initialize()
+        rows = self.store.connect().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+@lazy_service
+def get_job_service() -> JobService:
+    return JobService()
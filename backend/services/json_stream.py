@@ -0,0 +1,79 @@
+"""
+Инкрементальный разбор JSON-объекта, который модель выдаёт по частям.
+"""
+import json
+from typing import List, Tuple
+
+
+class JsonSectionParser:
+    """
+    Принимает фрагменты JSON-объекта верхнего уровня по мере генерации и
+    возвращает его поля (секции), как только значение поля закончилось.
+
+    Отслеживаются только глубина вложенности и строки: каждое поле
+    верхнего уровня разбирается json.loads целиком, когда встречается
+    запятая или закрывающая скобка на первом уровне. Текст до первой «{»
+    (например, ```json) пропускается.
+    """
+    def __init__(self):
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member: List[str] = []
+        self.finished = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, object]]:
+        """
+        Передаёт очередной фрагмент ответа модели.
+
+        Args:
+            chunk (str): Фрагмент текста.
+
+        Raises:
+            ValueError: Если завершённое поле не является корректным JSON.
+
+        Returns:
+            list: Пары (имя поля, значение) для полей, завершённых этим фрагментом.
+        """
+        sections = []
+        for char in chunk:
+            if self.finished:
+                break
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                continue
+            if self._in_string:
+                self._member.append(char)
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in "[{":
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.finished = True
+                    sections.extend(self._flush())
+                    continue
+            elif char == "," and self._depth == 1:
+                sections.extend(self._flush())
+                continue
+            self._member.append(char)
+        return sections
+
+    def _flush(self) -> List[Tuple[str, object]]:
+        member = "".join(self._member).strip()
+        self._member = []
+        if not member:
+            return []
+        try:
+            return list(json.loads("{" + member + "}").items())
+        except ValueError:
+            raise ValueError(f"Некорректный фрагмент JSON: {member[:100]}")
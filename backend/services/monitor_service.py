@@ -0,0 +1,390 @@
+"""
+Мониторинг конкурентов: периодический парсинг с анализом только изменившихся страниц.
+"""
+import asyncio
+import hashlib
+import os
+import socket
+import uuid
+from datetime import datetime
+from typing import List, Optional
+from backend.config import settings
+from backend.models.schemas import HistoryItem
+from backend.services.analysis_service import AnalysisService, get_analysis_service
+from backend.services.cache_service import normalize_text
+from backend.services.shared_store import SharedStore, shared_store
+from backend.services.sqlite_store import SQLiteStore, now_timestamp
+from backend.startup import lazy_service
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS monitors (
+    id TEXT PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    interval_seconds INTEGER NOT NULL,
+    full_text INTEGER NOT NULL DEFAULT 0,
+    fingerprint TEXT,
+    next_run_at TEXT NOT NULL,
+    last_checked_at TEXT,
+    last_changed_at TEXT,
+    last_error TEXT,
+    checks INTEGER NOT NULL DEFAULT 0,
+    changes INTEGER NOT NULL DEFAULT 0,
+    unchanged_history_id TEXT,
+    unchanged_count INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_monitors_next_run ON monitors(next_run_at);
+"""
+
+
+def fingerprint(parsed: dict, full_text: bool = False) -> str:
+    """
+    Хэш извлечённого контента страницы: title, h1 и первый абзац
+    или, с full_text=True, весь видимый текст.
+
+    Args:
+        parsed (dict): Результат ParserService.parse().
+        full_text (bool): Учитывать весь текст страницы.
+
+    Returns:
+        str: sha256 нормализованного контента.
+    """
+    if full_text:
+        parts = [parsed.get("title", ""), parsed.get("full_text", "")]
+    else:
+        parts = [parsed.get("title", ""), parsed.get("h1", ""), parsed.get("first_paragraph", "")]
+    digest = hashlib.sha256()
+    for part in parts:
+        data = normalize_text(part).encode("utf-8")
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class MonitorService:
+    """
+    Планировщик мониторинга зарегистрированных URL.
+
+    Каждый URL перепарсивается со своим интервалом. Модель вызывается,
+    только если отпечаток контента изменился; неизменившаяся страница
+    стоит одного HTTP-запроса. Подряд идущие проверки без изменений
+    записываются в историю одной записью типа "monitor" со счётчиком.
+
+    Срок следующей проверки сдвигается в момент, когда планировщик
+    забирает URL (BEGIN IMMEDIATE), поэтому при нескольких процессах
+    страница не проверяется дважды. С общим хранилищем (shared)
+    проверки запускает только процесс, держащий аренду планировщика,
+    так что MONITOR_CONCURRENCY — лимит на все воркеры; если процесс
+    завершится, аренду через LEASE_POLLS опросов заберёт другой.
+    """
+    LEASE_NAME = "monitor_scheduler"
+    LEASE_POLLS = 3
+
+    def __init__(
+        self,
+        analysis: Optional[AnalysisService] = None,
+        db_path: str = settings.MONITORS_DB_PATH,
+        min_interval: int = settings.MONITOR_MIN_INTERVAL,
+        concurrency: int = settings.MONITOR_CONCURRENCY,
+        poll_interval: float = settings.MONITOR_POLL_INTERVAL,
+        shared: Optional[SharedStore] = None,
+    ):
+        self._analysis = analysis
+        self.store = SQLiteStore(db_path)
+        self.min_interval = min_interval
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.shared = shared
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._task: Optional[asyncio.Task] = None
+        self._running = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._initialized = False
+
+    @property
+    def analysis(self) -> AnalysisService:
+        # Сервис анализа (а с ним парсер и клиент модели) создаётся при
+        # первой проверке, а не при запуске воркеров
+        if self._analysis is None:
+            self._analysis = get_analysis_service()
+        return self._analysis
+
+    def initialize(self):
+        """
+        Создаёт схему базы мониторинга.
+        """
+        if not self._initialized:
+            self.store.connect().executescript(_SCHEMA)
+            self._initialized = True
+
+    async def start(self):
+        """
+        Запускает планировщик в текущем event loop.
+        """
+        await asyncio.to_thread(self.initialize)
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._scheduler())
+
+    async def stop(self):
+        """
+        Останавливает планировщик и текущие проверки.
+        """
+        tasks = list(self._running)
+        if self._task is not None:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        if self.shared is not None:
+            await asyncio.to_thread(self.shared.release_lease, self.LEASE_NAME, self.owner)
+
+    def add(self, url: str, interval_seconds: int, full_text: bool = False) -> dict:
+        """
+        Регистрирует URL для мониторинга или обновляет его настройки.
+        Первая проверка выполняется сразу.
+
+        Args:
+            url (str): URL сайта.
+            interval_seconds (int): Интервал между проверками в секундах.
+            full_text (bool): Отслеживать изменения всего текста страницы.
+
+        Raises:
+            ValueError: Если интервал меньше MONITOR_MIN_INTERVAL.
+
+        Returns:
+            dict: Монитор.
+        """
+        if interval_seconds < self.min_interval:
+            raise ValueError(f"Интервал должен быть не меньше {self.min_interval} секунд")
+        url = url.strip()
+        if not url.startswith("http"):
+            url = "https://" + url
+        self.initialize()
+        now = now_timestamp()
+        self.store.connect().execute(
+            "INSERT INTO monitors (id, url, interval_seconds, full_text, next_run_at, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(url) DO UPDATE SET interval_seconds = excluded.interval_seconds, "
+            "full_text = excluded.full_text, next_run_at = excluded.next_run_at",
+            (str(uuid.uuid4()), url, interval_seconds, int(full_text), now, now),
+        )
+        row = self.store.connect().execute("SELECT * FROM monitors WHERE url = ?", (url,)).fetchone()
+        return dict(row)
+
+    async def add_async(self, url: str, interval_seconds: int, full_text: bool = False) -> dict:
+        """
+        Асинхронно регистрирует URL и будит планировщик.
+
+        Returns:
+            dict: Монитор.
+        """
+        monitor = await asyncio.to_thread(self.add, url, interval_seconds, full_text)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return monitor
+
+    def get(self, monitor_id: str) -> Optional[dict]:
+        """
+        Возвращает монитор по идентификатору.
+
+        Args:
+            monitor_id (str): Идентификатор монитора.
+
+        Returns:
+            dict | None: Монитор или None, если не найден.
+        """
+        self.initialize()
+        row = self.store.connect().execute("SELECT * FROM monitors WHERE id = ?", (monitor_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_monitors(self) -> List[dict]:
+        """
+        Возвращает все мониторы в порядке ближайшей проверки.
+
+        Returns:
+            list: Мониторы.
+        """
+        self.initialize()
+        rows = self.store.connect().execute("SELECT * FROM monitors ORDER BY next_run_at").fetchall()
+        return [dict(row) for row in rows]
+
+    def remove(self, monitor_id: str) -> bool:
+        """
+        Удаляет монитор.
+
+        Args:
+            monitor_id (str): Идентификатор монитора.
+
+        Returns:
+            bool: True, если монитор был удалён.
+        """
+        self.initialize()
+        cursor = self.store.connect().execute("DELETE FROM monitors WHERE id = ?", (monitor_id,))
+        return cursor.rowcount > 0
+
+    def run_now(self, monitor_id: str) -> bool:
+        """
+        Назначает внеочередную проверку монитора.
+
+        Args:
+            monitor_id (str): Идентификатор монитора.
+
+        Returns:
+            bool: True, если монитор найден.
+        """
+        self.initialize()
+        cursor = self.store.connect().execute(
+            "UPDATE monitors SET next_run_at = ? WHERE id = ?", (now_timestamp(), monitor_id)
+        )
+        return cursor.rowcount > 0
+
+    async def run_now_async(self, monitor_id: str) -> bool:
+        """
+        Асинхронно назначает внеочередную проверку и будит планировщик.
+
+        Returns:
+            bool: True, если монитор найден.
+        """
+        found = await asyncio.to_thread(self.run_now, monitor_id)
+        if found and self._wakeup is not None:
+            self._wakeup.set()
+        return found
+
+    def _claim_due(self, limit: int) -> List[dict]:
+        """
+        Атомарно забирает мониторы, срок проверки которых наступил,
+        и сразу назначает им следующую проверку.
+
+        Args:
+            limit (int): Максимум мониторов.
+
+        Returns:
+            list: Мониторы для проверки.
+        """
+        now = datetime.now()
+        with self.store.transaction() as conn:
+            rows = conn.execute(
+                "SELECT * FROM monitors WHERE next_run_at <= ? ORDER BY next_run_at LIMIT ?",
+                (now.isoformat(timespec="microseconds"), limit),
+            ).fetchall()
+            for row in rows:
+                next_run = datetime.fromtimestamp(now.timestamp() + row["interval_seconds"])
+                conn.execute(
+                    "UPDATE monitors SET next_run_at = ? WHERE id = ?",
+                    (next_run.isoformat(timespec="microseconds"), row["id"]),
+                )
+        return [dict(row) for row in rows]
+
+    def _record_error(self, monitor: dict, error: str):
+        self.store.connect().execute(
+            "UPDATE monitors SET last_checked_at = ?, last_error = ?, checks = checks + 1 WHERE id = ?",
+            (now_timestamp(), error, monitor["id"]),
+        )
+
+    def _record_change(self, monitor: dict, new_fingerprint: str):
+        now = now_timestamp()
+        self.store.connect().execute(
+            "UPDATE monitors SET fingerprint = ?, last_checked_at = ?, last_changed_at = ?, last_error = NULL, "
+            "checks = checks + 1, changes = changes + 1, unchanged_history_id = NULL, unchanged_count = 0 "
+            "WHERE id = ?",
+            (new_fingerprint, now, now, monitor["id"]),
+        )
+
+    def _record_unchanged(self, monitor: dict) -> HistoryItem:
+        """
+        Отмечает проверку без изменений. Подряд идущие такие проверки
+        обновляют одну запись истории вместо новой на каждую.
+
+        Returns:
+            HistoryItem: Запись истории для сохранения.
+        """
+        history_id = monitor["unchanged_history_id"] or str(uuid.uuid4())
+        count = monitor["unchanged_count"] + 1
+        self.store.connect().execute(
+            "UPDATE monitors SET last_checked_at = ?, last_error = NULL, checks = checks + 1, "
+            "unchanged_history_id = ?, unchanged_count = ? WHERE id = ?",
+            (now_timestamp(), history_id, count, monitor["id"]),
+        )
+        return HistoryItem(
+            id=history_id,
+            timestamp=datetime.now(),
+            request_type="monitor",
+            request_summary=monitor["url"],
+            response_summary=f"Без изменений (проверок подряд: {count})",
+        )
+
+    async def check(self, monitor: dict) -> bool:
+        """
+        Проверяет страницу монитора и анализирует её, если контент изменился.
+
+        Args:
+            monitor (dict): Монитор.
+
+        Returns:
+            bool: True, если контент изменился и был проанализирован.
+        """
+        full_text = bool(monitor["full_text"])
+        parsed = await self.analysis.parser.parse_async(monitor["url"], full_text=full_text)
+        if parsed["error"]:
+            await asyncio.to_thread(self._record_error, monitor, parsed["error"])
+            return False
+        new_fingerprint = fingerprint(parsed, full_text)
+        if new_fingerprint == monitor["fingerprint"]:
+            item = await asyncio.to_thread(self._record_unchanged, monitor)
+            await self.analysis.history.save_history_async(item)
+            return False
+        response = await self.analysis.analyze_parsed(monitor["url"], parsed, deep=full_text)
+        if not response.success:
+            await asyncio.to_thread(self._record_error, monitor, response.error or "Неизвестная ошибка")
+            return False
+        await asyncio.to_thread(self._record_change, monitor, new_fingerprint)
+        return True
+
+    async def _check_safely(self, monitor: dict, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            try:
+                await self.check(monitor)
+            except Exception as e:
+                await asyncio.to_thread(self._record_error, monitor, str(e))
+
+    def _is_leader(self) -> bool:
+        """
+        Берёт или продлевает аренду планировщика; без общего хранилища
+        планировщик процесса работает всегда.
+        """
+        if self.shared is None:
+            return True
+        return self.shared.acquire_lease(self.LEASE_NAME, self.owner, self.poll_interval * self.LEASE_POLLS)
+
+    async def _scheduler(self):
+        """
+        Цикл планировщика: раз в poll_interval (или сразу после
+        изменения списка) забирает наступившие проверки и выполняет их
+        не больше concurrency одновременно.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        running = self._running
+        while True:
+            free = self.concurrency - len(running)
+            due = []
+            try:
+                # Аренда продлевается на каждом шаге, даже когда слотов нет
+                if await asyncio.to_thread(self._is_leader) and free > 0:
+                    due = await asyncio.to_thread(self._claim_due, free)
+            except Exception:
+                due = []
+            for monitor in due:
+                task = asyncio.create_task(self._check_safely(monitor, semaphore))
+                running.add(task)
+                task.add_done_callback(running.discard)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+
+@lazy_service
+def get_monitor_service() -> MonitorService:
+    return MonitorService(shared=shared_store())
@@ -1,20 +1,238 @@
 """
 Сервис для работы с OpenAI API.
 """
+import asyncio
 import base64
+import hashlib
 import json
-from openai import OpenAI
+import threading
+import time
+from typing import Any, AsyncIterator, Optional, Tuple
 from backend.config import settings
 from backend.models.schemas import CompetitorAnalysis, ImageAnalysis
+from backend.services.json_stream import JsonSectionParser
+from backend.services.metrics import metrics
+from backend.services.cache_service import AnalysisCache, get_analysis_cache, normalize_text
+from backend.services.image_service import hamming
+from backend.services.rate_limiter import RateLimiter, estimate_tokens, get_model_rate_limiter
+from backend.services.similarity_index import SimilarityIndex, get_similarity_index
+from backend.services.single_flight import SingleFlight
+from backend.startup import lazy_service
+
+# Системный промпт для экспертного анализа текста
+TEXT_SYSTEM_PROMPT = (
+    "Ты — профессиональный маркетолог и аналитик конкурентной среды. "
+    "Проанализируй предоставленный текст конкурента максимально глубоко и структурированно. "
+    "Ответ строго в формате JSON с ключами: strengths (сильные стороны, 3-5), weaknesses (слабые стороны, 3-5), "
+    "unique_offers (уникальные предложения, 2-3), recommendations (конкретные рекомендации по улучшению стратегии, 3-5), summary (краткое резюме, 1-2 предложения). "
+    "Оцени реальные конкурентные преимущества, недостатки, УТП, предложи практические шаги для усиления позиций. "
+    "Пиши на русском, избегай общих фраз, используй профессиональную лексику."
+)
+
+# Системный промпт для экспертного анализа изображения
+IMAGE_SYSTEM_PROMPT = (
+    "Ты — эксперт по визуальному маркетингу и брендингу. "
+    "Проанализируй изображение конкурента максимально подробно. "
+    "Ответ строго в формате JSON с ключами: description (детальное описание), insights (маркетинговые инсайты, 3-5), "
+    "visual_style_score (оценка визуального стиля от 0 до 10), recommendations (конкретные рекомендации по улучшению, 3-5). "
+    "Оцени цветовую палитру, типографику, композицию, UX/UI, соответствие целевой аудитории. "
+    "Пиши на русском, используй профессиональные термины."
+)
+
+# dHash изображения делится на полосы: кандидаты — изображения, у
+# которых совпала хотя бы одна полоса (однородные участки меняют
+# отдельные биты хэша при пересжатии)
+IMAGE_PHASH_BANDS = 4
+# Изображений в списке кандидатов одной полосы
+IMAGE_CANDIDATES = 8
+# Допустимое относительное расхождение пропорций почти одинаковых изображений
+IMAGE_ASPECT_TOLERANCE = 0.02
+
+MODEL_REQUEST_SECONDS = metrics.histogram(
+    "openai_request_seconds", "Время вызова модели вместе с ожиданием лимитов и повторами", ("kind",)
+)
+MODEL_REQUESTS = metrics.counter("openai_requests_total", "Вызовы модели по результату", ("kind", "outcome"))
+MODEL_TOKENS = metrics.counter(
+    "openai_estimated_tokens_total", "Оценка токенов успешных вызовов модели (промпт и резерв на ответ)", ("kind",)
+)
 
 class OpenAIService:
     """
     Сервис для анализа текста и изображений через OpenAI.
+
+    Для каждого метода есть синхронный и асинхронный вариант; асинхронные
+    работают через AsyncOpenAI и не блокируют event loop. Результаты
+    кэшируются по хэшу входа, модели и системного промпта, а одновременные
+    одинаковые асинхронные запросы объединяются в один вызов модели.
+    Если точного совпадения в кэше нет, для текста ищется почти такой же
+    уже проанализированный (SimilarityIndex), и отдаётся его анализ.
+    Асинхронные вызовы модели проходят через общий RateLimiter.
+
+    Клиенты OpenAI создаются при первом обращении: импорт пакета openai
+    заметно удлиняет запуск, а ответы из кэша к модели не обращаются.
     """
-    def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+    def __init__(
+        self,
+        cache: Optional[AnalysisCache] = None,
+        limiter: Optional[RateLimiter] = None,
+        similar: Optional[SimilarityIndex] = None,
+    ):
         self.model = settings.OPENAI_MODEL
         self.vision_model = settings.OPENAI_VISION_MODEL
+        self.cache = cache if cache is not None else get_analysis_cache()
+        self.limiter = limiter if limiter is not None else get_model_rate_limiter()
+        self.similar = similar if similar is not None else get_similarity_index()
+        self.inflight = SingleFlight()
+        self._client = None
+        self._async_client = None
+        self._clients_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """
+        Синхронный клиент OpenAI.
+        """
+        if self._client is None:
+            with self._clients_lock:
+                if self._client is None:
+                    from openai import OpenAI
+
+                    self._client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        return self._client
+
+    @property
+    def async_client(self):
+        """
+        Асинхронный клиент OpenAI без собственных повторов: их выполняет
+        limiter с учётом бюджетов.
+        """
+        if self._async_client is None:
+            with self._clients_lock:
+                if self._async_client is None:
+                    from openai import AsyncOpenAI
+
+                    self._async_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+        return self._async_client
+
+    async def _call_model(self, kind: str, func, tokens: int):
+        """
+        Вызывает модель через ограничитель и учитывает вызов в метриках.
+        """
+        started = time.perf_counter()
+        try:
+            result = await self.limiter.run(func, tokens)
+        except Exception:
+            MODEL_REQUESTS.inc(kind=kind, outcome="error")
+            raise
+        finally:
+            MODEL_REQUEST_SECONDS.observe(time.perf_counter() - started, kind=kind)
+        # Токены учитываются только у успешного вызова: отклонённые
+        # попытки (429 и повторы) не завышают расход
+        MODEL_TOKENS.inc(tokens, kind=kind)
+        MODEL_REQUESTS.inc(kind=kind, outcome="ok")
+        return result
+
+    def _text_cache_key(self, text: str) -> str:
+        return self.cache.make_key("text", normalize_text(text), self.model, TEXT_SYSTEM_PROMPT)
+
+    def _similar_text(self, text: str, key: str) -> Tuple[Optional[tuple], Optional[CompetitorAnalysis]]:
+        """
+        Ищет в индексе почти такой же текст.
+
+        Найденный анализ сохраняется и под точным ключом текста, чтобы его
+        повтор попадал в кэш без MinHash. Если анализ найденного текста
+        уже вытеснен из кэша, текст убирается из индекса. MinHash считается
+        на чистом Python, поэтому из async-кода метод вызывается в потоке.
+
+        Args:
+            text (str): Текст конкурента.
+            key (str): Точный ключ кэша текста.
+
+        Returns:
+            tuple: Сигнатура текста (для добавления в индекс) и анализ или None.
+        """
+        signature = self.similar.signature(text)
+        match = self.similar.query(signature)
+        if match is None:
+            return signature, None
+        cached = self.cache.get(match[0])
+        if cached is None:
+            self.similar.discard(match[0])
+            return signature, None
+        self.cache.set(key, cached)
+        return signature, CompetitorAnalysis.model_validate(cached)
+
+    def _image_cache_key(self, image_bytes: bytes) -> str:
+        digest = hashlib.sha256(image_bytes).digest()
+        return self.cache.make_key("image", digest, self.vision_model, IMAGE_SYSTEM_PROMPT)
+
+    def _image_candidates_keys(self, phash: str) -> list:
+        width = len(phash) // IMAGE_PHASH_BANDS
+        return [
+            self.cache.make_key(
+                "image_phash", f"{band}:{phash[band * width:(band + 1) * width]}", self.vision_model, IMAGE_SYSTEM_PROMPT
+            )
+            for band in range(IMAGE_PHASH_BANDS)
+        ]
+
+    def _similar_image(self, key: str, fingerprint: Optional[dict]) -> Optional[ImageAnalysis]:
+        """
+        Анализ почти такого же изображения из кэша или None.
+
+        Короткий dHash лишь выбирает кандидатов по совпавшим полосам:
+        похожие по композиции, но разные баннеры могут его разделять.
+        Совпадение подтверждается подробным хэшем (не больше
+        IMAGE_SIMILAR_MAX_DISTANCE различающихся бит) и пропорциями.
+        Найденный анализ сохраняется и под точным ключом изображения.
+
+        Args:
+            key (str): Точный ключ кэша изображения.
+            fingerprint (dict | None): phash, detail и aspect из ImageService.
+
+        Returns:
+            ImageAnalysis | None: Анализ или None.
+        """
+        if not fingerprint or settings.IMAGE_SIMILAR_MAX_DISTANCE < 0:
+            return None
+        checked = {key}
+        for candidates_key in self._image_candidates_keys(fingerprint["phash"]):
+            candidates = self.cache.get(candidates_key) or {}
+            for candidate in candidates.get("images", []):
+                if candidate["key"] in checked:
+                    continue
+                checked.add(candidate["key"])
+                similar = self._confirm_image(key, candidate, fingerprint)
+                if similar is not None:
+                    return similar
+        return None
+
+    def _confirm_image(self, key: str, candidate: dict, fingerprint: dict) -> Optional[ImageAnalysis]:
+        """
+        Проверяет кандидата пропорциями и подробным хэшем и отдаёт его
+        анализ, сохраняя его под ключом key.
+        """
+        if abs(candidate["aspect"] - fingerprint["aspect"]) > IMAGE_ASPECT_TOLERANCE * fingerprint["aspect"]:
+            return None
+        if hamming(candidate["detail"], fingerprint["detail"]) > settings.IMAGE_SIMILAR_MAX_DISTANCE:
+            return None
+        cached = self.cache.get(candidate["key"])
+        if cached is None:
+            return None
+        self.cache.set(key, cached)
+        return ImageAnalysis.model_validate(cached)
+
+    def _remember_image(self, key: str, fingerprint: Optional[dict]):
+        """
+        Добавляет изображение в кандидаты полос его dHash (не больше
+        IMAGE_CANDIDATES в полосе).
+        """
+        if not fingerprint:
+            return
+        image = {"key": key, "detail": fingerprint["detail"], "aspect": fingerprint["aspect"]}
+        for candidates_key in self._image_candidates_keys(fingerprint["phash"]):
+            images = [item for item in (self.cache.get(candidates_key) or {}).get("images", []) if item["key"] != key]
+            images.append(image)
+            self.cache.set(candidates_key, {"images": images[-IMAGE_CANDIDATES:]})
 
     def analyze_text(self, text: str) -> CompetitorAnalysis:
         """
@@ -26,49 +244,202 @@ class OpenAIService:
         Returns:
             CompetitorAnalysis: Структурированный анализ.
         """
-        # Системный промпт для экспертного анализа текста
-        system_prompt = (
-            "Ты — профессиональный маркетолог и аналитик конкурентной среды. "
-            "Проанализируй предоставленный текст конкурента максимально глубоко и структурированно. "
-            "Ответ строго в формате JSON с ключами: strengths (сильные стороны, 3-5), weaknesses (слабые стороны, 3-5), "
-            "unique_offers (уникальные предложения, 2-3), recommendations (конкретные рекомендации по улучшению стратегии, 3-5), summary (краткое резюме, 1-2 предложения). "
-            "Оцени реальные конкурентные преимущества, недостатки, УТП, предложи практические шаги для усиления позиций. "
-            "Пиши на русском, избегай общих фраз, используй профессиональную лексику."
-        )
-        # TODO: Реализовать реальный запрос к OpenAI GPT-4o с этим промптом
-        return CompetitorAnalysis(
-            strengths=["Сильный узнаваемый бренд на рынке", "Высокий уровень клиентского сервиса", "Широкий ассортимент продукции", "Развитая сеть дистрибуции"],
-            weaknesses=["Высокая стоимость товаров относительно конкурентов", "Недостаточная скорость доставки в регионы", "Ограниченные акции и спецпредложения"],
-            unique_offers=["Эксклюзивные партнерские программы", "Собственные разработки и инновации"],
-            recommendations=["Оптимизировать логистику для сокращения сроков доставки", "Разработать новые акции для привлечения клиентов", "Снизить цены на ключевые позиции", "Усилить digital-маркетинг"],
-            summary="Компания занимает сильные позиции, но есть возможности для роста за счет улучшения сервиса и ценовой политики."
-        )
-
-    def analyze_image(self, image_bytes: bytes) -> ImageAnalysis:
+        key = self._text_cache_key(text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return CompetitorAnalysis.model_validate(cached)
+        signature, similar = self._similar_text(text, key)
+        if similar is not None:
+            return similar
+        # TODO: Реализовать реальный запрос к OpenAI GPT-4o с TEXT_SYSTEM_PROMPT через self.client
+        analysis = _demo_text_analysis()
+        self.cache.set(key, analysis.model_dump())
+        self.similar.add(key, signature)
+        return analysis
+
+    async def analyze_text_async(self, text: str) -> CompetitorAnalysis:
+        """
+        Асинхронно анализирует текст конкурента через GPT-4o.
+
+        Args:
+            text (str): Текст конкурента.
+
+        Returns:
+            CompetitorAnalysis: Структурированный анализ.
+        """
+        key = self._text_cache_key(text)
+        cached = await self.cache.aget(key)
+        if cached is not None:
+            return CompetitorAnalysis.model_validate(cached)
+        return await self.inflight.do(key, lambda: self._request_text_async(text, key))
+
+    async def _request_text_async(self, text: str, key: str) -> CompetitorAnalysis:
+        """
+        Отдаёт анализ почти такого же текста, а если его нет — запрашивает
+        анализ у модели в рамках лимитов и кладёт результат в кэш и индекс.
+        """
+        signature, similar = await asyncio.to_thread(self._similar_text, text, key)
+        if similar is not None:
+            return similar
+        tokens = estimate_tokens(TEXT_SYSTEM_PROMPT + text, settings.OPENAI_COMPLETION_TOKENS)
+        analysis = await self._call_model("text", lambda: self._complete_text_async(text), tokens)
+        await self.cache.aset(key, analysis.model_dump())
+        self.similar.add(key, signature)
+        return analysis
+
+    async def _complete_text_async(self, text: str) -> CompetitorAnalysis:
+        """
+        Один вызов модели для анализа текста.
+        """
+        # TODO: Реализовать реальный запрос к OpenAI GPT-4o с TEXT_SYSTEM_PROMPT через self.async_client
+        return _demo_text_analysis()
+
+    async def stream_text_analysis(self, text: str) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Анализирует текст конкурента, отдавая секции анализа (strengths,
+        weaknesses, ...) по мере генерации ответа моделью.
+
+        При попадании в кэш или найденном почти повторе текста все секции
+        отдаются сразу. Собранный анализ кладётся в кэш после завершения потока.
+
+        Args:
+            text (str): Текст конкурента.
+
+        Yields:
+            tuple: Имя секции и её значение.
+        """
+        key = self._text_cache_key(text)
+        cached = await self.cache.aget(key)
+        signature = None
+        if cached is None:
+            signature, similar = await asyncio.to_thread(self._similar_text, text, key)
+            cached = similar.model_dump() if similar is not None else None
+        if cached is not None:
+            for name, value in CompetitorAnalysis.model_validate(cached).model_dump().items():
+                yield name, value
+            return
+        tokens = estimate_tokens(TEXT_SYSTEM_PROMPT + text, settings.OPENAI_COMPLETION_TOKENS)
+        # Лимиты учитываются при открытии потока: повторять имеет смысл
+        # только запрос, на который модель ещё не начала отвечать
+        stream = await self._call_model("text_stream", lambda: self._open_text_stream(text), tokens)
+        parser = JsonSectionParser()
+        sections = {}
+        async for chunk in stream:
+            for name, value in parser.feed(chunk):
+                if name in CompetitorAnalysis.model_fields:
+                    sections[name] = value
+                    yield name, value
+        analysis = CompetitorAnalysis.model_validate(sections)
+        await self.cache.aset(key, analysis.model_dump())
+        self.similar.add(key, signature)
+
+    async def _open_text_stream(self, text: str) -> AsyncIterator[str]:
+        """
+        Открывает потоковый ответ модели для анализа текста.
+
+        Returns:
+            AsyncIterator[str]: Фрагменты JSON-ответа.
+        """
+        # TODO: Реализовать реальный запрос к OpenAI GPT-4o с TEXT_SYSTEM_PROMPT через
+        # self.async_client (stream=True, response_format json_object) и отдавать delta.content
+        return _demo_stream(_demo_text_analysis().model_dump_json())
+
+    def analyze_image(self, image_bytes: bytes, fingerprint: Optional[dict] = None) -> ImageAnalysis:
         """
         Анализирует изображение конкурента через GPT-4o.
 
         Args:
             image_bytes (bytes): Изображение в байтах.
+            fingerprint (dict | None): Перцептивные хэши изображения
+                (ImageService.preprocess) для поиска почти такого же в кэше.
+
+        Returns:
+            ImageAnalysis: Анализ изображения.
+        """
+        key = self._image_cache_key(image_bytes)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return ImageAnalysis.model_validate(cached)
+        similar = self._similar_image(key, fingerprint)
+        if similar is not None:
+            return similar
+        # TODO: Реализовать реальный запрос к OpenAI Vision с IMAGE_SYSTEM_PROMPT через self.client
+        analysis = _demo_image_analysis()
+        self.cache.set(key, analysis.model_dump())
+        self._remember_image(key, fingerprint)
+        return analysis
+
+    async def analyze_image_async(self, image_bytes: bytes, fingerprint: Optional[dict] = None) -> ImageAnalysis:
+        """
+        Асинхронно анализирует изображение конкурента через GPT-4o.
+
+        Args:
+            image_bytes (bytes): Изображение в байтах.
+            fingerprint (dict | None): Перцептивные хэши изображения
+                (ImageService.preprocess) для поиска почти такого же в кэше.
 
         Returns:
             ImageAnalysis: Анализ изображения.
         """
-        # Системный промпт для экспертного анализа изображения
-        system_prompt = (
-            "Ты — эксперт по визуальному маркетингу и брендингу. "
-            "Проанализируй изображение конкурента максимально подробно. "
-            "Ответ строго в формате JSON с ключами: description (детальное описание), insights (маркетинговые инсайты, 3-5), "
-            "visual_style_score (оценка визуального стиля от 0 до 10), recommendations (конкретные рекомендации по улучшению, 3-5). "
-            "Оцени цветовую палитру, типографику, композицию, UX/UI, соответствие целевой аудитории. "
-            "Пиши на русском, используй профессиональные термины."
-        )
-        # TODO: Реализовать реальный запрос к OpenAI Vision с этим промптом
-        return ImageAnalysis(
-            description="Баннер выполнен в фирменных цветах компании, использует современную типографику и лаконичную композицию. Преобладают холодные оттенки, акцент на CTA-кнопке.",
-            insights=["Визуальный стиль соответствует целевой аудитории", "Элементы дизайна хорошо структурированы", "Использование фирменных цветов усиливает узнаваемость", "Присутствует четкий призыв к действию"],
-            visual_style_score=9,
-            recommendations=["Добавить больше уникальных графических элементов", "Упростить фон для лучшей читаемости", "Усилить контраст между текстом и фоном", "Провести A/B тестирование разных вариантов CTA"]
-        )
-
-openai_service = OpenAIService()
+        key = self._image_cache_key(image_bytes)
+        cached = await self.cache.aget(key)
+        if cached is not None:
+            return ImageAnalysis.model_validate(cached)
+        return await self.inflight.do(key, lambda: self._request_image_async(image_bytes, key, fingerprint))
+
+    async def _request_image_async(
+        self, image_bytes: bytes, key: str, fingerprint: Optional[dict] = None
+    ) -> ImageAnalysis:
+        """
+        Отдаёт анализ почти такого же изображения, а если его нет —
+        запрашивает анализ у модели в рамках лимитов и кладёт результат в кэш.
+        """
+        similar = await asyncio.to_thread(self._similar_image, key, fingerprint)
+        if similar is not None:
+            return similar
+        tokens = estimate_tokens(IMAGE_SYSTEM_PROMPT, settings.OPENAI_IMAGE_TOKENS + settings.OPENAI_COMPLETION_TOKENS)
+        analysis = await self._call_model("image", lambda: self._complete_image_async(image_bytes), tokens)
+        await self.cache.aset(key, analysis.model_dump())
+        await asyncio.to_thread(self._remember_image, key, fingerprint)
+        return analysis
+
+    async def _complete_image_async(self, image_bytes: bytes) -> ImageAnalysis:
+        """
+        Один вызов модели для анализа изображения.
+        """
+        # TODO: Реализовать реальный запрос к OpenAI Vision с IMAGE_SYSTEM_PROMPT через self.async_client
+        return _demo_image_analysis()
+
+def _demo_text_analysis() -> CompetitorAnalysis:
+    """
+    Демонстрационный ответ до подключения реального запроса к модели.
+    """
+    return CompetitorAnalysis(
+        strengths=["Сильный узнаваемый бренд на рынке", "Высокий уровень клиентского сервиса", "Широкий ассортимент продукции", "Развитая сеть дистрибуции"],
+        weaknesses=["Высокая стоимость товаров относительно конкурентов", "Недостаточная скорость доставки в регионы", "Ограниченные акции и спецпредложения"],
+        unique_offers=["Эксклюзивные партнерские программы", "Собственные разработки и инновации"],
+        recommendations=["Оптимизировать логистику для сокращения сроков доставки", "Разработать новые акции для привлечения клиентов", "Снизить цены на ключевые позиции", "Усилить digital-маркетинг"],
+        summary="Компания занимает сильные позиции, но есть возможности для роста за счет улучшения сервиса и ценовой политики."
+    )
+
+async def _demo_stream(payload: str, chunk_size: int = 32) -> AsyncIterator[str]:
+    """
+    Демонстрационный поток: отдаёт готовый JSON фрагментами, как модель.
+    """
+    for start in range(0, len(payload), chunk_size):
+        yield payload[start:start + chunk_size]
+
+def _demo_image_analysis() -> ImageAnalysis:
+    """
+    Демонстрационный ответ до подключения реального запроса к модели.
+    """
+    return ImageAnalysis(
+        description="Баннер выполнен в фирменных цветах компании, использует современную типографику и лаконичную композицию. Преобладают холодные оттенки, акцент на CTA-кнопке.",
+        insights=["Визуальный стиль соответствует целевой аудитории", "Элементы дизайна хорошо структурированы", "Использование фирменных цветов усиливает узнаваемость", "Присутствует четкий призыв к действию"],
+        visual_style_score=9,
+        recommendations=["Добавить больше уникальных графических элементов", "Упростить фон для лучшей читаемости", "Усилить контраст между текстом и фоном", "Провести A/B тестирование разных вариантов CTA"]
+    )
+
+@lazy_service
+def get_openai_service() -> OpenAIService:
+    return OpenAIService()
@@ -1,59 +1,573 @@
-
 """
-Сервис для парсинга веб-страниц через Selenium WebDriver.
+Сервис для парсинга веб-страниц: быстрый HTTP-уровень и Selenium WebDriver.
 """
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
+import asyncio
+import codecs
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from urllib.parse import urldefrag, urljoin
+from backend.config import settings
+from backend.services.browser_pool import BrowserPool, get_browser_pool
+from backend.services.html_extractor import MAX_LINKS, PageExtractor, sniff_charset
+from backend.services.http_cache import HttpCache, get_http_cache
+from backend.services.metrics import metrics
+from backend.services.single_flight import SingleFlight
+from backend.startup import lazy_service
+
+# Документ полностью загружен
+_READY_STATE_JS = "return document.readyState === 'complete';"
+
+# На странице есть непустой h1 и абзац достаточной длины
+_CONTENT_READY_JS = """
+const minLength = arguments[0];
+const h1 = document.querySelector('h1');
+if (!h1 || !h1.innerText.trim()) return false;
+for (const p of document.getElementsByTagName('p')) {
+    if (p.innerText.trim().length >= minLength) return true;
+}
+return false;
+"""
+
+# Документ загружен и за последние idleMs не завершилось ни одного
+# сетевого запроса (Resource Timing API)
+_NETWORK_IDLE_JS = """
+const idleMs = arguments[0];
+if (document.readyState !== 'complete') return false;
+let lastResponse = 0;
+for (const entry of performance.getEntriesByType('resource')) {
+    lastResponse = Math.max(lastResponse, entry.responseEnd);
+}
+return performance.now() - lastResponse >= idleMs;
+"""
+
+# Все поля за один вызов execute_script: обращение к каждому элементу
+# через WebDriver — отдельный HTTP-запрос к драйверу
+_EXTRACT_JS = """
+const fields = new Set(arguments[0]);
+const minLength = arguments[1];
+const maxHeadings = arguments[2];
+const maxLinks = arguments[3];
+const clean = (text) => (text || '').replace(/\\s+/g, ' ').trim();
+const result = {title: clean(document.title), h1: '', first_paragraph: ''};
+const h1 = document.querySelector('h1');
+if (h1) result.h1 = clean(h1.innerText);
+for (const p of document.getElementsByTagName('p')) {
+    const text = clean(p.innerText);
+    if (text.length >= minLength) {
+        result.first_paragraph = text;
+        break;
+    }
+}
+if (fields.has('meta_description')) {
+    const meta = document.querySelector('meta[name="description" i]');
+    result.meta_description = meta ? clean(meta.getAttribute('content')) : '';
+}
+if (fields.has('headings')) {
+    result.headings = Array.from(document.querySelectorAll('h2, h3'), (h) => clean(h.innerText))
+        .filter((text) => text)
+        .slice(0, maxHeadings);
+}
+if (fields.has('full_text')) {
+    result.full_text = document.body ? clean(document.body.innerText) : '';
+}
+if (fields.has('links')) {
+    const robots = document.querySelector('meta[name="robots" i]');
+    const nofollow = robots && /nofollow/i.test(robots.getAttribute('content') || '');
+    result.links = nofollow ? [] : Array.from(document.querySelectorAll('a[href]'))
+        .filter((a) => !/\\bnofollow\\b/i.test(a.rel))
+        .map((a) => a.href)
+        .slice(0, maxLinks);
+    const canonical = document.querySelector('link[rel~="canonical" i]');
+    result.canonical = canonical ? canonical.href : '';
+}
+return result;
+"""
+
+READY_STRATEGIES = ("ready_state", "content", "network_idle")
+
+# Поля, которые умеет извлекать парсер; первые три извлекаются всегда.
+# links — абсолютные ссылки страницы и canonical (для обхода сайта)
+EXTRACT_FIELDS = ("title", "h1", "first_paragraph", "meta_description", "headings", "full_text", "links")
+BASE_FIELDS = EXTRACT_FIELDS[:3]
+
+PARSE_SECONDS = metrics.histogram(
+    "parser_parse_seconds", "Полное время парсинга страницы", ("tier",)
+)
+PARSE_STAGE_SECONDS = metrics.histogram(
+    "parser_stage_seconds",
+    "Время этапов парсинга: http — fetch/extract, browser — lease/navigation/wait/extraction",
+    ("tier", "stage"),
+)
+PARSE_RESULTS = metrics.counter(
+    "parser_results_total",
+    "Результаты уровней парсинга: ok, not_modified, escalated (HTTP-уровень передал браузеру), error",
+    ("tier", "outcome"),
+)
+
+_HTTP_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "ru,en;q=0.8",
+}
+
+def _absolute_links(page_url: str, hrefs: List[str], base_href: str = "") -> List[str]:
+    """
+    Приводит ссылки страницы к абсолютным http(s)-URL без фрагмента, без повторов.
+    """
+    base = urljoin(page_url, base_href) if base_href else page_url
+    links = []
+    seen = set()
+    for href in hrefs:
+        link = urldefrag(urljoin(base, href))[0]
+        if link.startswith(("http://", "https://")) and link not in seen:
+            seen.add(link)
+            links.append(link)
+    return links
+
 
 class ParserService:
     """
-    Сервис для извлечения title, h1 и первого абзаца с сайта через Selenium.
+    Сервис для извлечения title, h1 и первого абзаца с сайта, а также
+    полей из extract_fields (meta_description, headings, full_text, links).
+
+    Сначала страница загружается обычным HTTP-запросом и разбирается
+    потоковым HTML-парсером. В Selenium запрос уходит, только если так
+    ничего не извлеклось или страница рендерится на клиенте; там все
+    поля собираются одним скриптом на странице.
     """
-    def parse(self, url: str) -> dict:
+    def __init__(
+        self,
+        pool: Optional[BrowserPool] = None,
+        ready_strategy: str = settings.PARSER_READY_STRATEGY,
+        ready_timeout: float = settings.PARSER_READY_TIMEOUT,
+        network_idle_ms: int = settings.PARSER_NETWORK_IDLE_MS,
+        min_paragraph_length: int = settings.PARSER_MIN_PARAGRAPH_LENGTH,
+        http_enabled: bool = settings.PARSER_HTTP_ENABLED,
+        http_timeout: float = settings.PARSER_HTTP_TIMEOUT,
+        http_max_bytes: int = settings.PARSER_HTTP_MAX_BYTES,
+        max_workers: int = settings.PARSER_MAX_WORKERS,
+        http_cache: Optional[HttpCache] = None,
+        extract_fields: str = settings.PARSER_EXTRACT_FIELDS,
+        max_headings: int = settings.PARSER_MAX_HEADINGS,
+    ):
+        if ready_strategy not in READY_STRATEGIES:
+            raise ValueError(f"Неизвестная стратегия ожидания: {ready_strategy}")
+        fields = {field.strip() for field in extract_fields.split(",") if field.strip()}
+        unknown = fields - set(EXTRACT_FIELDS)
+        if unknown:
+            raise ValueError(f"Неизвестные поля извлечения: {', '.join(sorted(unknown))}")
+        self.pool = pool if pool is not None else get_browser_pool()
+        self.ready_strategy = ready_strategy
+        self.ready_timeout = ready_timeout
+        self.network_idle_ms = network_idle_ms
+        self.min_paragraph_length = min_paragraph_length
+        self.extract_fields = tuple(field for field in EXTRACT_FIELDS if field in fields or field in BASE_FIELDS)
+        self.max_headings = max_headings
+        self.http_enabled = http_enabled
+        self.http_max_bytes = http_max_bytes
+        self.http_cache = http_cache if http_cache is not None else get_http_cache()
+        self.http_timeout = http_timeout
+        self._http = None
+        self._http_lock = threading.Lock()
+        # Selenium и HTTP-клиент синхронные: из async-кода парсинг
+        # выполняется в ограниченном пуле потоков
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="parser")
+        self.inflight = SingleFlight()
+
+    @property
+    def http(self):
         """
-        Парсит страницу по URL с помощью Selenium.
+        HTTP-клиент; httpx импортируется и клиент создаётся при первом запросе.
+        """
+        if self._http is None:
+            with self._http_lock:
+                if self._http is None:
+                    import httpx
+
+                    self._http = httpx.Client(
+                        headers=_HTTP_HEADERS,
+                        timeout=self.http_timeout,
+                        follow_redirects=True,
+                    )
+        return self._http
+
+    def _fields(self, full_text: bool, links: bool = False) -> tuple:
+        """
+        Поля для одного парсинга: extract_fields, а также full_text и links по запросу.
+        """
+        requested = set(self.extract_fields)
+        if full_text:
+            requested.add("full_text")
+        if links:
+            requested.add("links")
+        return tuple(field for field in EXTRACT_FIELDS if field in requested)
+
+    def _extractor(self, fields: tuple) -> PageExtractor:
+        return PageExtractor(
+            self.min_paragraph_length,
+            collect_text="full_text" in fields,
+            collect_headings="headings" in fields,
+            max_headings=self.max_headings,
+            collect_links="links" in fields,
+        )
+
+    def _is_ready(self, driver) -> bool:
+        """
+        Проверяет готовность страницы по выбранной стратегии.
+
+        Стратегия "content" завершается, как только появились нужные
+        элементы; для страниц без h1 или длинного абзаца она откатывается
+        на ожидание сетевой тишины, чтобы не ждать полный таймаут.
+
+        Args:
+            driver: WebDriver с открытой страницей.
+
+        Returns:
+            bool: Страница готова к извлечению.
+        """
+        if self.ready_strategy == "ready_state":
+            return driver.execute_script(_READY_STATE_JS)
+        if self.ready_strategy == "network_idle":
+            return driver.execute_script(_NETWORK_IDLE_JS, self.network_idle_ms)
+        return (
+            driver.execute_script(_CONTENT_READY_JS, self.min_paragraph_length)
+            or driver.execute_script(_NETWORK_IDLE_JS, self.network_idle_ms)
+        )
+
+    def _wait_until_ready(self, driver):
+        """
+        Ждёт готовности страницы не дольше ready_timeout секунд.
+
+        Args:
+            driver: WebDriver с открытой страницей.
+        """
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        try:
+            WebDriverWait(driver, self.ready_timeout, poll_frequency=0.1).until(self._is_ready)
+        except TimeoutException:
+            # Жёсткий таймаут: извлекаем то, что успело загрузиться
+            pass
+
+    def parse(self, url: str, full_text: bool = False, links: bool = False, user_agent: Optional[str] = None) -> dict:
+        """
+        Парсит страницу по URL: сначала через HTTP, при необходимости — через Selenium.
+
+        Args:
+            url (str): URL сайта.
+            full_text (bool): Дополнительно вернуть весь видимый текст страницы.
+            links (bool): Дополнительно вернуть ссылки страницы (links) и canonical.
+            user_agent (str | None): User-Agent запроса вместо браузерного
+                (например, агент обхода сайта).
+
+        Returns:
+            dict: title, h1, первый абзац, поля из extract_fields и уровень
+                (tier), на котором они получены; с full_text=True — ещё и
+                full_text, с links=True — links и canonical.
+        """
+        if not url.startswith("http"):
+            url = "https://" + url
+        started = time.perf_counter()
+        if self.http_enabled:
+            parsed = self._parse_http(url, full_text, links=links, user_agent=user_agent)
+            if parsed is not None:
+                PARSE_SECONDS.observe(time.perf_counter() - started, tier="http")
+                return parsed
+            PARSE_RESULTS.inc(tier="http", outcome="escalated")
+        parsed = self._parse_browser(url, full_text, links, user_agent)
+        PARSE_SECONDS.observe(time.perf_counter() - started, tier="browser")
+        return parsed
+
+    async def parse_async(
+        self, url: str, full_text: bool = False, links: bool = False, user_agent: Optional[str] = None
+    ) -> dict:
+        """
+        Асинхронная обёртка над parse(): выполняет парсинг в пуле потоков,
+        не блокируя event loop. Одновременные запросы одного URL
+        обслуживаются одним парсингом.
+
+        Args:
+            url (str): URL сайта.
+            full_text (bool): Дополнительно вернуть весь видимый текст страницы.
+            links (bool): Дополнительно вернуть ссылки страницы.
+            user_agent (str | None): User-Agent запроса вместо браузерного.
+
+        Returns:
+            dict: Результат parse().
+        """
+        loop = asyncio.get_running_loop()
+        url = url.strip()
+        if not url.startswith("http"):
+            url = "https://" + url
+        key = url + ("#full" if full_text else "") + ("#links" if links else "")
+        if user_agent:
+            key += f"#ua:{user_agent}"
+        return await self.inflight.do(
+            key, lambda: loop.run_in_executor(self._executor, self.parse, url, full_text, links, user_agent)
+        )
+
+    def _parse_http(
+        self,
+        url: str,
+        full_text: bool = False,
+        conditional: bool = True,
+        links: bool = False,
+        user_agent: Optional[str] = None,
+    ):
+        """
+        Загружает страницу HTTP-клиентом и разбирает её потоково.
+
+        Чтение прекращается, как только найдены все поля (без full_text, headings и links),
+        кроме случая, когда ответ кэшируется: тогда тело дочитывается,
+        чтобы потом разобрать его заново для другого набора полей. Если
+        для URL есть запись в HTTP-кэше, запрос условный, и на 304
+        контент берётся из кэша.
 
         Args:
             url (str): URL сайта.
+            full_text (bool): Собрать весь видимый текст страницы.
+            conditional (bool): Использовать валидаторы из HTTP-кэша.
+            links (bool): Собрать ссылки страницы.
+            user_agent (str | None): User-Agent вместо браузерного.
 
         Returns:
-            dict: title, h1, первый абзац.
+            dict | None: Результат парсинга или None, если нужен браузер.
         """
+        fields = self._fields(full_text, links)
+        variant = "+".join(("fields",) + fields[len(BASE_FIELDS):])
+        entry = self.http_cache.lookup(url) if conditional else None
+        headers = HttpCache.validators(entry) if entry else {}
+        conditional_request = bool(headers)
+        if user_agent:
+            headers["User-Agent"] = user_agent
+        extractor = self._extractor(fields)
+        parse_seconds = 0.0
+        fetch_started = time.perf_counter()
         try:
-            if not url.startswith("http"):
-                url = "https://" + url
-            chrome_options = Options()
-            chrome_options.add_argument('--headless')
-            chrome_options.add_argument('--disable-gpu')
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--window-size=1920,1080')
-            driver = webdriver.Chrome(options=chrome_options)
-            driver.get(url)
-            time.sleep(2)  # Дать время на загрузку JS
-            title = driver.title or ""
-            h1 = ""
-            first_paragraph = ""
-            try:
-                h1_elem = driver.find_element(By.TAG_NAME, "h1")
-                h1 = h1_elem.text.strip()
-            except Exception:
-                h1 = ""
-            try:
-                paragraphs = driver.find_elements(By.TAG_NAME, "p")
-                for p in paragraphs:
-                    txt = p.text.strip()
-                    if len(txt) >= 50:
-                        first_paragraph = txt
+            with self.http.stream("GET", url, headers=headers) as response:
+                if response.status_code == 304 and entry is not None:
+                    PARSE_STAGE_SECONDS.observe(time.perf_counter() - fetch_started, tier="http", stage="fetch")
+                    PARSE_RESULTS.inc(tier="http", outcome="not_modified")
+                    return self._parse_not_modified(url, entry, variant, fields, user_agent)
+                if response.status_code != 200:
+                    return None
+                if "html" not in response.headers.get("content-type", "text/html"):
+                    return None
+                page_url = str(response.url)
+                validators = {
+                    "etag": response.headers.get("etag"),
+                    "last_modified": response.headers.get("last-modified"),
+                }
+                cacheable = self.http_cache.enabled and (validators["etag"] or validators["last_modified"])
+                body = bytearray() if cacheable else None
+                decoder = None
+                encoding = "utf-8"
+                received = 0
+                truncated = False
+                for chunk in response.iter_bytes():
+                    if decoder is None:
+                        encoding = response.charset_encoding or sniff_charset(chunk[:2048]) or "utf-8"
+                        try:
+                            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+                        except LookupError:
+                            encoding = "utf-8"
+                            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+                    received += len(chunk)
+                    if body is not None:
+                        body.extend(chunk)
+                    if not extractor.done:
+                        feed_started = time.perf_counter()
+                        extractor.feed(decoder.decode(chunk))
+                        parse_seconds += time.perf_counter() - feed_started
+                    if received >= self.http_max_bytes:
+                        truncated = True
                         break
-            except Exception:
-                first_paragraph = ""
-            driver.quit()
-            return {"title": title, "h1": h1, "first_paragraph": first_paragraph, "error": None}
+                    if extractor.done and body is None:
+                        break
+            extractor.close()
+        except Exception:
+            return None
+        PARSE_STAGE_SECONDS.observe(time.perf_counter() - fetch_started - parse_seconds, tier="http", stage="fetch")
+        PARSE_STAGE_SECONDS.observe(parse_seconds, tier="http", stage="extract")
+        parsed = self._http_result(extractor, fields, page_url)
+        if parsed is not None:
+            PARSE_RESULTS.inc(tier="http", outcome="ok")
+        self.http_cache.record(url, not_modified=False, conditional=conditional_request, bytes_downloaded=received)
+        # Обрезанное по PARSER_HTTP_MAX_BYTES тело не кэшируется: на 304
+        # его пришлось бы разбирать для других полей как полную страницу
+        if body is not None and not truncated:
+            self.http_cache.store(url, {
+                **validators,
+                "url": page_url,
+                "encoding": encoding,
+                "size": len(body),
+                "parsed": {variant: parsed},
+                "parse_seconds": {variant: parse_seconds},
+            }, bytes(body))
+        return parsed
+
+    def _parse_not_modified(self, url: str, entry: dict, variant: str, fields: tuple, user_agent: Optional[str] = None):
+        """
+        Обрабатывает ответ 304: отдаёт извлечённый ранее контент, а если
+        нужный набор полей ещё не извлекался — разбирает сохранённое тело.
+
+        Args:
+            url (str): URL сайта.
+            entry (dict): Запись HTTP-кэша.
+            variant (str): Ключ набора полей в записи кэша.
+            fields (tuple): Извлекаемые поля.
+            user_agent (str | None): User-Agent для повторной загрузки.
+
+        Returns:
+            dict | None: Результат парсинга или None, если нужен браузер.
+        """
+        if variant in entry["parsed"]:
+            self.http_cache.record(
+                url,
+                not_modified=True,
+                conditional=True,
+                bytes_saved=entry["size"],
+                parse_seconds_saved=entry["parse_seconds"].get(variant, 0.0),
+            )
+            parsed = entry["parsed"][variant]
+            return dict(parsed) if parsed is not None else None
+        body = self.http_cache.read_body(url)
+        if body is None:
+            return self._parse_http(
+                url, "full_text" in fields, conditional=False, links="links" in fields, user_agent=user_agent
+            )
+        extractor = self._extractor(fields)
+        started = time.perf_counter()
+        extractor.feed(body.decode(entry["encoding"], errors="replace"))
+        extractor.close()
+        # Ссылки разрешаются относительно адреса после редиректов,
+        # сохранённого при загрузке тела
+        parsed = self._http_result(extractor, fields, entry.get("url", url))
+        entry["parsed"][variant] = parsed
+        entry["parse_seconds"][variant] = time.perf_counter() - started
+        self.http_cache.store(url, entry)
+        self.http_cache.record(url, not_modified=True, conditional=True, bytes_saved=entry["size"])
+        return dict(parsed) if parsed is not None else None
+
+    @staticmethod
+    def _http_result(extractor: PageExtractor, fields: tuple, page_url: str):
+        """
+        Собирает результат HTTP-уровня из разобранной страницы.
+        Ссылки разрешаются относительно page_url (адреса после редиректов).
+
+        Returns:
+            dict | None: Результат парсинга или None, если нужен браузер.
+        """
+        if not (extractor.h1 or extractor.first_paragraph) or extractor.looks_js_rendered:
+            return None
+        parsed = {
+            "title": extractor.title,
+            "h1": extractor.h1,
+            "first_paragraph": extractor.first_paragraph,
+            "tier": "http",
+            "error": None,
+        }
+        if "meta_description" in fields:
+            parsed["meta_description"] = extractor.meta_description
+        if "headings" in fields:
+            parsed["headings"] = extractor.headings
+        if "full_text" in fields:
+            parsed["full_text"] = extractor.full_text
+        if "links" in fields:
+            parsed["links"] = [] if extractor.nofollow else _absolute_links(page_url, extractor.links, extractor.base_href)
+            parsed["canonical"] = _absolute_links(page_url, [extractor.canonical])[0] if extractor.canonical else ""
+        return parsed
+
+    def _parse_browser(
+        self, url: str, full_text: bool = False, links: bool = False, user_agent: Optional[str] = None
+    ) -> dict:
+        """
+        Парсит страницу по URL с помощью Selenium.
+
+        Сессия браузера берётся из пула и возвращается в него после разбора.
+        Все поля извлекаются одним скриптом на странице (_EXTRACT_JS), так
+        что время извлечения не растёт с числом абзацев.
+
+        Args:
+            url (str): URL сайта.
+            full_text (bool): Собрать весь видимый текст страницы.
+            links (bool): Собрать ссылки страницы.
+            user_agent (str | None): User-Agent вместо браузерного; сессия
+                пула возвращается к своему агенту после разбора.
+
+        Returns:
+            dict: title, h1, первый абзац и поля из extract_fields.
+        """
+        from selenium.common.exceptions import TimeoutException
+
+        stage_started = time.perf_counter()
+
+        def stage_done(stage: str):
+            nonlocal stage_started
+            now = time.perf_counter()
+            PARSE_STAGE_SECONDS.observe(now - stage_started, tier="browser", stage=stage)
+            stage_started = now
+
+        try:
+            with self.pool.lease() as driver:
+                # Ожидание свободной сессии или запуск Chrome
+                stage_done("lease")
+                default_agent = None
+                if user_agent:
+                    default_agent = driver.execute_script("return navigator.userAgent")
+                    driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": user_agent})
+                try:
+                    try:
+                        driver.get(url)
+                    except TimeoutException:
+                        # Страница грузится дольше PARSER_PAGE_LOAD_TIMEOUT — работаем с тем, что есть
+                        pass
+                    stage_done("navigation")
+                    self._wait_until_ready(driver)
+                    stage_done("wait")
+                    fields = self._fields(full_text, links)
+                    extracted = driver.execute_script(
+                        _EXTRACT_JS, list(fields), self.min_paragraph_length, self.max_headings, MAX_LINKS
+                    ) or {}
+                finally:
+                    if default_agent:
+                        driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": default_agent})
+                parsed = {field: extracted.get(field, [] if field in ("headings", "links") else "") for field in fields}
+                if links:
+                    parsed["links"] = _absolute_links(url, parsed["links"])
+                    parsed["canonical"] = extracted.get("canonical") or ""
+                parsed.update({"tier": "browser", "error": None})
+                stage_done("extraction")
+            PARSE_RESULTS.inc(tier="browser", outcome="ok")
+            return parsed
         except Exception as e:
-            return {"title": "", "h1": "", "first_paragraph": "", "error": str(e)}
+            PARSE_RESULTS.inc(tier="browser", outcome="error")
+            return {"title": "", "h1": "", "first_paragraph": "", "tier": "browser", "error": str(e)}
+
+    def stats(self) -> dict:
+        """
+        Возвращает статистику пула браузеров и HTTP-кэша.
 
-parser_service = ParserService()
+        Returns:
+            dict: Статистика пула и, в ключе http_cache, статистика кэша по хостам.
+        """
+        return {**self.pool.stats(), "http_cache": self.http_cache.stats()}
+
+    def close(self):
+        """
+        Освобождает ресурсы парсера (HTTP-клиент и браузеры пула).
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._http is not None:
+            self._http.close()
+        self.pool.close()
 
-parser_service = ParserService()
+@lazy_service
+def get_parser_service() -> ParserService:
+    return ParserService()
@@ -0,0 +1,310 @@
+"""
+Ограничение исходящих запросов к модели: бюджеты RPM/TPM, одновременность, повторы.
+"""
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional
+from backend.config import settings
+from backend.services.metrics import metrics, service_stats
+from backend.services.shared_store import SharedStore, shared_store
+from backend.startup import lazy_service
+
+# HTTP-статусы, после которых запрос имеет смысл повторить
+RETRY_STATUSES = (408, 409, 429, 500, 502, 503, 504)
+
+QUEUE_WAIT_SECONDS = metrics.histogram(
+    "openai_queue_wait_seconds", "Ожидание в очереди ограничителя до первой попытки вызова модели"
+)
+
+
+def estimate_tokens(text: str, completion_tokens: int = 0) -> int:
+    """
+    Грубая оценка числа токенов запроса для бюджета TPM: около трёх
+    символов на токен для смеси русского и английского текста плюс
+    резерв на ответ.
+
+    Args:
+        text (str): Промпт целиком.
+        completion_tokens (int): Ожидаемый размер ответа.
+
+    Returns:
+        int: Оценка числа токенов.
+    """
+    return len(text) // 3 + 1 + completion_tokens
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """
+    Извлекает задержку из заголовков Retry-After / retry-after-ms ответа с ошибкой.
+
+    Args:
+        error (Exception): Исключение клиента OpenAI (или httpx).
+
+    Returns:
+        float | None: Задержка в секундах или None.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Ошибка временная: лимит провайдера, перегрузка или сбой соединения.
+    """
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status in RETRY_STATUSES
+    # APIConnectionError / APITimeoutError клиента OpenAI и сетевые ошибки httpx
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout")
+
+
+class TokenBucket:
+    """
+    Корзина токенов с пополнением per_minute единиц в минуту и ёмкостью
+    в минутный бюджет. Ожидающие обслуживаются по очереди.
+    """
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float) -> float:
+        """
+        Ждёт, пока в корзине наберётся amount единиц, и списывает их.
+
+        Args:
+            amount (float): Сколько списать; больше ёмкости — списывается вся ёмкость.
+
+        Returns:
+            float: Время ожидания в секундах.
+        """
+        amount = min(amount, self.capacity)
+        started = time.monotonic()
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+        return time.monotonic() - started
+
+
+class SharedTokenBucket:
+    """
+    Корзина токенов в общем хранилище: один бюджет на все процессы.
+
+    Каждое списание — одно атомарное резервирование в хранилище; если
+    бюджета не хватает, процесс спит ровно до момента, когда пополнение
+    покроет его резерв. Интерфейс тот же, что у TokenBucket.
+    """
+    def __init__(self, store: SharedStore, name: str, per_minute: float):
+        self.store = store
+        self.name = name
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        # Остаток после последнего списания этим процессом (для статистики)
+        self.tokens = per_minute
+
+    async def acquire(self, amount: float) -> float:
+        started = time.monotonic()
+        remaining = await asyncio.to_thread(self.store.reserve, self.name, amount, self.capacity)
+        self.tokens = max(0.0, remaining)
+        if remaining < 0:
+            await asyncio.sleep(-remaining / self.rate)
+        return time.monotonic() - started
+
+
+class RateLimiter:
+    """
+    Общий ограничитель вызовов модели.
+
+    Запрос сначала ждёт место среди max_in_flight одновременных вызовов,
+    затем бюджеты запросов (rpm) и токенов (tpm) в минуту; лимит 0
+    отключает соответствующий бюджет. Запросы сверх лимитов не отклоняются,
+    а ждут в очереди. Временные ошибки (429, 5xx, сбой соединения)
+    повторяются до max_retries раз с экспоненциальной задержкой и
+    случайным разбросом; если провайдер прислал Retry-After, ждём не меньше.
+
+    С общим хранилищем (shared) бюджеты RPM и TPM делятся между всеми
+    воркерами: лимит провайдера один на ключ API, сколько бы процессов
+    ни было запущено. Ограничение max_in_flight действует на процесс.
+    """
+    def __init__(
+        self,
+        rpm: int = settings.OPENAI_RPM,
+        tpm: int = settings.OPENAI_TPM,
+        max_in_flight: int = settings.OPENAI_MAX_IN_FLIGHT,
+        max_retries: int = settings.OPENAI_MAX_RETRIES,
+        base_delay: float = settings.OPENAI_RETRY_BASE_DELAY,
+        max_delay: float = settings.OPENAI_RETRY_MAX_DELAY,
+        shared: Optional[SharedStore] = None,
+    ):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.shared = shared
+        self._requests = self._bucket("openai_rpm", rpm)
+        self._tokens = self._bucket("openai_tpm", tpm)
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._queued = 0
+        self._in_flight = 0
+        self._counters = {
+            "calls": 0,
+            "attempts": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "failures": 0,
+        }
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _bucket(self, name: str, per_minute: int):
+        if not per_minute:
+            return None
+        if self.shared is not None:
+            return SharedTokenBucket(self.shared, name, per_minute)
+        return TokenBucket(per_minute)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """
+        Задержка перед повтором: base_delay * 2^attempt со случайным
+        разбросом (full jitter), но не меньше Retry-After.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        hint = retry_after(error)
+        if hint is not None:
+            delay = max(delay, min(hint, self.max_delay))
+        return delay
+
+    async def _admit(self, tokens: int):
+        """
+        Ждёт бюджеты RPM и TPM перед очередной попыткой.
+        """
+        if self._requests is not None:
+            await self._requests.acquire(1)
+        if self._tokens is not None:
+            await self._tokens.acquire(tokens)
+
+    async def run(self, func: Callable[[], Awaitable], tokens: int = 0):
+        """
+        Выполняет вызов модели в рамках лимитов.
+
+        Args:
+            func (Callable): Фабрика корутины вызова; вызывается на каждую попытку.
+            tokens (int): Оценка токенов запроса для бюджета TPM.
+
+        Raises:
+            Exception: Ошибка последней попытки или невременная ошибка.
+
+        Returns:
+            Результат func().
+        """
+        self._counters["calls"] += 1
+        # В очереди — пока не началась первая попытка: ожидание слота и бюджетов
+        self._queued += 1
+        queued = True
+        started = time.monotonic()
+        try:
+            await self._slots.acquire()
+            self._in_flight += 1
+            try:
+                attempt = 0
+                while True:
+                    await self._admit(tokens)
+                    if queued:
+                        queued = False
+                        self._queued -= 1
+                        waited = time.monotonic() - started
+                        QUEUE_WAIT_SECONDS.observe(waited)
+                        self._wait_total += waited
+                        self._wait_max = max(self._wait_max, waited)
+                    self._counters["attempts"] += 1
+                    try:
+                        return await func()
+                    except Exception as e:
+                        if getattr(e, "status_code", None) == 429:
+                            self._counters["rate_limited"] += 1
+                        if attempt >= self.max_retries or not is_retryable(e):
+                            self._counters["failures"] += 1
+                            raise
+                        delay = self._backoff(attempt, e)
+                    attempt += 1
+                    self._counters["retries"] += 1
+                    await asyncio.sleep(delay)
+            finally:
+                self._in_flight -= 1
+                self._slots.release()
+        finally:
+            if queued:
+                self._queued -= 1
+
+    def stats(self) -> dict:
+        """
+        Возвращает глубину очереди, число выполняющихся вызовов, счётчики
+        повторов и время ожидания до первой попытки.
+
+        Returns:
+            dict: Статистика ограничителя.
+        """
+        calls = self._counters["calls"]
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "max_in_flight": self.max_in_flight,
+            "queued": self._queued,
+            "in_flight": self._in_flight,
+            **self._counters,
+            "wait_seconds_total": round(self._wait_total, 4),
+            "wait_seconds_avg": round(self._wait_total / calls, 4) if calls else 0.0,
+            "wait_seconds_max": round(self._wait_max, 4),
+            "tokens_available": round(self._tokens.tokens) if self._tokens is not None else None,
+        }
+
+
+@lazy_service
+def get_model_rate_limiter() -> RateLimiter:
+    return RateLimiter(shared=shared_store())
+
+
+metrics.gauge("openai_queue_depth", "Вызовы модели в очереди ограничителя", lambda: service_stats(get_model_rate_limiter).get("queued"))
+metrics.gauge("openai_in_flight", "Выполняющиеся вызовы модели", lambda: service_stats(get_model_rate_limiter).get("in_flight"))
+metrics.gauge(
+    "openai_retries_total", "Повторы вызовов модели", lambda: service_stats(get_model_rate_limiter).get("retries"), type_name="counter"
+)
+metrics.gauge(
+    "openai_rate_limited_total", "Ответы 429 от провайдера",
+    lambda: service_stats(get_model_rate_limiter).get("rate_limited"), type_name="counter",
+)
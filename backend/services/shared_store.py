@@ -0,0 +1,283 @@
+"""
+Общее состояние нескольких процессов backend: кэш, бюджеты запросов, аренды.
+"""
+import importlib
+import json
+from abc import ABC, abstractmethod
+import threading
+import time
+from typing import Optional
+from backend.config import settings
+from backend.services.metrics import metrics, service_stats
+from backend.services.sqlite_store import SQLiteStore
+from backend.startup import lazy_service
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_kv_expires ON kv(expires_at);
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SharedStore(ABC):
+    """
+    Хранилище, общее для всех воркеров uvicorn (и для нескольких машин,
+    если реализация сетевая).
+
+    Три примитива: значения с TTL по пространствам имён (второй уровень
+    кэша анализа), корзины токенов с атомарным резервированием (бюджеты
+    RPM/TPM провайдера на все процессы) и именованные аренды (один
+    планировщик на все процессы). Методы синхронные и вызываются из
+    потоков; время — секунды Unix, одинаковые для всех процессов.
+
+    Внешнее хранилище подключается настройкой SHARED_STORE_FACTORY:
+    фабрика получает SHARED_STORE_URL и возвращает наследника этого класса.
+    """
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[dict]:
+        """
+        Возвращает значение, если оно есть и не устарело.
+
+        Args:
+            namespace (str): Пространство имён ("analysis").
+            key (str): Ключ.
+
+        Returns:
+            dict | None: Значение или None.
+        """
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: dict, ttl_seconds: float):
+        """
+        Сохраняет JSON-совместимое значение на ttl_seconds секунд.
+        """
+
+    @abstractmethod
+    def clear(self, namespace: str):
+        """
+        Удаляет все значения пространства имён.
+        """
+
+    @abstractmethod
+    def reserve(self, bucket: str, amount: float, per_minute: float) -> float:
+        """
+        Атомарно списывает amount единиц из корзины с пополнением
+        per_minute в минуту и ёмкостью в минутный бюджет.
+
+        Если единиц не хватает, корзина уходит в минус: списание
+        становится резервом, и вызывающий ждёт, пока пополнение его
+        покроет. Так процессы обслуживаются по очереди резервирования
+        за одно обращение к хранилищу, без опроса.
+
+        Args:
+            bucket (str): Имя корзины.
+            amount (float): Сколько списать (не больше ёмкости).
+            per_minute (float): Бюджет в минуту.
+
+        Returns:
+            float: Остаток после списания; отрицательный остаток
+                покроется через -остаток / (per_minute / 60) секунд.
+        """
+
+    @abstractmethod
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        """
+        Берёт или продлевает аренду: она достаётся owner, если свободна,
+        истекла или уже принадлежит ему.
+
+        Returns:
+            bool: True, если аренда у owner.
+        """
+
+    @abstractmethod
+    def release_lease(self, name: str, owner: str):
+        """
+        Освобождает аренду, если она принадлежит owner.
+        """
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """
+        Возвращает размер хранилища и состояние корзин и аренд.
+        """
+
+
+class SQLiteSharedStore(SharedStore):
+    """
+    Общее хранилище в файле SQLite для воркеров на одной машине.
+
+    База в режиме WAL: чтения кэша не блокируют друг друга, а изменения
+    корзин и аренд выполняются в транзакции BEGIN IMMEDIATE и поэтому
+    атомарны между процессами. Устаревшие значения и значения сверх
+    max_items удаляются раз в PRUNE_EVERY записей.
+    """
+    PRUNE_EVERY = 200
+
+    def __init__(self, path: str, max_items: int = 0):
+        self.path = path
+        self.max_items = max_items
+        self.store = SQLiteStore(path)
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._writes = 0
+
+    def _connect(self):
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self.store.connect().executescript(_SCHEMA)
+                    self._initialized = True
+        return self.store.connect()
+
+    def get(self, namespace: str, key: str) -> Optional[dict]:
+        row = self._connect().execute(
+            "SELECT value FROM kv WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return json.loads(row["value"]) if row is not None else None
+
+    def set(self, namespace: str, key: str, value: dict, ttl_seconds: float):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value, ensure_ascii=False, default=str), time.time() + ttl_seconds),
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self._prune(conn)
+
+    def _prune(self, conn):
+        conn.execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),))
+        if self.max_items > 0:
+            # Первыми вытесняются значения, которые устареют раньше всех
+            conn.execute(
+                "DELETE FROM kv WHERE (namespace, key) IN "
+                "(SELECT namespace, key FROM kv ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_items,),
+            )
+
+    def clear(self, namespace: str):
+        self._connect().execute("DELETE FROM kv WHERE namespace = ?", (namespace,))
+
+    def reserve(self, bucket: str, amount: float, per_minute: float) -> float:
+        self._connect()
+        rate = per_minute / 60
+        with self.store.transaction() as conn:
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (bucket,)).fetchone()
+            tokens = per_minute if row is None else min(per_minute, row["tokens"] + (now - row["updated"]) * rate)
+            tokens -= min(amount, per_minute)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)", (bucket, tokens, now)
+            )
+        return tokens
+
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        self._connect()
+        with self.store.transaction() as conn:
+            now = time.time()
+            row = conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row["owner"] != owner and row["expires_at"] > now:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                (name, owner, now + ttl_seconds),
+            )
+        return True
+
+    def release_lease(self, name: str, owner: str):
+        self._connect().execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        now = time.time()
+        namespaces = {
+            row["namespace"]: row["items"]
+            for row in conn.execute(
+                "SELECT namespace, COUNT(*) AS items FROM kv WHERE expires_at > ? GROUP BY namespace", (now,)
+            )
+        }
+        buckets = {
+            row["name"]: round(row["tokens"], 2)
+            for row in conn.execute("SELECT name, tokens FROM buckets")
+        }
+        leases = {
+            row["name"]: row["owner"]
+            for row in conn.execute("SELECT name, owner FROM leases WHERE expires_at > ?", (now,))
+        }
+        return {"backend": "sqlite", "path": self.path, "items": namespaces, "buckets": buckets, "leases": leases}
+
+
+def create_shared_store(url: str, factory: str = "", max_items: int = 0) -> SharedStore:
+    """
+    Создаёт общее хранилище по адресу.
+
+    Args:
+        url (str): Адрес: sqlite:///путь/к/файлу.db или адрес внешнего хранилища.
+        factory (str): "модуль:функция" — фабрика внешнего хранилища,
+            которая получает url.
+        max_items (int): Лимит значений для SQLite (0 — без ограничения).
+
+    Returns:
+        SharedStore: Хранилище.
+
+    Raises:
+        ValueError: Адрес без фабрики и не sqlite.
+        TypeError: Фабрика вернула не SharedStore.
+    """
+    if factory:
+        module_name, _, attr = factory.partition(":")
+        store = getattr(importlib.import_module(module_name), attr)(url)
+        if not isinstance(store, SharedStore):
+            raise TypeError(f"SHARED_STORE_FACTORY {factory} вернула {type(store).__name__}, а не SharedStore")
+        return store
+    if url.startswith("sqlite:///"):
+        return SQLiteSharedStore(url[len("sqlite:///"):], max_items=max_items)
+    raise ValueError(f"Неподдерживаемый SHARED_STORE_URL: {url} (нужен sqlite:///... или SHARED_STORE_FACTORY)")
+
+
+@lazy_service
+def get_shared_store() -> SharedStore:
+    return create_shared_store(
+        settings.SHARED_STORE_URL,
+        factory=settings.SHARED_STORE_FACTORY,
+        max_items=settings.SHARED_STORE_MAX_ITEMS,
+    )
+
+
+def shared_store() -> Optional[SharedStore]:
+    """
+    Общее хранилище, если оно настроено; иначе None, и сервисы держат
+    кэш и бюджеты в памяти своего процесса.
+
+    Returns:
+        SharedStore | None: Хранилище.
+    """
+    if not (settings.SHARED_STORE_URL or settings.SHARED_STORE_FACTORY):
+        return None
+    return get_shared_store()
+
+
+def _shared_items() -> dict:
+    stats = service_stats(get_shared_store)
+    if not stats:
+        return {}
+    return {(namespace,): items for namespace, items in stats["items"].items()}
+
+
+metrics.gauge("shared_store_items", "Значений в общем хранилище процессов", _shared_items, ("namespace",))
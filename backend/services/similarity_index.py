@@ -0,0 +1,243 @@
+"""
+Поиск почти одинаковых текстов: MinHash-сигнатуры и LSH-индекс.
+"""
+import random
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+from backend.config import settings
+from backend.services.metrics import metrics, service_stats
+from backend.startup import lazy_service
+
+# Простое число Мерсенна 2^61 - 1: модуль универсальных хэш-функций MinHash
+_PRIME = (1 << 61) - 1
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingles(text: str, size: int) -> Set[int]:
+    """
+    Хэши словесных шинглов: всех последовательностей из size слов подряд.
+    Регистр и пунктуация не учитываются.
+
+    Args:
+        text (str): Текст.
+        size (int): Слов в шингле.
+
+    Returns:
+        set: crc32 шинглов; для текста короче size слов — хэш всего текста.
+    """
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return set()
+    return {
+        zlib.crc32(" ".join(words[i:i + size]).encode("utf-8"))
+        for i in range(max(1, len(words) - size + 1))
+    }
+
+
+def lsh_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Подбирает разбиение сигнатуры на bands полос по rows значений.
+
+    Пара текстов становится кандидатом, если совпала хотя бы одна полоса;
+    вероятность этого круто растёт около (1/bands)^(1/rows). Берётся
+    разбиение, у которого эта точка ниже порога сходства с запасом:
+    кандидатов чуть больше, зато похожие тексты почти не теряются, а
+    лишние отсеиваются проверкой по всей сигнатуре.
+
+    Args:
+        num_perm (int): Длина сигнатуры.
+        threshold (float): Порог сходства.
+
+    Returns:
+        tuple: (bands, rows).
+    """
+    best = (num_perm, 1)
+    best_point = -1.0
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        point = (1 / bands) ** (1 / rows)
+        if best_point < point <= threshold * 0.9:
+            best, best_point = (bands, rows), point
+    return best
+
+
+class SimilarityIndex:
+    """
+    Индекс ранее проанализированных текстов для поиска почти повторов:
+    та же страница с другой датой или ценой.
+
+    Текст представлен MinHash-сигнатурой множества словесных шинглов;
+    доля совпавших значений сигнатур оценивает коэффициент Жаккара.
+    Сигнатуры разложены по LSH-полосам, так что поиск сравнивает новый
+    текст только с кандидатами из совпавших полос, а не со всем
+    индексом. В индексе — ключи кэша анализа, не более max_items
+    (давно не использованные вытесняются).
+    """
+    def __init__(
+        self,
+        threshold: float,
+        num_perm: int = 64,
+        shingle_size: int = 3,
+        min_shingles: int = 5,
+        max_items: int = 10000,
+        enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.min_shingles = min_shingles
+        self.max_items = max_items
+        self.bands, self.rows = lsh_bands(num_perm, threshold)
+        rng = random.Random(num_perm)
+        self._permutations = [(rng.randrange(1, _PRIME), rng.randrange(_PRIME)) for _ in range(num_perm)]
+        self._signatures: OrderedDict = OrderedDict()
+        self._buckets: Dict[Tuple[int, tuple], Set[str]] = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stale": 0, "candidates": 0, "skipped": 0}
+
+    def signature(self, text: str) -> Optional[tuple]:
+        """
+        MinHash-сигнатура текста.
+
+        Args:
+            text (str): Текст.
+
+        Returns:
+            tuple | None: Сигнатура или None, если индекс выключен или
+                текст слишком короткий для надёжного сравнения.
+        """
+        if not self.enabled:
+            return None
+        hashes = shingles(text, self.shingle_size)
+        if len(hashes) < self.min_shingles:
+            with self._lock:
+                self._counters["skipped"] += 1
+            return None
+        return tuple(min((a * value + b) % _PRIME for value in hashes) for a, b in self._permutations)
+
+    def _band_keys(self, signature: tuple) -> List[Tuple[int, tuple]]:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def query(self, signature: Optional[tuple]) -> Optional[Tuple[str, float]]:
+        """
+        Ищет самый похожий текст с оценкой сходства не ниже порога.
+
+        Args:
+            signature (tuple | None): Сигнатура нового текста.
+
+        Returns:
+            tuple | None: Ключ кэша найденного текста и оценка сходства.
+        """
+        if signature is None:
+            return None
+        with self._lock:
+            candidates = set()
+            for band_key in self._band_keys(signature):
+                candidates.update(self._buckets.get(band_key, ()))
+            self._counters["candidates"] += len(candidates)
+            best_key, best_score = None, 0.0
+            for key in candidates:
+                stored = self._signatures[key]
+                score = sum(1 for x, y in zip(signature, stored) if x == y) / self.num_perm
+                if score > best_score:
+                    best_key, best_score = key, score
+            if best_key is None or best_score < self.threshold:
+                self._counters["misses"] += 1
+                return None
+            self._signatures.move_to_end(best_key)
+            self._counters["hits"] += 1
+            return best_key, best_score
+
+    def add(self, key: str, signature: Optional[tuple]):
+        """
+        Добавляет проанализированный текст в индекс.
+
+        Args:
+            key (str): Ключ кэша анализа.
+            signature (tuple | None): Сигнатура текста.
+        """
+        if signature is None:
+            return
+        with self._lock:
+            if key in self._signatures:
+                self._signatures.move_to_end(key)
+                return
+            self._signatures[key] = signature
+            for band_key in self._band_keys(signature):
+                self._buckets.setdefault(band_key, set()).add(key)
+            while len(self._signatures) > self.max_items:
+                self._remove(next(iter(self._signatures)))
+
+    def discard(self, key: str):
+        """
+        Убирает текст из индекса: его анализ вытеснен из кэша или устарел.
+
+        Args:
+            key (str): Ключ кэша анализа.
+        """
+        with self._lock:
+            if key in self._signatures:
+                self._counters["stale"] += 1
+                self._remove(key)
+
+    def _remove(self, key: str):
+        signature = self._signatures.pop(key)
+        for band_key in self._band_keys(signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def stats(self) -> dict:
+        """
+        Возвращает счётчики поиска и размер индекса.
+
+        Returns:
+            dict: Статистика индекса.
+        """
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "bands": self.bands,
+                "rows": self.rows,
+                "items": len(self._signatures),
+                "hit_ratio": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+                "candidates_avg": round(self._counters["candidates"] / lookups, 2) if lookups else 0.0,
+            }
+
+
+@lazy_service
+def get_similarity_index() -> SimilarityIndex:
+    return SimilarityIndex(
+        threshold=settings.SIMILARITY_THRESHOLD,
+        num_perm=settings.SIMILARITY_NUM_PERM,
+        shingle_size=settings.SIMILARITY_SHINGLE_SIZE,
+        min_shingles=settings.SIMILARITY_MIN_SHINGLES,
+        max_items=settings.SIMILARITY_MAX_ITEMS,
+        enabled=settings.SIMILARITY_ENABLED,
+    )
+
+
+def _lookup_counts() -> dict:
+    stats = service_stats(get_similarity_index)
+    if not stats:
+        return {}
+    return {("hit",): stats["hits"], ("miss",): stats["misses"], ("stale",): stats["stale"]}
+
+
+metrics.gauge(
+    "similarity_index_lookups_total", "Поиск почти повторов текста по результату",
+    _lookup_counts, ("result",), type_name="counter",
+)
+metrics.gauge("similarity_index_items", "Текстов в индексе почти повторов", lambda: service_stats(get_similarity_index).get("items"))
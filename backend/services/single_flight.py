@@ -0,0 +1,59 @@
+"""
+Объединение одновременных одинаковых запросов (single-flight).
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Объединяет конкурентные вызовы с одинаковым ключом в одно вычисление.
+
+    Первый вызов запускает вычисление, остальные ждут его результата.
+    Ошибка передаётся всем ожидающим и не запоминается: после завершения
+    ключ освобождается, и следующий вызов начнёт вычисление заново.
+    """
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Выполняет func() или присоединяется к уже идущему вызову с тем же ключом.
+
+        Args:
+            key (str): Ключ запроса.
+            func (Callable): Фабрика корутины с вычислением.
+
+        Returns:
+            Результат вычисления.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        # shield: отмена одного ожидающего не должна отменять общее вычисление
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Помечаем исключение как полученное, даже если все ожидающие ушли
+            task.exception()
+
+    def stats(self) -> dict:
+        """
+        Возвращает счётчики запусков и объединённых вызовов.
+
+        Returns:
+            dict: Статистика.
+        """
+        return {"in_flight": len(self._calls), "started": self.started, "coalesced": self.coalesced}
@@ -0,0 +1,66 @@
+"""
+Общие соединения SQLite для сервисов с локальным хранилищем.
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+
+def now_timestamp() -> str:
+    """
+    Текущее локальное время в ISO-формате фиксированной длины: такие
+    строки сортируются и сравниваются в SQL так же, как даты.
+
+    Returns:
+        str: Время в формате базы.
+    """
+    return datetime.now().isoformat(timespec="microseconds")
+
+
+class SQLiteStore:
+    """
+    Соединения с одной базой SQLite: по одному на поток, в режиме WAL,
+    чтобы читатели не блокировали писателя, а несколько процессов могли
+    работать с одним файлом.
+    """
+    def __init__(self, path: str, pragmas: tuple = ()):
+        self.path = path
+        self.pragmas = pragmas
+        self._local = threading.local()
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Возвращает соединение текущего потока, создавая его при необходимости.
+
+        Returns:
+            sqlite3.Connection: Соединение в режиме autocommit.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for pragma in self.pragmas:
+                conn.execute(f"PRAGMA {pragma}")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """
+        Транзакция с блокировкой записи с самого начала (BEGIN IMMEDIATE),
+        чтобы «прочитать и обновить» было атомарно между процессами.
+
+        Yields:
+            sqlite3.Connection: Соединение внутри транзакции.
+        """
+        conn = self.connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
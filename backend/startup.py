@@ -0,0 +1,91 @@
+"""
+Отложенное создание сервисов и отчёт о времени запуска.
+"""
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, Optional, TypeVar
+
+import backend
+
+T = TypeVar("T")
+
+
+class StartupReport:
+    """
+    Время этапов запуска от импорта пакета backend: импорт приложения,
+    обработчик startup, первый ответ /health, а также когда и за сколько
+    был создан каждый сервис.
+    """
+    def __init__(self, started: float):
+        self.started = started
+        self._lock = threading.Lock()
+        self._stages: Dict[str, float] = {}
+        self._services: Dict[str, dict] = {}
+
+    def _elapsed(self) -> float:
+        return round(time.perf_counter() - self.started, 4)
+
+    def mark(self, stage: str):
+        """
+        Отмечает этап запуска; повторные отметки того же этапа игнорируются.
+
+        Args:
+            stage (str): Имя этапа.
+        """
+        with self._lock:
+            self._stages.setdefault(stage, self._elapsed())
+
+    def service_created(self, name: str, seconds: float):
+        with self._lock:
+            self._services[name] = {"created_at": self._elapsed(), "seconds": round(seconds, 4)}
+
+    def report(self) -> dict:
+        """
+        Возвращает отчёт о запуске.
+
+        Returns:
+            dict: Этапы (секунды от импорта backend) и созданные сервисы.
+        """
+        with self._lock:
+            return {"stages": dict(self._stages), "services": dict(self._services), "uptime": self._elapsed()}
+
+
+startup_report = StartupReport(backend.IMPORT_STARTED)
+
+
+def lazy_service(factory: Callable[[], T]) -> Callable[[], T]:
+    """
+    Превращает фабрику в функцию доступа к единственному экземпляру,
+    который создаётся при первом обращении (зависимость FastAPI или
+    вызов из другого сервиса) и отмечается в отчёте о запуске.
+
+    Функция может вызываться одновременно из event loop и из пула
+    потоков, поэтому создание защищено блокировкой: экземпляр всегда один.
+
+    У функции есть метод existing(): экземпляр, если он уже создан,
+    иначе None — например, чтобы при остановке не создавать сервис ради
+    того, чтобы его закрыть.
+
+    Args:
+        factory (Callable): Функция, создающая сервис.
+
+    Returns:
+        Callable: Функция get_*() без аргументов.
+    """
+    lock = threading.Lock()
+    instance: Optional[T] = None
+
+    @wraps(factory)
+    def get() -> T:
+        nonlocal instance
+        if instance is None:
+            with lock:
+                if instance is None:
+                    started = time.perf_counter()
+                    instance = factory()
+                    startup_report.service_created(factory.__name__.replace("get_", "", 1), time.perf_counter() - started)
+        return instance
+
+    get.existing = lambda: instance
+    return get
@@ -0,0 +1,3 @@
+"""
+Нагрузочные замеры backend на локальных фикстурах без сети и без OpenAI.
+"""
@@ -0,0 +1,128 @@
+"""
+Замер обхода сайта на локальном сайте-фикстуре.
+
+Поднимает HTTP-сервер с сайтом конкурента (benchmarks.fixtures.build_site)
+и обходит его CrawlService в этом же процессе при разных ограничениях
+на хост. Для каждого уровня — время обхода, страниц в секунду и число
+собранных, повторных и запрещённых robots.txt страниц:
+
+    python -m benchmarks.crawl --products 40 --host-concurrency 1,2,4 --site-latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from benchmarks.fixtures import FixtureServer, build_site
+from benchmarks.run import _git_revision
+
+
+async def run(args: argparse.Namespace, data_dir: Path) -> dict:
+    # Настройки backend читаются из окружения при первом импорте
+    os.environ.update({
+        "HISTORY_DB_PATH": str(data_dir / "history.db"),
+        "JOBS_DB_PATH": str(data_dir / "jobs.db"),
+        "MONITORS_DB_PATH": str(data_dir / "monitors.db"),
+        "SHARED_STORE_URL": "",
+        "PARSER_HTTP_CACHE_DIR": "",
+        "ANALYSIS_CACHE_DIR": "",
+        "PARSER_MAX_WORKERS": str(args.parser_workers),
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY") or "benchmark",
+        "OPENAI_RPM": "0",
+        "OPENAI_TPM": "0",
+    })
+    from backend.services.analysis_service import get_analysis_service
+    from backend.services.crawl_service import CrawlService
+    from backend.services.history_service import get_history_service
+    from backend.services.openai_service import get_openai_service
+    from benchmarks.fake_model import FakeModel
+
+    FakeModel(latency=args.model_latency, jitter=0.0, seed=args.seed).install(get_openai_service())
+    get_history_service().initialize()
+
+    site = build_site(data_dir / "site", args.products, seed=args.seed)
+    fixtures = FixtureServer(data_dir / "site", latency=args.site_latency)
+    fixtures.start()
+    root = fixtures.url(site["sitemap"] if args.sitemap else site["root"])
+    expected = site["unique"] if args.sitemap else sum(
+        count for depth, count in site["by_depth"].items() if depth <= args.max_depth
+    )
+    results = []
+    try:
+        for host_concurrency in args.host_concurrency:
+            service = CrawlService(
+                analysis=get_analysis_service(),
+                max_pages=args.max_pages,
+                max_depth=args.max_depth,
+                concurrency=args.concurrency,
+                host_concurrency=host_concurrency,
+                host_delay=args.host_delay,
+            )
+            response = await service.crawl(root, analyze=args.analyze)
+            result = {
+                "host_concurrency": host_concurrency,
+                "expected_unique": min(expected, args.max_pages),
+                **response.stats,
+                "chunks": response.chunks,
+                "crawl_error": response.error,
+            }
+            results.append(result)
+            print(
+                f"host_concurrency={host_concurrency:<3} {result['pages']:>4} pages  "
+                f"{result['seconds']:>7} s  {result['pages_per_second']:>7} pages/s  "
+                f"ok={result['ok']} duplicates={result['duplicates']} robots={result['robots']}",
+                file=sys.stderr,
+            )
+    finally:
+        fixtures.stop()
+        get_analysis_service().parser.close()
+    return {"root": root, "results": results}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Замер обхода сайта на локальной фикстуре")
+    parser.add_argument("--products", type=int, default=40, help="Товаров на сайте-фикстуре")
+    parser.add_argument("--sitemap", action="store_true", help="Начинать с sitemap.xml, а не с главной")
+    parser.add_argument("--max-pages", type=int, default=200, help="Бюджет страниц")
+    parser.add_argument("--max-depth", type=int, default=3, help="Глубина переходов по ссылкам")
+    parser.add_argument("--concurrency", type=int, default=8, help="Одновременных загрузок всего")
+    parser.add_argument("--host-concurrency", default="1,2,4", help="Уровни одновременности на хост через запятую")
+    parser.add_argument("--host-delay", type=float, default=0.0, help="Пауза между запросами к хосту, с")
+    parser.add_argument("--site-latency", type=float, default=0.05, help="Задержка ответа сайта-фикстуры, с")
+    parser.add_argument("--parser-workers", type=int, default=8, help="PARSER_MAX_WORKERS")
+    parser.add_argument("--analyze", action="store_true", help="Анализировать контент заглушкой модели")
+    parser.add_argument("--model-latency", type=float, default=0.2, help="Задержка заглушки модели, с")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Файл для JSON-результата (по умолчанию stdout)")
+    args = parser.parse_args(argv)
+    args.host_concurrency = [int(value) for value in args.host_concurrency.split(",")]
+    return args
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    started_at = datetime.now().isoformat(timespec="seconds")
+    with tempfile.TemporaryDirectory(prefix="competitor-crawl-") as tmp:
+        report = asyncio.run(run(args, Path(tmp)))
+    report = {
+        "started_at": started_at,
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "parameters": {key: value for key, value in vars(args).items() if key != "output"},
+        **report,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
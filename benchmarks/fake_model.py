@@ -0,0 +1,108 @@
+"""
+Локальная замена вызовов OpenAI с настраиваемой задержкой и долей ошибок.
+"""
+import asyncio
+import random
+from typing import AsyncIterator, Optional
+
+from backend.models.schemas import CompetitorAnalysis, ImageAnalysis
+from backend.services.openai_service import OpenAIService
+
+
+class FakeModelError(Exception):
+    """
+    Ошибка провайдера. status_code, как у исключений клиента OpenAI,
+    чтобы ограничитель повторял её так же, как настоящие 429 и 5xx.
+    """
+    def __init__(self, status_code: int):
+        super().__init__(f"Fake model error {status_code}")
+        self.status_code = status_code
+
+
+class FakeModel:
+    """
+    Отвечает фиксированными анализами после случайной задержки.
+
+    Задержка равномерно распределена в latency ± jitter секунд; с
+    вероятностью error_rate вызов завершается FakeModelError со статусом
+    из error_statuses. Потоковый ответ отдаётся фрагментами по
+    stream_chunk символов с равномерно распределённой задержкой.
+    """
+    def __init__(
+        self,
+        latency: float = 0.5,
+        jitter: float = 0.2,
+        error_rate: float = 0.0,
+        error_statuses: tuple = (429, 503),
+        stream_chunk: int = 32,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.stream_chunk = stream_chunk
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+
+    def _delay(self) -> float:
+        return max(0.0, self._rng.uniform(self.latency - self.jitter, self.latency + self.jitter))
+
+    async def _respond(self):
+        self.calls += 1
+        await asyncio.sleep(self._delay())
+        if self._rng.random() < self.error_rate:
+            self.errors += 1
+            raise FakeModelError(self._rng.choice(self.error_statuses))
+
+    async def complete_text(self, text: str) -> CompetitorAnalysis:
+        await self._respond()
+        return _text_analysis(len(text))
+
+    async def complete_image(self, image_bytes: bytes) -> ImageAnalysis:
+        await self._respond()
+        return _image_analysis(len(image_bytes))
+
+    async def open_text_stream(self, text: str) -> AsyncIterator[str]:
+        # Ошибка и время до первого токена — до начала потока, как у API
+        await self._respond()
+        return self._stream(_text_analysis(len(text)).model_dump_json())
+
+    async def _stream(self, payload: str) -> AsyncIterator[str]:
+        chunks = range(0, len(payload), self.stream_chunk)
+        pause = self._delay() / max(1, len(chunks))
+        for start in chunks:
+            await asyncio.sleep(pause)
+            yield payload[start:start + self.stream_chunk]
+
+    def install(self, service: OpenAIService):
+        """
+        Подменяет вызовы модели сервиса. Кэш, объединение запросов и
+        ограничитель остаются настоящими.
+
+        Args:
+            service (OpenAIService): Сервис, обычно get_openai_service().
+        """
+        service._complete_text_async = self.complete_text
+        service._complete_image_async = self.complete_image
+        service._open_text_stream = self.open_text_stream
+
+
+def _text_analysis(size: int) -> CompetitorAnalysis:
+    return CompetitorAnalysis(
+        strengths=["Быстрая доставка", "Широкий ассортимент", f"Подробное описание ({size} символов)"],
+        weaknesses=["Высокие цены", "Мало акций"],
+        unique_offers=["Собственное производство"],
+        recommendations=["Снизить цены на ключевые позиции", "Запустить программу лояльности"],
+        summary="Ответ локальной заглушки модели для замеров.",
+    )
+
+
+def _image_analysis(size: int) -> ImageAnalysis:
+    return ImageAnalysis(
+        description=f"Баннер {size} байт: ответ локальной заглушки модели для замеров.",
+        insights=["Яркий фон", "Крупные блоки"],
+        visual_style_score=7,
+        recommendations=["Усилить контраст", "Добавить призыв к действию"],
+    )
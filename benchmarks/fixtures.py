@@ -0,0 +1,316 @@
+"""
+Корпус страниц конкурентов и изображений для замеров и локальный HTTP-сервер для страниц.
+"""
+import io
+import json
+import random
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List
+from urllib.parse import parse_qs, urlsplit
+
+_COMPANIES = ["Альфа Маркет", "Бета Логистик", "Гамма Сервис", "Дельта Трейд", "Омега Групп", "Вектор Плюс"]
+_OFFERS = [
+    "доставка за один день по всей России",
+    "бесплатный возврат в течение тридцати дней",
+    "персональный менеджер для корпоративных клиентов",
+    "скидка двадцать процентов на первый заказ",
+    "круглосуточная поддержка в чате и по телефону",
+    "рассрочка без переплаты на двенадцать месяцев",
+    "собственное производство и контроль качества",
+    "пункты выдачи в каждом крупном городе",
+]
+_SENTENCES = [
+    "Компания {company} работает на рынке более десяти лет и предлагает {offer}.",
+    "Клиенты отмечают, что {offer} выгодно отличает {company} от конкурентов.",
+    "В этом сезоне {company} запускает новую программу лояльности: {offer}.",
+    "Для бизнеса {company} подготовила отдельные условия, включая {offer}.",
+    "Отзывы покупателей подтверждают: {offer} действительно работает.",
+]
+
+_STATIC_TEMPLATE = """<!DOCTYPE html>
+<html lang="ru">
+<head><meta charset="utf-8"><title>{title}</title></head>
+<body>
+<header><nav><a href="/">Главная</a> <a href="/catalog">Каталог</a></nav></header>
+<main>
+<h1>{h1}</h1>
+{paragraphs}
+</main>
+</body>
+</html>
+"""
+
+# Контент появляется только после выполнения скрипта: HTTP-уровень
+# парсера видит пустой #root и передаёт страницу браузеру
+_JS_TEMPLATE = """<!DOCTYPE html>
+<html lang="ru">
+<head><meta charset="utf-8"><title>{title}</title></head>
+<body>
+<div id="root"></div>
+<noscript>Для работы сайта включите JavaScript.</noscript>
+<script>
+setTimeout(function () {{
+  var root = document.getElementById("root");
+  root.innerHTML = {content};
+}}, 50);
+</script>
+</body>
+</html>
+"""
+
+
+def _paragraphs(rng: random.Random, company: str, count: int) -> List[str]:
+    return [
+        " ".join(
+            rng.choice(_SENTENCES).format(company=company, offer=rng.choice(_OFFERS))
+            for _ in range(rng.randint(2, 5))
+        )
+        for _ in range(count)
+    ]
+
+
+def competitor_text(index: int, seed: int = 0) -> str:
+    """
+    Текст о конкуренте для /analyze_text: одинаковый при одинаковых index и seed.
+
+    Args:
+        index (int): Номер текста.
+        seed (int): Зерно генератора.
+
+    Returns:
+        str: Текст из нескольких абзацев.
+    """
+    rng = random.Random(f"{seed}:{index}")
+    return "\n\n".join(_paragraphs(rng, rng.choice(_COMPANIES), rng.randint(2, 6)))
+
+
+def build_pages(directory: Path, count: int, seed: int = 0) -> dict:
+    """
+    Записывает в каталог статические (static_N.html) и отрисовываемые
+    скриптом (js_N.html) страницы.
+
+    Args:
+        directory (Path): Каталог корпуса.
+        count (int): Число страниц каждого вида.
+        seed (int): Зерно генератора.
+
+    Returns:
+        dict: Имена файлов: {"static": [...], "js": [...]}.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    pages = {"static": [], "js": []}
+    for index in range(count):
+        rng = random.Random(f"{seed}:page:{index}")
+        company = rng.choice(_COMPANIES)
+        title = f"{company} — {rng.choice(_OFFERS)}"
+        h1 = f"{company}: {rng.choice(_OFFERS)}"
+        paragraphs = _paragraphs(rng, company, rng.randint(3, 12))
+
+        name = f"static_{index}.html"
+        (directory / name).write_text(_STATIC_TEMPLATE.format(
+            title=title,
+            h1=h1,
+            paragraphs="\n".join(f"<p>{text}</p>" for text in paragraphs),
+        ), encoding="utf-8")
+        pages["static"].append(name)
+
+        name = f"js_{index}.html"
+        content = f"<h1>{h1}</h1>" + "".join(f"<p>{text}</p>" for text in paragraphs)
+        (directory / name).write_text(_JS_TEMPLATE.format(
+            title=title,
+            content=json.dumps(content, ensure_ascii=False),
+        ), encoding="utf-8")
+        pages["js"].append(name)
+    return pages
+
+
+_SITE_TEMPLATE = """<!DOCTYPE html>
+<html lang="ru">
+<head><meta charset="utf-8"><title>{title}</title>{head}</head>
+<body>
+<header><nav><a href="/">Главная</a> <a href="/catalog/">Каталог</a> <a href="/about.html#contacts">О компании</a></nav></header>
+<main>
+<h1>{h1}</h1>
+{paragraphs}
+{links}
+</main>
+</body>
+</html>
+"""
+
+
+def build_site(directory: Path, products: int = 24, seed: int = 0) -> dict:
+    """
+    Записывает в каталог сайт конкурента для обхода: главная, «О компании»,
+    каталог из двух страниц, карточки товаров с версиями для печати
+    (canonical указывает на карточку), закрытый robots.txt раздел
+    /private/ и sitemap.xml. Ссылки повторяются с фрагментами и
+    utm-метками, есть внешняя ссылка и ссылка rel="nofollow".
+
+    Глубина от главной: каталог — 1, товары первой страницы каталога и
+    вторая страница — 2, товары второй страницы — 3.
+
+    Args:
+        directory (Path): Корень сайта.
+        products (int): Число товаров.
+        seed (int): Зерно генератора.
+
+    Returns:
+        dict: Адреса относительно корня: root, sitemap, unique (уникальные
+            страницы, доступные по robots.txt) и by_depth (сколько их на
+            каждой глубине).
+    """
+    rng = random.Random(f"{seed}:site")
+    company = rng.choice(_COMPANIES)
+
+    def page(path: str, title: str, links: List[str], head: str = "", paragraphs: int = 3):
+        target = directory / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(_SITE_TEMPLATE.format(
+            title=f"{title} — {company}",
+            head=head,
+            h1=title,
+            paragraphs="\n".join(f"<p>{text}</p>" for text in _paragraphs(rng, company, paragraphs)),
+            links="\n".join(links),
+        ), encoding="utf-8")
+
+    half = (products + 1) // 2
+    product_links = [f'<a href="/products/product_{index}.html">Товар {index}</a>' for index in range(products)]
+    page("index.html", f"{company}: интернет-магазин", [
+        '<a href="/catalog/?utm_source=main&utm_medium=banner">Весь каталог</a>',
+        '<a href="/private/admin.html">Вход для сотрудников</a>',
+        '<a href="https://example.com/partner">Партнёры</a>',
+        '<a href="/about.html" rel="nofollow">О компании</a>',
+    ], head='<link rel="canonical" href="/">')
+    page("about.html", "О компании", ['<a id="contacts">Контакты</a>'])
+    page("catalog/index.html", "Каталог", product_links[:half] + ['<a href="page2.html">Следующая страница</a>'])
+    page("catalog/page2.html", "Каталог, страница 2", product_links[half:] + ['<a href="./">Первая страница</a>'])
+    for index in range(products):
+        price = rng.randrange(990, 99990, 100)
+        canonical = f'<link rel="canonical" href="/products/product_{index}.html">'
+        links = ['<a href="/catalog/">Назад в каталог</a>', f'<a href="product_{index}_print.html">Версия для печати</a>']
+        page(f"products/product_{index}.html", f"Товар {index}: {price} ₽", links, head=canonical, paragraphs=4)
+        page(f"products/product_{index}_print.html", f"Товар {index}: {price} ₽", [], head=canonical, paragraphs=4)
+    page("private/admin.html", "Панель сотрудника", [])
+    (directory / "robots.txt").write_text("User-agent: *\nDisallow: /private/\n", encoding="utf-8")
+
+    listed = ["", "about.html", "catalog/", "catalog/page2.html"] + [f"products/product_{index}.html" for index in range(products)]
+    (directory / "sitemap.xml").write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        + "".join(f"<url><loc>{{base}}/{path}</loc></url>\n" for path in listed)
+        + "</urlset>\n",
+        encoding="utf-8",
+    )
+    return {
+        "root": "",
+        "sitemap": "sitemap.xml",
+        "unique": len(listed),
+        "by_depth": {0: 1, 1: 2, 2: half + 1, 3: products - half},
+    }
+
+
+def banner(index: int, seed: int = 0, size: int = 640) -> bytes:
+    """
+    Рисует баннер в PNG: у каждого номера свой фон и расположение блоков,
+    поэтому перцептивные хэши разных баннеров различаются и кэш анализа
+    не срабатывает.
+
+    Args:
+        index (int): Номер баннера.
+        seed (int): Зерно генератора.
+        size (int): Ширина в пикселях; высота — половина ширины.
+
+    Returns:
+        bytes: PNG-файл.
+    """
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(f"{seed}:image:{index}")
+    image = Image.new("RGB", (size, size // 2), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(8):
+        x, y = rng.randrange(size), rng.randrange(size // 2)
+        draw.rectangle(
+            (x, y, x + rng.randint(40, size // 2), y + rng.randint(20, size // 4)),
+            fill=tuple(rng.randrange(256) for _ in range(3)),
+        )
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class _FixtureHandler(SimpleHTTPRequestHandler):
+    """
+    Раздаёт файлы корпуса. На запрос страницы с ?v=N к заголовкам title
+    и h1 дописывается « (выпуск N)»: один файл даёт сколько угодно
+    разных страниц, и анализ каждой не берётся из кэша.
+    """
+    def __init__(self, *args, latency: float = 0.0, **kwargs):
+        # Обработчик разбирает запрос прямо в конструкторе базового класса
+        self.latency = latency
+        super().__init__(*args, **kwargs)
+
+    def send_head(self):
+        if self.latency:
+            time.sleep(self.latency)
+        path = Path(self.translate_path(self.path))
+        if path.name == "sitemap.xml" and path.is_file():
+            return self._send_sitemap(path)
+        query = parse_qs(urlsplit(self.path).query)
+        if "v" not in query or path.suffix != ".html" or not path.is_file():
+            return super().send_head()
+        variant = f" (выпуск {query['v'][0]})"
+        html = path.read_text(encoding="utf-8")
+        body = html.replace("</title>", variant + "</title>").replace("</h1>", variant + "</h1>").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def _send_sitemap(self, path: Path):
+        # В sitemap адреса абсолютные, а порт сервера известен только при запуске
+        host, port = self.server.server_address[:2]
+        body = path.read_text(encoding="utf-8").replace("{base}", f"http://{host}:{port}").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    """
+    Раздаёт каталог корпуса по HTTP в фоновом потоке. Стандартный
+    обработчик отдаёт Last-Modified и отвечает 304 на If-Modified-Since,
+    так что HTTP-кэш парсера тоже участвует в замерах. latency — задержка
+    перед каждым ответом, как у медленного сайта.
+    """
+    def __init__(self, directory: Path, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        handler = partial(_FixtureHandler, directory=str(directory), latency=latency)
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, name: str) -> str:
+        return f"{self.base_url}/{name}"
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
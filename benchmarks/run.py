@@ -0,0 +1,414 @@
+"""
+Нагрузочный замер backend на локальных фикстурах.
+
+Поднимает HTTP-сервер с корпусом страниц конкурентов, запускает backend
+отдельным процессом с заглушкой модели (benchmarks.server) и гоняет
+сценарии с заданной одновременностью. Результат — JSON с задержками
+p50/p95/p99, пропускной способностью и пиковой памятью сервера, чтобы
+сравнивать версии между собой:
+
+    python -m benchmarks.run --requests 200 --concurrency 1,8,32 --output bench.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.fixtures import FixtureServer, banner, build_pages, competitor_text
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+SCENARIOS = ("analyze_text", "analyze_image", "parse_demo", "history")
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """
+    Перцентиль с линейной интерполяцией между соседними значениями.
+
+    Args:
+        values (list): Отсортированные значения.
+        percent (float): Перцентиль от 0 до 100.
+
+    Returns:
+        float: Значение перцентиля; 0 для пустого списка.
+    """
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _peak_rss_mb(pid: int) -> Optional[float]:
+    """
+    Пиковый RSS процесса с момента запуска (VmHWM, только Linux).
+    """
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def _children_peak_rss_mb() -> Optional[float]:
+    """
+    Пиковый RSS завершившихся дочерних процессов (Unix, если нет /proc).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Linux отдаёт килобайты, macOS — байты
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _uses_shared_store(args: argparse.Namespace) -> bool:
+    return (args.workers > 1 or args.shared_store) and not args.no_shared_store
+
+
+class Backend:
+    """
+    Процесс backend с заглушкой модели и отдельным каталогом данных.
+    """
+    def __init__(self, data_dir: Path, args: argparse.Namespace):
+        self.port = args.port or _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        env = dict(os.environ)
+        env.update({
+            "HISTORY_DB_PATH": str(data_dir / "history.db"),
+            "JOBS_DB_PATH": str(data_dir / "jobs.db"),
+            "MONITORS_DB_PATH": str(data_dir / "monitors.db"),
+            "PARSER_HTTP_CACHE_DIR": str(data_dir / "http_cache"),
+            "ANALYSIS_CACHE_DIR": "",
+            "OPENAI_API_KEY": env.get("OPENAI_API_KEY") or "benchmark",
+            # Бюджеты провайдера: 0 — без ограничения, замеряется сам сервис
+            "OPENAI_RPM": str(args.model_rpm),
+            "OPENAI_TPM": str(args.model_tpm),
+            # Варианты ?v=N одной страницы — почти повторы; по умолчанию
+            # индекс выключен, чтобы входы оставались промахами кэша
+            "SIMILARITY_ENABLED": "true" if args.near_duplicates else "false",
+            # Несколько воркеров делят кэш и бюджеты модели через общее хранилище
+            "SHARED_STORE_URL": f"sqlite:///{data_dir / 'shared.db'}" if _uses_shared_store(args) else "",
+        })
+        command = [
+            sys.executable, "-m", "benchmarks.server",
+            "--port", str(self.port),
+            "--workers", str(args.workers),
+            "--model-latency", str(args.model_latency),
+            "--model-jitter", str(args.model_jitter),
+            "--model-error-rate", str(args.model_error_rate),
+            "--seed", str(args.seed),
+        ]
+        # Трассировки ошибок модели не смешиваются с выводом замера
+        self.log_path = data_dir / "server.log"
+        self._log = self.log_path.open("wb")
+        self.process = subprocess.Popen(command, cwd=ROOT_DIR, env=env, stdout=self._log, stderr=subprocess.STDOUT)
+
+    async def wait_ready(self, timeout: float = 30.0):
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient(base_url=self.base_url) as client:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    raise RuntimeError(
+                        f"Backend завершился с кодом {self.process.returncode}:\n{self._log_tail()}"
+                    )
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        return
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.2)
+        raise RuntimeError(f"Backend не запустился за отведённое время:\n{self._log_tail()}")
+
+    def _log_tail(self, lines: int = 20) -> str:
+        self._log.flush()
+        return "\n".join(self.log_path.read_text(encoding="utf-8", errors="replace").splitlines()[-lines:])
+
+    def peak_rss_mb(self) -> Optional[float]:
+        return _peak_rss_mb(self.process.pid)
+
+    def stop(self) -> Optional[float]:
+        """
+        Останавливает процесс.
+
+        Returns:
+            float | None: Пиковый RSS в МБ.
+        """
+        peak = self.peak_rss_mb()
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self._log.close()
+        return peak if peak is not None else _children_peak_rss_mb()
+
+
+def build_scenarios(args: argparse.Namespace, fixtures: FixtureServer, pages: dict) -> Dict[str, Callable[[int], dict]]:
+    """
+    Фабрики запросов сценариев: по номеру запроса возвращают аргументы httpx.request.
+
+    С вероятностью cache_hit_ratio запрос повторяет один из repeat_pool
+    входов, иначе вход уникален на весь прогон (включая прогрев и все
+    уровни одновременности), и кэш анализа не срабатывает.
+    """
+    rng = random.Random(args.seed)
+    static_urls = [fixtures.url(name) for name in pages["static"]]
+    js_urls = [fixtures.url(name) for name in pages["js"]]
+    unique_numbers = {name: itertools.count(args.repeat_pool) for name in SCENARIOS}
+
+    def pick(scenario: str) -> int:
+        if rng.random() < args.cache_hit_ratio:
+            return rng.randrange(args.repeat_pool)
+        return next(unique_numbers[scenario])
+
+    images = []
+    if "analyze_image" in args.scenarios:
+        # Баннеры рисуются заранее, чтобы кодирование PNG не попадало в замер
+        total = args.repeat_pool + (args.warmup + args.requests) * len(args.concurrency)
+        images = [banner(number, seed=args.seed) for number in range(total)]
+
+    def analyze_text(index: int) -> dict:
+        return {"method": "POST", "url": "/analyze_text", "json": {"text": competitor_text(pick("analyze_text"), args.seed)}}
+
+    def analyze_image(index: int) -> dict:
+        number = pick("analyze_image")
+        return {"method": "POST", "url": "/analyze_image", "files": {"file": (f"banner_{number}.png", images[number], "image/png")}}
+
+    def parse_demo(index: int) -> dict:
+        urls = js_urls if rng.random() < args.js_ratio else static_urls
+        number = pick("parse_demo")
+        url = urls[number % len(urls)]
+        if number >= args.repeat_pool:
+            # С ?v= сервер фикстур отдаёт страницу со своим заголовком: кэши
+            # парсера и анализа не срабатывают
+            url = f"{url}?v={number}"
+        return {"method": "POST", "url": "/parse_demo", "json": {"url": url}}
+
+    def history(index: int) -> dict:
+        return {"method": "GET", "url": "/history", "params": {"limit": 20}}
+
+    factories = {
+        "analyze_text": analyze_text,
+        "analyze_image": analyze_image,
+        "parse_demo": parse_demo,
+        "history": history,
+    }
+    return {name: factories[name] for name in args.scenarios}
+
+
+def _failed(response: httpx.Response) -> bool:
+    """
+    Ответ 200 с success=false: сервис сообщил об ошибке в теле.
+    """
+    if response.headers.get("content-type", "").startswith("application/json"):
+        body = response.json()
+        return isinstance(body, dict) and body.get("success") is False
+    return False
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    make_request: Callable[[int], dict],
+    requests: int,
+    concurrency: int,
+) -> dict:
+    """
+    Выполняет requests запросов сценария, не больше concurrency одновременно.
+
+    Returns:
+        dict: Число запросов и ошибок, длительность, пропускная способность и задержки в мс.
+    """
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            request = make_request(index)
+            started = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                outcome = None
+                if response.status_code >= 400:
+                    outcome = f"http_{response.status_code}"
+                elif _failed(response):
+                    outcome = "unsuccessful"
+            except httpx.HTTPError as e:
+                outcome = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            if outcome:
+                errors[outcome] = errors.get(outcome, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+    latencies.sort()
+    failed = sum(errors.values())
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": failed,
+        "error_rate": round(failed / requests, 4) if requests else 0.0,
+        "error_kinds": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(requests / duration, 2) if duration else 0.0,
+        "latency_ms": {
+            "min": round(latencies[0] * 1000, 2) if latencies else 0.0,
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory(prefix="competitor-bench-") as tmp:
+        tmp_dir = Path(tmp)
+        pages = build_pages(tmp_dir / "site", args.pages, seed=args.seed)
+        fixtures = FixtureServer(tmp_dir / "site")
+        fixtures.start()
+        (tmp_dir / "data").mkdir()
+        backend = Backend(tmp_dir / "data", args)
+        results = []
+        try:
+            await backend.wait_ready()
+            scenarios = build_scenarios(args, fixtures, pages)
+            limits = httpx.Limits(max_connections=max(args.concurrency) + 4)
+            async with httpx.AsyncClient(base_url=backend.base_url, timeout=args.timeout, limits=limits) as client:
+                for name, make_request in scenarios.items():
+                    for concurrency in args.concurrency:
+                        if args.warmup:
+                            await run_scenario(client, make_request, args.warmup, min(concurrency, args.warmup))
+                        result = await run_scenario(client, make_request, args.requests, concurrency)
+                        result = {"scenario": name, **result, "server_peak_rss_mb": backend.peak_rss_mb()}
+                        results.append(result)
+                        print(
+                            f"{name:<14} c={concurrency:<4} {result['throughput_rps']:>8} rps  "
+                            f"p50={result['latency_ms']['p50']}ms p99={result['latency_ms']['p99']}ms  "
+                            f"errors={result['errors']}",
+                            file=sys.stderr,
+                        )
+                model_stats = (await client.get("/openai/stats")).json()
+        finally:
+            peak = backend.stop()
+            fixtures.stop()
+    return {
+        "started_at": args.started_at,
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "model_latency": args.model_latency,
+            "model_jitter": args.model_jitter,
+            "model_error_rate": args.model_error_rate,
+            "model_rpm": args.model_rpm,
+            "model_tpm": args.model_tpm,
+            "cache_hit_ratio": args.cache_hit_ratio,
+            "near_duplicates": args.near_duplicates,
+            "js_ratio": args.js_ratio,
+            "repeat_pool": args.repeat_pool,
+            "pages": args.pages,
+            "workers": args.workers,
+            "shared_store": _uses_shared_store(args),
+            "seed": args.seed,
+        },
+        "results": results,
+        "model_limiter": model_stats,
+        "server_peak_rss_mb": peak,
+    }
+
+
+def build_parser(description: str = "Нагрузочный замер backend на локальных фикстурах") -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Сценарии через запятую: " + ", ".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="Запросов на сценарий и уровень одновременности")
+    parser.add_argument("--concurrency", default="8", help="Уровни одновременности через запятую, например 1,8,32")
+    parser.add_argument("--warmup", type=int, default=10, help="Прогревочных запросов перед замером (не учитываются)")
+    parser.add_argument("--model-latency", type=float, default=0.5, help="Средняя задержка заглушки модели, с")
+    parser.add_argument("--model-jitter", type=float, default=0.2, help="Разброс задержки модели, ± с")
+    parser.add_argument("--model-error-rate", type=float, default=0.0, help="Доля вызовов модели с ошибкой 429/503")
+    parser.add_argument("--model-rpm", type=int, default=0, help="OPENAI_RPM сервера (0 — без ограничения)")
+    parser.add_argument("--model-tpm", type=int, default=0, help="OPENAI_TPM сервера (0 — без ограничения)")
+    parser.add_argument("--cache-hit-ratio", type=float, default=0.0, help="Доля повторных запросов (попадания в кэш)")
+    parser.add_argument("--near-duplicates", action="store_true", help="Включить индекс почти повторов текста")
+    parser.add_argument("--repeat-pool", type=int, default=10, help="Сколько разных входов повторяется")
+    parser.add_argument("--js-ratio", type=float, default=0.0, help="Доля страниц, отрисовываемых скриптом (нужен Chrome)")
+    parser.add_argument("--pages", type=int, default=20, help="Страниц каждого вида в корпусе")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Таймаут одного запроса, с")
+    parser.add_argument("--port", type=int, default=0, help="Порт backend (0 — любой свободный)")
+    parser.add_argument("--workers", type=int, default=1, help="Процессов uvicorn у backend")
+    parser.add_argument("--shared-store", action="store_true", help="Общее хранилище и при одном воркере")
+    parser.add_argument(
+        "--no-shared-store", action="store_true", help="Не подключать общее хранилище при нескольких воркерах",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Файл для JSON-результата (по умолчанию stdout)")
+    return parser
+
+
+def parse_args(argv: Optional[List[str]] = None, parser: Optional[argparse.ArgumentParser] = None) -> argparse.Namespace:
+    parser = parser or build_parser()
+    args = parser.parse_args(argv)
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+    args.concurrency = [int(value) for value in args.concurrency.split(",")]
+    args.started_at = datetime.now().isoformat(timespec="seconds")
+    return args
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Запуск backend для замеров: uvicorn с заглушкой модели вместо OpenAI.
+
+Запускается из benchmarks.run отдельным процессом, чтобы пиковая
+память и загрузка CPU относились только к серверу:
+
+    python -m benchmarks.server --port 8100 --model-latency 0.5
+
+С --workers N uvicorn запускает N процессов; заглушка ставится в
+каждом из них фабрикой create_app по параметрам из окружения.
+"""
+import argparse
+import os
+
+import uvicorn
+
+
+def create_app():
+    """
+    Приложение с заглушкой модели. Параметры заглушки — переменные
+    окружения BENCHMARK_MODEL_*, которые выставляет main().
+    """
+    # Импорт внутри фабрики: настройки backend читаются из окружения,
+    # которое подготовил benchmarks.run
+    from backend.main import app
+    from backend.services.openai_service import get_openai_service
+    from benchmarks.fake_model import FakeModel
+
+    seed = os.environ.get("BENCHMARK_MODEL_SEED")
+    FakeModel(
+        latency=float(os.environ["BENCHMARK_MODEL_LATENCY"]),
+        jitter=float(os.environ["BENCHMARK_MODEL_JITTER"]),
+        error_rate=float(os.environ["BENCHMARK_MODEL_ERROR_RATE"]),
+        seed=int(seed) if seed else None,
+    ).install(get_openai_service())
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend с заглушкой модели для замеров")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--workers", type=int, default=1, help="Процессов uvicorn")
+    parser.add_argument("--model-latency", type=float, default=0.5)
+    parser.add_argument("--model-jitter", type=float, default=0.2)
+    parser.add_argument("--model-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    os.environ.update({
+        "BENCHMARK_MODEL_LATENCY": str(args.model_latency),
+        "BENCHMARK_MODEL_JITTER": str(args.model_jitter),
+        "BENCHMARK_MODEL_ERROR_RATE": str(args.model_error_rate),
+        "BENCHMARK_MODEL_SEED": "" if args.seed is None else str(args.seed),
+    })
+    uvicorn.run(
+        "benchmarks.server:create_app",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Замер холодного старта backend.
+
+Несколько раз запускает uvicorn с backend.main отдельным процессом и
+измеряет время от запуска процесса до первого ответа 200 от /health,
+а также отчёт /startup самого приложения. Результат — JSON:
+
+    python -m benchmarks.startup --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from benchmarks.run import ROOT_DIR, _free_port, _git_revision
+
+
+def _import_seconds() -> float:
+    """
+    Время импорта backend.main в чистом интерпретаторе, без запуска сервера.
+    """
+    code = "import time; started = time.perf_counter(); import backend.main; print(time.perf_counter() - started)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def measure_once(data_dir: Path, timeout: float) -> dict:
+    """
+    Запускает backend и ждёт первого здорового ответа /health.
+
+    Args:
+        data_dir (Path): Каталог для баз и кэшей этого запуска.
+        timeout (float): Сколько ждать ответа, секунды.
+
+    Returns:
+        dict: Время до /health в секундах и отчёт /startup.
+    """
+    port = _free_port()
+    env = dict(os.environ)
+    env.update({
+        "HISTORY_DB_PATH": str(data_dir / "history.db"),
+        "JOBS_DB_PATH": str(data_dir / "jobs.db"),
+        "MONITORS_DB_PATH": str(data_dir / "monitors.db"),
+        "PARSER_HTTP_CACHE_DIR": str(data_dir / "http_cache"),
+        "ANALYSIS_CACHE_DIR": "",
+        "OPENAI_API_KEY": env.get("OPENAI_API_KEY") or "benchmark",
+    })
+    command = [
+        sys.executable, "-m", "uvicorn", "backend.main:app",
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+    ]
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    healthy: Optional[float] = None
+    report = None
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            while time.perf_counter() - started < timeout:
+                if process.poll() is not None:
+                    raise RuntimeError(f"Backend завершился с кодом {process.returncode}")
+                try:
+                    if client.get("/health").status_code == 200:
+                        healthy = time.perf_counter() - started
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+            if healthy is None:
+                raise RuntimeError("Backend не ответил на /health за отведённое время")
+            report = client.get("/startup").json()
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    return {"first_health_s": round(healthy, 4), "startup": report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер холодного старта backend")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", default=None, help="Файл для JSON-отчёта (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory(prefix="startup-") as tmp:
+        for number in range(args.runs):
+            data_dir = Path(tmp) / str(number)
+            data_dir.mkdir()
+            runs.append(measure_once(data_dir, args.timeout))
+            print(f"run {number + 1}: /health через {runs[-1]['first_health_s']:.3f} с", file=sys.stderr)
+
+    times = sorted(run["first_health_s"] for run in runs)
+    result = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "import_backend_main_s": round(_import_seconds(), 4),
+        "first_health_s": {"min": times[0], "median": round(statistics.median(times), 4), "max": times[-1]},
+        "runs": runs,
+    }
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
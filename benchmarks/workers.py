@@ -0,0 +1,176 @@
+"""
+Замер масштабирования backend по числу воркеров uvicorn.
+
+Для каждого числа воркеров поднимает backend (benchmarks.server
+--workers N) с общим хранилищем SQLite и заглушкой модели и гоняет
+сценарии benchmarks.run с одной и той же одновременностью.
+Масштабирование — пропускная способность относительно первого числа
+воркеров, эффективность — то же в расчёте на воркер (1.0 — линейный
+рост). Заглушка модели по умолчанию быстрая, но каждый процесс держит
+не больше OPENAI_MAX_IN_FLIGHT вызовов модели: чтобы упираться в CPU
+самого backend, а не в этот лимит, запускайте с OPENAI_MAX_IN_FLIGHT=1000.
+
+Затем проверяется общее состояние: одни и те же тексты отправляются
+дважды по новым соединениям. Ответ быстрее минимальной задержки модели
+означает попадание в кэш, даже если в первый раз текст обработал
+другой воркер; без общего хранилища (--no-shared-store) доля попаданий
+падает примерно до 1/N. С --model-rpm пропускная способность не
+превышает общий бюджет при любом числе воркеров:
+
+    python -m benchmarks.workers --worker-counts 1,2,4 --requests 400 --concurrency 32
+"""
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import httpx
+
+from benchmarks.fixtures import FixtureServer, build_pages, competitor_text
+from benchmarks.run import Backend, _failed, _git_revision, build_parser, build_scenarios, parse_args, run_scenario
+
+# Номера текстов проверки кэша не пересекаются с входами сценариев
+REPEAT_OFFSET = 1_000_000
+
+
+async def repeat_check(base_url: str, args, count: int) -> Optional[dict]:
+    """
+    Отправляет count текстов, затем те же тексты ещё раз новым клиентом.
+
+    Returns:
+        dict | None: Доля повторов, обслуженных из кэша; None, если
+            задержка заглушки не позволяет отличить попадание
+            (model_latency <= model_jitter).
+    """
+    threshold = args.model_latency - args.model_jitter
+    if threshold <= 0 or count <= 0:
+        return None
+    concurrency = args.concurrency[0]
+    texts = [competitor_text(REPEAT_OFFSET + number, args.seed) for number in range(count)]
+    passes = []
+    for _ in range(2):
+        # Новый клиент — новые соединения, которые uvicorn раздаёт по воркерам заново
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def send(text: str) -> Optional[float]:
+                async with semaphore:
+                    started = time.perf_counter()
+                    try:
+                        response = await client.post("/analyze_text", json={"text": text})
+                    except httpx.HTTPError:
+                        return None
+                    if response.status_code >= 400 or _failed(response):
+                        return None
+                    return time.perf_counter() - started
+
+            passes.append(await asyncio.gather(*(send(text) for text in texts)))
+    repeated = [seconds for seconds in passes[1] if seconds is not None]
+    hits = sum(1 for seconds in repeated if seconds < threshold)
+    return {
+        "texts": count,
+        "repeated_ok": len(repeated),
+        "repeat_hits": hits,
+        "repeat_hit_ratio": round(hits / len(repeated), 4) if repeated else 0.0,
+    }
+
+
+async def run(args) -> dict:
+    results = []
+    shared_checks = []
+    concurrency = args.concurrency[0]
+    with tempfile.TemporaryDirectory(prefix="competitor-workers-") as tmp:
+        tmp_dir = Path(tmp)
+        pages = build_pages(tmp_dir / "site", args.pages, seed=args.seed)
+        fixtures = FixtureServer(tmp_dir / "site")
+        fixtures.start()
+        try:
+            for workers in args.worker_counts:
+                args.workers = workers
+                data_dir = tmp_dir / f"data-{workers}"
+                data_dir.mkdir()
+                backend = Backend(data_dir, args)
+                try:
+                    await backend.wait_ready(timeout=60.0)
+                    scenarios = build_scenarios(args, fixtures, pages)
+                    limits = httpx.Limits(max_connections=concurrency + 4)
+                    async with httpx.AsyncClient(base_url=backend.base_url, timeout=args.timeout, limits=limits) as client:
+                        for name, make_request in scenarios.items():
+                            if args.warmup:
+                                await run_scenario(client, make_request, args.warmup, min(concurrency, args.warmup))
+                            result = await run_scenario(client, make_request, args.requests, concurrency)
+                            results.append({"workers": workers, "scenario": name, **result})
+                            print(
+                                f"workers={workers:<3} {name:<14} {result['throughput_rps']:>8} rps  "
+                                f"p50={result['latency_ms']['p50']}ms p99={result['latency_ms']['p99']}ms  "
+                                f"errors={result['errors']}",
+                                file=sys.stderr,
+                            )
+                    check = await repeat_check(backend.base_url, args, args.repeat_texts)
+                    if check is not None:
+                        shared_checks.append({"workers": workers, **check})
+                        print(f"workers={workers:<3} повторы из кэша: {check['repeat_hit_ratio']:.0%}", file=sys.stderr)
+                finally:
+                    backend.stop()
+        finally:
+            fixtures.stop()
+
+    base_workers = args.worker_counts[0]
+    for result in results:
+        base = next(
+            item["throughput_rps"] for item in results
+            if item["scenario"] == result["scenario"] and item["workers"] == base_workers
+        )
+        scaling = result["throughput_rps"] / base if base else 0.0
+        result["scaling"] = round(scaling, 3)
+        result["efficiency"] = round(scaling * base_workers / result["workers"], 3)
+    return {"results": results, "shared_state": shared_checks}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = build_parser("Замер масштабирования backend по числу воркеров")
+    parser.add_argument("--worker-counts", default="1,2,4", help="Числа воркеров через запятую")
+    parser.add_argument("--repeat-texts", type=int, default=50, help="Текстов в проверке общего кэша (0 — без проверки)")
+    parser.set_defaults(
+        scenarios="analyze_text", requests=400, concurrency="32", model_latency=0.05, model_jitter=0.0,
+        shared_store=True,
+    )
+    args = parse_args(argv, parser)
+    args.worker_counts = [int(value) for value in args.worker_counts.split(",")]
+    report = asyncio.run(run(args))
+    report = {
+        "started_at": args.started_at,
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": {
+            "worker_counts": args.worker_counts,
+            "scenarios": args.scenarios,
+            "requests": args.requests,
+            "concurrency": args.concurrency[0],
+            "warmup": args.warmup,
+            "model_latency": args.model_latency,
+            "model_jitter": args.model_jitter,
+            "model_rpm": args.model_rpm,
+            "model_tpm": args.model_tpm,
+            "shared_store": not args.no_shared_store,
+            "seed": args.seed,
+        },
+        **report,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,247 @@
 """
 Сборка desktop-приложения на PyQt6 с помощью PyInstaller.
 Интерфейс повторяет функционал веб-версии: анализ текста, изображений, парсинг сайта, история.
+
+Запросы к backend выполняются в потоках QThreadPool через общую
+requests.Session (keep-alive, пул соединений, таймауты), поэтому окно не
+замирает на время парсинга и анализа. История кэшируется в JSON-файле и
+обновляется инкрементально: запрашиваются только записи новее уже известных.
 """
 import sys
 import os
+import json
+import mimetypes
+import threading
+import time
 from PyQt6.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QLabel, QTextEdit, QPushButton, QFileDialog, QLineEdit, QMessageBox, QListWidget
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTextEdit, QPushButton, QFileDialog, QLineEdit,
+    QMessageBox, QListWidget, QProgressBar
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
 from PyQt6.QtGui import QFont
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 API_URL = "http://localhost:8000"  # Можно вынести в .env или конфиг
+HISTORY_PAGE_SIZE = 20
+# Таймауты запросов к backend, секунды: установка соединения и ожидание ответа
+# (парсинг через браузер и анализ моделью занимают десятки секунд)
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 180
+# Шаг long polling фоновой задачи: не дольше этого ждётся реакция на отмену
+JOB_POLL_SECONDS = 3
+JOB_FINAL_STATUSES = ("succeeded", "failed", "cancelled")
+JOB_STATUS_TEXT = {"queued": "В очереди", "running": "Парсинг и анализ"}
+# Сколько страниц новых записей запрашивать при обновлении истории; если
+# известные записи так и не встретились, локальный кэш строится заново
+HISTORY_REFRESH_PAGES = 5
+HISTORY_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".competitor_monitor", "history.json")
+
+
+def create_session() -> requests.Session:
+    """
+    Общая сессия для всех запросов приложения.
+
+    Соединения с backend переиспользуются (keep-alive), пул рассчитан на
+    одновременные запросы из нескольких потоков. Повторяются только
+    неудачные установки соединения: запрос до сервера не дошёл, значит
+    повтор безопасен даже для POST.
+
+    Returns:
+        requests.Session: Настроенная сессия.
+    """
+    session = requests.Session()
+    retries = Retry(total=2, connect=2, read=0, status=0, redirect=0, backoff_factor=0.3)
+    session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=8, max_retries=retries))
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=8, max_retries=retries))
+    return session
+
+
+def api_request(session: requests.Session, method: str, path: str, **kwargs) -> dict:
+    """
+    Запрос к backend с таймаутами.
+
+    Args:
+        session (requests.Session): Общая сессия.
+        method (str): HTTP-метод.
+        path (str): Путь относительно API_URL.
+        **kwargs: Параметры requests (json, params, files, data).
+
+    Returns:
+        dict: JSON-ответ.
+
+    Raises:
+        RuntimeError: Backend вернул ошибку HTTP.
+    """
+    r = session.request(method, f"{API_URL}{path}", timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), **kwargs)
+    try:
+        data = r.json()
+    except ValueError:
+        data = {}
+    if r.status_code >= 400:
+        raise RuntimeError(data.get("detail") or f"HTTP {r.status_code}")
+    return data
+
+
+def format_analysis(a: dict) -> str:
+    """
+    HTML-представление анализа текста или сайта.
+    """
+    res = f"<b>Сильные стороны:</b> {', '.join(a['strengths'])}<br>"
+    res += f"<b>Слабые стороны:</b> {', '.join(a['weaknesses'])}<br>"
+    res += f"<b>Уникальные предложения:</b> {', '.join(a['unique_offers'])}<br>"
+    res += f"<b>Рекомендации:</b> {', '.join(a['recommendations'])}<br>"
+    res += f"<b>Резюме:</b> {a['summary']}"
+    return res
+
+
+def format_history_item(item: dict) -> str:
+    return f"{item['request_type']} | {item['request_summary']} | {item['response_summary']}"
+
+
+class Cancelled(Exception):
+    """
+    Операция отменена пользователем.
+    """
+
+
+class TaskSignals(QObject):
+    """
+    Сигналы фоновой операции; доставляются в поток интерфейса.
+    """
+    progress = pyqtSignal(str)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+
+class Task(QRunnable):
+    """
+    Сетевая операция в потоке QThreadPool.
+
+    Функция fn вызывается как fn(task, *args): о ходе выполнения она
+    сообщает через task.report(), а между запросами проверяет отмену
+    через task.check(). После отмены сигналы больше не отправляются:
+    интерфейс освобождается сразу, а ответ, пришедший позже, отбрасывается.
+    """
+    def __init__(self, fn, *args):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.signals = TaskSignals()
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check(self):
+        if self.cancelled:
+            raise Cancelled()
+
+    def report(self, message: str):
+        if not self.cancelled:
+            self.signals.progress.emit(message)
+
+    def run(self):
+        try:
+            result = self.fn(self, *self.args)
+        except Cancelled:
+            return
+        except Exception as e:
+            if not self.cancelled:
+                self.signals.failed.emit(str(e))
+            return
+        if not self.cancelled:
+            self.signals.finished.emit(result)
+
+
+class ProgressRow(QWidget):
+    """
+    Индикатор выполняющейся операции: статус, прошедшее время и кнопка отмены.
+    """
+    def __init__(self):
+        super().__init__()
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.bar = QProgressBar()
+        self.bar.setRange(0, 0)
+        self.bar.setTextVisible(False)
+        self.bar.setMaximumHeight(8)
+        layout.addWidget(self.bar)
+        self.status = QLabel()
+        layout.addWidget(self.status)
+        self.cancel_btn = QPushButton("Отмена")
+        layout.addWidget(self.cancel_btn)
+        self.setLayout(layout)
+        self._message = ""
+        self._started = 0.0
+        self._timer = QTimer(self)
+        self._timer.setInterval(1000)
+        self._timer.timeout.connect(self._update)
+        self.hide()
+
+    def start(self, message: str):
+        self._started = time.monotonic()
+        self.set_message(message)
+        self._timer.start()
+        self.show()
+
+    def set_message(self, message: str):
+        self._message = message
+        self._update()
+
+    def stop(self):
+        self._timer.stop()
+        self.hide()
+
+    def _update(self):
+        self.status.setText(f"{self._message}… {int(time.monotonic() - self._started)} с")
+
+
+class HistoryCache:
+    """
+    Локальная копия последних записей истории.
+
+    Хранит записи от новых к старым и курсор следующей страницы сервера.
+    Файл привязан к адресу backend: кэш другого сервера не используется.
+    """
+    def __init__(self, path: str = HISTORY_CACHE_PATH, api_url: str = API_URL):
+        self.path = path
+        self.api_url = api_url
+        self.items = []
+        self.next_cursor = None
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("api_url") == self.api_url:
+            self.items = data.get("items") or []
+            self.next_cursor = data.get("next_cursor")
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"api_url": self.api_url, "items": self.items, "next_cursor": self.next_cursor}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def known_ids(self) -> frozenset:
+        return frozenset(item["id"] for item in self.items)
+
+    def clear(self):
+        self.items = []
+        self.next_cursor = None
+
 
 class MainWindow(QWidget):
     def __init__(self):
@@ -42,6 +272,9 @@ class MainWindow(QWidget):
             QPushButton:hover {
                 background: qlineargradient(x1:0, y1:0, x2:1, y2:0, stop:0 #8b5cf6, stop:1 #06b6d4);
             }
+            QPushButton:disabled {
+                background: #cbd5e1;
+            }
             QTextEdit, QLineEdit {
                 background: #fff;
                 color: #222;
@@ -58,7 +291,22 @@ class MainWindow(QWidget):
                 padding: 8px;
                 margin-bottom: 8px;
             }
+            QProgressBar {
+                border: none;
+                border-radius: 4px;
+                background: #e2e8f0;
+            }
+            QProgressBar::chunk {
+                background: #06b6d4;
+            }
         """)
+        self.session = create_session()
+        self.pool = QThreadPool.globalInstance()
+        # Выполняющиеся операции по имени: ссылка держит Task и его сигналы
+        # живыми до завершения и нужна для отмены
+        self.tasks = {}
+        self.history = HistoryCache()
+        self._history_pending = False
         layout = QVBoxLayout()
 
         # Анализ текста
@@ -68,6 +316,9 @@ class MainWindow(QWidget):
         self.text_btn = QPushButton("Проанализировать текст")
         self.text_btn.clicked.connect(self.analyze_text)
         layout.addWidget(self.text_btn)
+        self.text_progress = ProgressRow()
+        self.text_progress.cancel_btn.clicked.connect(lambda: self.cancel_task("text"))
+        layout.addWidget(self.text_progress)
         self.text_result = QLabel()
         self.text_result.setWordWrap(True)
         layout.addWidget(self.text_result)
@@ -77,6 +328,9 @@ class MainWindow(QWidget):
         self.img_btn = QPushButton("Выбрать изображение и проанализировать")
         self.img_btn.clicked.connect(self.analyze_image)
         layout.addWidget(self.img_btn)
+        self.img_progress = ProgressRow()
+        self.img_progress.cancel_btn.clicked.connect(lambda: self.cancel_task("image"))
+        layout.addWidget(self.img_progress)
         self.img_result = QLabel()
         self.img_result.setWordWrap(True)
         layout.addWidget(self.img_result)
@@ -89,6 +343,9 @@ class MainWindow(QWidget):
         self.url_btn = QPushButton("Парсить и анализировать")
         self.url_btn.clicked.connect(self.parse_site)
         layout.addWidget(self.url_btn)
+        self.url_progress = ProgressRow()
+        self.url_progress.cancel_btn.clicked.connect(lambda: self.cancel_task("parse"))
+        layout.addWidget(self.url_progress)
         self.url_result = QLabel()
         self.url_result.setWordWrap(True)
         layout.addWidget(self.url_result)
@@ -98,15 +355,62 @@ class MainWindow(QWidget):
         self.history_btn = QPushButton("Обновить историю")
         self.history_btn.clicked.connect(self.load_history)
         layout.addWidget(self.history_btn)
+        self.history_progress = ProgressRow()
+        self.history_progress.cancel_btn.clicked.connect(lambda: self.cancel_task("history"))
+        layout.addWidget(self.history_progress)
         self.history_list = QListWidget()
         layout.addWidget(self.history_list)
+        self.more_history_btn = QPushButton("Загрузить ещё")
+        self.more_history_btn.clicked.connect(self.load_more_history)
+        self.more_history_btn.hide()
+        layout.addWidget(self.more_history_btn)
         self.clear_history_btn = QPushButton("Очистить историю")
         self.clear_history_btn.clicked.connect(self.clear_history)
         layout.addWidget(self.clear_history_btn)
 
         self.setLayout(layout)
+        # Сначала показываем сохранённую историю, затем догружаем новые записи
+        self.history.load()
+        self.render_history()
         self.load_history()
 
+    def start_task(self, name, button, progress, message, fn, *args, on_finished, on_failed):
+        """
+        Запускает операцию в пуле потоков: кнопка блокируется, пока операция
+        выполняется, вместо неё показывается индикатор с кнопкой отмены.
+        """
+        task = Task(fn, *args)
+
+        def finish(handler, value):
+            # Сигнал мог прийти уже после отмены, когда под тем же именем
+            # запущена новая операция
+            if self.tasks.get(name, (None,))[0] is task:
+                self.end_task(name)
+                handler(value)
+
+        self.tasks[name] = (task, button, progress)
+        task.signals.progress.connect(progress.set_message)
+        task.signals.finished.connect(lambda result: finish(on_finished, result))
+        task.signals.failed.connect(lambda error: finish(on_failed, error))
+        button.setEnabled(False)
+        progress.start(message)
+        self.pool.start(task)
+
+    def end_task(self, name):
+        entry = self.tasks.pop(name, None)
+        if entry is None:
+            return None
+        task, button, progress = entry
+        button.setEnabled(True)
+        progress.stop()
+        return task
+
+    def cancel_task(self, name):
+        task = self.end_task(name)
+        if task is not None:
+            task.cancel()
+        return task
+
     def analyze_text(self):
         text = self.text_input.toPlainText()
         if len(text) < 10:
@@ -121,21 +425,16 @@ class MainWindow(QWidget):
             "Оцени реальные конкурентные преимущества, недостатки, УТП, предложи практические шаги для усиления позиций. "
             "Пиши на русском, избегай общих фраз, используй профессиональную лексику."
         )
-        try:
-            r = requests.post(f"{API_URL}/analyze_text", json={"text": text, "system_prompt": system_prompt})
-            data = r.json()
-            if data.get("success") and data.get("analysis"):
-                a = data["analysis"]
-                res = f"<b>Сильные стороны:</b> {', '.join(a['strengths'])}<br>"
-                res += f"<b>Слабые стороны:</b> {', '.join(a['weaknesses'])}<br>"
-                res += f"<b>Уникальные предложения:</b> {', '.join(a['unique_offers'])}<br>"
-                res += f"<b>Рекомендации:</b> {', '.join(a['recommendations'])}<br>"
-                res += f"<b>Резюме:</b> {a['summary']}"
-                self.text_result.setText(res)
-            else:
-                self.text_result.setText(f"Ошибка: {data.get('error')}")
-        except Exception as e:
-            self.text_result.setText(f"Ошибка: {e}")
+        self.text_result.setText("")
+        self.start_task(
+            "text", self.text_btn, self.text_progress, "Анализ текста",
+            self._request_text, text, system_prompt,
+            on_finished=lambda data: self.show_analysis(self.text_result, data),
+            on_failed=lambda error: self.text_result.setText(f"Ошибка: {error}"),
+        )
+
+    def _request_text(self, task, text, system_prompt):
+        return api_request(self.session, "POST", "/analyze_text", json={"text": text, "system_prompt": system_prompt})
 
     def analyze_image(self):
         fname, _ = QFileDialog.getOpenFileName(self, "Выберите изображение", "", "Images (*.png *.jpg *.jpeg *.gif *.webp")
@@ -150,69 +449,206 @@ class MainWindow(QWidget):
             "Оцени цветовую палитру, типографику, композицию, UX/UI, соответствие целевой аудитории. "
             "Пиши на русском, используй профессиональные термины."
         )
-        try:
-            import mimetypes
-            mime, _ = mimetypes.guess_type(fname)
-            if not mime:
-                mime = 'application/octet-stream'
-            with open(fname, "rb") as f:
-                files = {"file": (os.path.basename(fname), f, mime)}
-                data = {"system_prompt": system_prompt}
-                r = requests.post(f"{API_URL}/analyze_image", files=files, data=data)
-                resp = r.json()
-                if resp.get("success") and resp.get("analysis"):
-                    a = resp["analysis"]
-                    res = f"<b>Описание:</b> {a['description']}<br>"
-                    res += f"<b>Инсайты:</b> {', '.join(a['insights'])}<br>"
-                    res += f"<b>Оценка стиля:</b> {a['visual_style_score']}/10<br>"
-                    res += f"<b>Рекомендации:</b> {', '.join(a['recommendations'])}"
-                    self.img_result.setText(res)
-                else:
-                    self.img_result.setText(f"Ошибка: {resp.get('error')}")
-        except Exception as e:
-            self.img_result.setText(f"Ошибка: {e}")
+        self.img_result.setText("")
+        self.start_task(
+            "image", self.img_btn, self.img_progress, "Анализ изображения",
+            self._request_image, fname, system_prompt,
+            on_finished=self.show_image_analysis,
+            on_failed=lambda error: self.img_result.setText(f"Ошибка: {error}"),
+        )
+
+    def _request_image(self, task, fname, system_prompt):
+        mime, _ = mimetypes.guess_type(fname)
+        if not mime:
+            mime = 'application/octet-stream'
+        with open(fname, "rb") as f:
+            files = {"file": (os.path.basename(fname), f, mime)}
+            return api_request(self.session, "POST", "/analyze_image", files=files, data={"system_prompt": system_prompt})
+
+    def show_image_analysis(self, resp):
+        if resp.get("success") and resp.get("analysis"):
+            a = resp["analysis"]
+            res = f"<b>Описание:</b> {a['description']}<br>"
+            res += f"<b>Инсайты:</b> {', '.join(a['insights'])}<br>"
+            res += f"<b>Оценка стиля:</b> {a['visual_style_score']}/10<br>"
+            res += f"<b>Рекомендации:</b> {', '.join(a['recommendations'])}"
+            self.img_result.setText(res)
+        else:
+            self.img_result.setText(f"Ошибка: {resp.get('error')}")
+        self.load_history()
 
     def parse_site(self):
         url = self.url_input.text()
         if not url:
             QMessageBox.warning(self, "Ошибка", "Введите URL сайта.")
             return
-        try:
-            r = requests.post(f"{API_URL}/parse_demo", json={"url": url})
-            data = r.json()
-            if data.get("success") and data.get("analysis"):
-                a = data["analysis"]
-                res = f"<b>Сильные стороны:</b> {', '.join(a['strengths'])}<br>"
-                res += f"<b>Слабые стороны:</b> {', '.join(a['weaknesses'])}<br>"
-                res += f"<b>Уникальные предложения:</b> {', '.join(a['unique_offers'])}<br>"
-                res += f"<b>Рекомендации:</b> {', '.join(a['recommendations'])}<br>"
-                res += f"<b>Резюме:</b> {a['summary']}"
-                self.url_result.setText(res)
-            else:
-                self.url_result.setText(f"Ошибка: {data.get('error')}")
-        except Exception as e:
-            self.url_result.setText(f"Ошибка: {e}")
+        self.url_result.setText("")
+        self.start_task(
+            "parse", self.url_btn, self.url_progress, "Постановка в очередь",
+            self._run_parse_job, url,
+            on_finished=lambda data: self.show_analysis(self.url_result, data),
+            on_failed=lambda error: self.url_result.setText(f"Ошибка: {error}"),
+        )
 
-    def load_history(self):
+    def _run_parse_job(self, task, url):
+        """
+        Парсинг и анализ через фоновую задачу backend (/jobs): состояние
+        опрашивается long polling, при отмене задача, ещё стоящая в
+        очереди, снимается на сервере.
+        """
+        job = api_request(self.session, "POST", "/jobs", json={"kind": "parse", "url": url})
         try:
-            r = requests.get(f"{API_URL}/history")
-            data = r.json()
+            while job["status"] not in JOB_FINAL_STATUSES:
+                message = JOB_STATUS_TEXT.get(job["status"], job["status"])
+                if job["attempts"] > 1:
+                    message += f" (попытка {job['attempts']} из {job['max_attempts']})"
+                task.report(message)
+                task.check()
+                job = api_request(self.session, "GET", f"/jobs/{job['id']}", params={"wait": JOB_POLL_SECONDS})
+        except Cancelled:
+            try:
+                api_request(self.session, "DELETE", f"/jobs/{job['id']}")
+            except (requests.RequestException, RuntimeError):
+                # Задача уже выполняется: сервер доведёт её до конца, ответ не нужен
+                pass
+            raise
+        if job["status"] != "succeeded":
+            raise RuntimeError(job.get("error") or "Задача отменена")
+        return job["result"]
+
+    def show_analysis(self, label, data):
+        if data.get("success") and data.get("analysis"):
+            label.setText(format_analysis(data["analysis"]))
+        else:
+            label.setText(f"Ошибка: {data.get('error')}")
+        self.load_history()
+
+    def load_history(self, more=False):
+        """
+        Обновляет историю: без more — догружает записи новее уже известных,
+        с more=True — следующую страницу старых записей по курсору.
+        Если история уже обновляется, повторное обновление выполнится после неё.
+        """
+        if "history" in self.tasks:
+            if not more:
+                self._history_pending = True
+            return
+        if more:
+            fn, args, message = self._fetch_history_page, (self.history.next_cursor,), "Загрузка"
+        else:
+            fn, args, message = self._fetch_history_updates, (self.history.known_ids(),), "Обновление"
+        self.start_task(
+            "history", self.history_btn, self.history_progress, message, fn, *args,
+            on_finished=self.apply_history,
+            on_failed=self.history_failed,
+        )
+
+    def _fetch_history_page(self, task, cursor):
+        data = api_request(self.session, "GET", "/history", params={"limit": HISTORY_PAGE_SIZE, "cursor": cursor})
+        return {"older": data.get("items") or [], "next_cursor": data.get("next_cursor")}
+
+    def _fetch_history_updates(self, task, known_ids):
+        """
+        Запрашивает страницы с начала истории, пока не встретится уже
+        известная запись. Если за HISTORY_REFRESH_PAGES страниц она не
+        встретилась (кэш устарел или история очищена), возвращает
+        прочитанное для замены кэша.
+        """
+        newer = []
+        cursor = None
+        for _ in range(HISTORY_REFRESH_PAGES):
+            task.check()
+            data = api_request(self.session, "GET", "/history", params={"limit": HISTORY_PAGE_SIZE, "cursor": cursor})
+            for item in data.get("items") or []:
+                if item["id"] in known_ids:
+                    return {"newer": newer, "total": data.get("total", 0)}
+                newer.append(item)
+            cursor = data.get("next_cursor")
+            if not cursor:
+                break
+        return {"replace": newer, "next_cursor": cursor}
+
+    def apply_history(self, update):
+        if "older" in update:
+            known = self.history.known_ids()
+            older = [item for item in update["older"] if item["id"] not in known]
+            self.history.items.extend(older)
+            self.history.next_cursor = update["next_cursor"]
+            self.render_history(appended=older)
+        elif "replace" in update:
+            self.history.items = update["replace"]
+            self.history.next_cursor = update["next_cursor"]
+            self.render_history()
+        else:
+            self.history.items[:0] = update["newer"]
+            self.render_history(prepended=update["newer"])
+            if update["total"] < len(self.history.items):
+                # Часть записей удалена на сервере: строим кэш заново
+                self.history.clear()
+                self._history_pending = True
+        self.history.save()
+        self.history_done()
+
+    def history_failed(self, error):
+        self.history_list.insertItem(0, f"Ошибка: {error}")
+        self.history_done()
+
+    def history_done(self):
+        if self._history_pending:
+            self._history_pending = False
+            self.load_history()
+
+    def render_history(self, prepended=None, appended=None):
+        """
+        Показывает историю из кэша. Новые записи вставляются в начало
+        списка, догруженные старые — в конец, без перерисовки остального;
+        если список не совпадает с кэшем (заглушка, ошибка), он строится заново.
+        """
+        incremental = prepended is not None or appended is not None
+        prepended, appended = prepended or [], appended or []
+        previous = len(self.history.items) - len(prepended) - len(appended)
+        if incremental and previous and self.history_list.count() == previous:
+            for index, item in enumerate(prepended):
+                self.history_list.insertItem(index, format_history_item(item))
+            for item in appended:
+                self.history_list.addItem(format_history_item(item))
+        else:
             self.history_list.clear()
-            if data.get("items"):
-                for item in data["items"]:
-                    self.history_list.addItem(f"{item['request_type']} | {item['request_summary']} | {item['response_summary']}")
-            else:
+            for item in self.history.items:
+                self.history_list.addItem(format_history_item(item))
+            if not self.history.items:
                 self.history_list.addItem("История пуста")
-        except Exception as e:
-            self.history_list.clear()
-            self.history_list.addItem(f"Ошибка: {e}")
+        self.more_history_btn.setVisible(bool(self.history.next_cursor))
+
+    def load_more_history(self):
+        self.load_history(more=True)
 
     def clear_history(self):
-        try:
-            r = requests.delete(f"{API_URL}/history")
-            self.load_history()
-        except Exception as e:
-            QMessageBox.warning(self, "Ошибка", f"Ошибка очистки истории: {e}")
+        # Очистка заменяет идущее обновление: его ответ уже не нужен
+        self.cancel_task("history")
+        self.start_task(
+            "history", self.clear_history_btn, self.history_progress, "Очистка",
+            lambda task: api_request(self.session, "DELETE", "/history"),
+            on_finished=self.history_cleared,
+            on_failed=self.clear_failed,
+        )
+
+    def history_cleared(self, _):
+        self.history.clear()
+        self.history.save()
+        self.render_history()
+        self.history_done()
+
+    def clear_failed(self, error):
+        QMessageBox.warning(self, "Ошибка", f"Ошибка очистки истории: {error}")
+        self.history_done()
+
+    def closeEvent(self, event):
+        for name in list(self.tasks):
+            self.cancel_task(name)
+        self.history.save()
+        self.session.close()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -1,30 +1,91 @@
 // Frontend logic for Competitor Monitor
 const apiBase = '';
 
-// === Анализ текста ===
-document.getElementById('text-form').onsubmit = async function(e) {
-    e.preventDefault();
-    const text = document.getElementById('text-input').value;
-    const res = await fetch(apiBase + '/analyze_text', {
+// === Потоковая выдача (Server-Sent Events) ===
+// Читает ответ text/event-stream и вызывает onEvent(event, data) на каждое событие
+async function readEventStream(res, onEvent) {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const {done, value} = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, {stream: true});
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            const dataLines = [];
+            for (const line of block.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) dataLines.push(line.slice(6));
+            }
+            if (dataLines.length) onEvent(event, JSON.parse(dataLines.join('\n')));
+        }
+    }
+}
+
+// Отправляет запрос к потоковому эндпоинту и рисует анализ по секциям
+async function streamAnalysis(path, body, result) {
+    result.innerHTML = renderTextAnalysis({}, true);
+    const res = await fetch(apiBase + path, {
         method: 'POST',
         headers: {'Content-Type': 'application/json'},
-        body: JSON.stringify({text})
+        body: JSON.stringify(body)
     });
-    const data = await res.json();
-    const result = document.getElementById('text-result');
-    if (data.success && data.analysis) {
-        result.innerHTML = renderTextAnalysis(data.analysis);
-    } else {
-        result.innerHTML = `<div class="result-block">Ошибка: ${data.error}</div>`;
+    if (!res.ok) {
+        const data = await res.json();
+        result.innerHTML = `<div class="result-block">Ошибка: ${data.error || JSON.stringify(data.detail)}</div>`;
+        return;
     }
+    await readEventStream(res, (event, data) => {
+        if (event === 'parsed') {
+            result.insertAdjacentHTML('afterbegin', renderParsed(data));
+        } else if (event === 'section') {
+            const block = result.querySelector(`[data-section="${data.name}"]`);
+            if (block) block.outerHTML = renderSection(data.name, data.value);
+        } else if (event === 'error') {
+            result.innerHTML = `<div class="result-block">Ошибка: ${data.error}</div>`;
+        }
+    });
+}
+
+// === Анализ текста ===
+document.getElementById('text-form').onsubmit = async function(e) {
+    e.preventDefault();
+    const text = document.getElementById('text-input').value;
+    await streamAnalysis('/analyze_text/stream', {text}, document.getElementById('text-result'));
 };
 
-function renderTextAnalysis(a) {
-    return `<div class="result-block"><b>Сильные стороны:</b> <ul>${a.strengths.map(x=>`<li>${x}</li>`).join('')}</ul></div>
-    <div class="result-block"><b>Слабые стороны:</b> <ul>${a.weaknesses.map(x=>`<li>${x}</li>`).join('')}</ul></div>
-    <div class="result-block"><b>Уникальные предложения:</b> <ul>${a.unique_offers.map(x=>`<li>${x}</li>`).join('')}</ul></div>
-    <div class="result-block"><b>Рекомендации:</b> <ul>${a.recommendations.map(x=>`<li>${x}</li>`).join('')}</ul></div>
-    <div class="result-block"><b>Резюме:</b> ${a.summary}</div>`;
+const TEXT_SECTIONS = [
+    ['strengths', 'Сильные стороны'],
+    ['weaknesses', 'Слабые стороны'],
+    ['unique_offers', 'Уникальные предложения'],
+    ['recommendations', 'Рекомендации'],
+    ['summary', 'Резюме'],
+];
+
+// Одна секция анализа; value === undefined — секция ещё генерируется
+function renderSection(name, value) {
+    const title = TEXT_SECTIONS.find(([key]) => key === name)[1];
+    if (value === undefined) {
+        return `<div class="result-block" data-section="${name}"><b>${title}:</b> <i>…</i></div>`;
+    }
+    const body = Array.isArray(value) ? `<ul>${value.map(x=>`<li>${x}</li>`).join('')}</ul>` : value;
+    return `<div class="result-block" data-section="${name}"><b>${title}:</b> ${body}</div>`;
+}
+
+// Анализ целиком; с pending = true недостающие секции рисуются как заглушки
+function renderTextAnalysis(a, pending = false) {
+    return TEXT_SECTIONS
+        .filter(([name]) => pending || a[name] !== undefined)
+        .map(([name]) => renderSection(name, a[name]))
+        .join('\n    ');
+}
+
+function renderParsed(p) {
+    return `<div class="result-block"><b>${p.title}</b><br>${p.h1}<br><small>${p.first_paragraph}</small></div>`;
 }
 
 // === Анализ изображения ===
@@ -43,7 +104,8 @@ document.getElementById('image-form').onsubmit = async function(e) {
     if (data.success && data.analysis) {
         result.innerHTML = renderImageAnalysis(data.analysis);
     } else {
-        result.innerHTML = `<div class="result-block">Ошибка: ${data.error}</div>`;
+        // 413 (слишком большой файл) приходит с полем detail
+        result.innerHTML = `<div class="result-block">Ошибка: ${data.error || data.detail}</div>`;
     }
 };
 
@@ -58,40 +120,45 @@ function renderImageAnalysis(a) {
 document.getElementById('parse-form').onsubmit = async function(e) {
     e.preventDefault();
     const url = document.getElementById('url-input').value;
-    const res = await fetch(apiBase + '/parse_demo', {
-        method: 'POST',
-        headers: {'Content-Type': 'application/json'},
-        body: JSON.stringify({url})
-    });
-    const data = await res.json();
-    const result = document.getElementById('parse-result');
-    if (data.success && data.analysis) {
-        result.innerHTML = renderTextAnalysis(data.analysis);
-    } else {
-        result.innerHTML = `<div class="result-block">Ошибка: ${data.error}</div>`;
-    }
+    await streamAnalysis('/parse_demo/stream', {url}, document.getElementById('parse-result'));
 };
 
 // === История ===
-async function loadHistory() {
-    const res = await fetch(apiBase + '/history');
-    const data = await res.json();
-    const list = document.getElementById('history-list');
-    if (data.items && data.items.length) {
-        list.innerHTML = data.items.map(item => `
+const HISTORY_PAGE_SIZE = 20;
+let historyCursor = null;
+
+function renderHistoryItem(item) {
+    return `
             <div class="result-block">
                 <b>${item.request_type}</b> — ${item.request_summary}<br>
                 <small>${item.timestamp}</small><br>
                 <i>${item.response_summary}</i>
             </div>
-        `).join('');
+        `;
+}
+
+// Загружает первую страницу истории или, при more = true, следующую по курсору
+async function loadHistory(more = false) {
+    const params = new URLSearchParams({limit: HISTORY_PAGE_SIZE});
+    if (more && historyCursor) params.set('cursor', historyCursor);
+    const res = await fetch(apiBase + '/history?' + params);
+    const data = await res.json();
+    const list = document.getElementById('history-list');
+    const items = data.items || [];
+    if (more) {
+        list.insertAdjacentHTML('beforeend', items.map(renderHistoryItem).join(''));
+    } else if (items.length) {
+        list.innerHTML = items.map(renderHistoryItem).join('');
     } else {
         list.innerHTML = '<div class="result-block">История пуста</div>';
     }
+    historyCursor = data.next_cursor || null;
+    document.getElementById('more-history').style.display = historyCursor ? '' : 'none';
 }
-document.getElementById('refresh-history').onclick = loadHistory;
+document.getElementById('refresh-history').onclick = () => loadHistory();
+document.getElementById('more-history').onclick = () => loadHistory(true);
 document.getElementById('clear-history').onclick = async function() {
     await fetch(apiBase + '/history', {method: 'DELETE'});
     loadHistory();
 };
-loadHistory();
+loadHistory();
\ No newline at end of file
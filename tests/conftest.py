@@ -0,0 +1,18 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# Настройки backend читаются из окружения при первом импорте: базы и
+# кэши тестов создаются во временном каталоге, а не в рабочем
+_DATA_DIR = tempfile.mkdtemp(prefix="competitor-tests-")
+atexit.register(shutil.rmtree, _DATA_DIR, ignore_errors=True)
+
+os.environ.update({
+    "HISTORY_DB_PATH": os.path.join(_DATA_DIR, "history.db"),
+    "JOBS_DB_PATH": os.path.join(_DATA_DIR, "jobs.db"),
+    "MONITORS_DB_PATH": os.path.join(_DATA_DIR, "monitors.db"),
+    "PARSER_HTTP_CACHE_DIR": os.path.join(_DATA_DIR, "http_cache"),
+    "ANALYSIS_CACHE_DIR": "",
+    "SHARED_STORE_URL": "",
+})
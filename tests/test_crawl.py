@@ -0,0 +1,94 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from backend.services.browser_pool import BrowserPool
+from backend.services.crawl_service import CrawlService
+from backend.services.http_cache import HttpCache
+from backend.services.parser_service import ParserService
+
+ROBOTS = "User-agent: *\nAllow: /\n"
+
+
+def page(title: str, links: list) -> bytes:
+    anchors = "".join(f'<a href="{link}">{link}</a>' for link in links)
+    return (
+        f"<html><head><title>{title}</title></head><body><h1>{title}</h1>"
+        f"<p>Страница конкурента «{title}» с описанием товаров, цен и условий доставки.</p>"
+        f"{anchors}</body></html>"
+    ).encode("utf-8")
+
+
+PAGES = {
+    "/": page("Главная", ["/catalog", "/broken"]),
+    "/catalog": page("Каталог", []),
+    "/broken": page("Сломанная", []),
+}
+
+
+class Site:
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append((time.monotonic(), request))
+        if request.url.path == "/robots.txt":
+            return httpx.Response(200, text=ROBOTS)
+        body = PAGES.get(request.url.path)
+        if body is None:
+            return httpx.Response(404)
+        return httpx.Response(200, headers={"content-type": "text/html; charset=utf-8"}, content=body)
+
+
+@pytest.fixture
+def crawl(tmp_path):
+    site = Site()
+    parser = ParserService(
+        pool=BrowserPool(size=1, max_uses=1, lease_timeout=1, page_load_timeout=1),
+        http_cache=HttpCache(),
+    )
+    parser._http = httpx.Client(transport=httpx.MockTransport(site), follow_redirects=True)
+    service = CrawlService(
+        analysis=SimpleNamespace(parser=parser),
+        concurrency=2,
+        host_concurrency=1,
+        host_delay=0.1,
+        user_agent="TestCrawler",
+    )
+    return service, parser, site
+
+
+def test_page_failure_is_recorded(crawl, monkeypatch):
+    service, parser, site = crawl
+    parse_async = parser.parse_async
+
+    async def failing(url, *args, **kwargs):
+        if url.endswith("/broken"):
+            raise RuntimeError("сбой разбора")
+        return await parse_async(url, *args, **kwargs)
+
+    monkeypatch.setattr(parser, "parse_async", failing)
+    response = asyncio.run(asyncio.wait_for(
+        service.crawl("https://example.test/", max_depth=1, analyze=False), timeout=10
+    ))
+
+    assert response.stats["ok"] == 2
+    assert response.stats["errors"] == 1
+    broken = next(page for page in response.pages if page.url.endswith("/broken"))
+    assert broken.error == "сбой разбора"
+
+
+def test_crawl_requests_use_agent_and_host_gate(crawl):
+    service, _, site = crawl
+    asyncio.run(service.crawl("https://example.test/", max_depth=1, analyze=False))
+
+    paths = [request.url.path for _, request in site.requests]
+    assert paths[0] == "/robots.txt"
+    assert sorted(paths[1:]) == ["/", "/broken", "/catalog"]
+    assert {request.headers["user-agent"] for _, request in site.requests} == {"TestCrawler"}
+    # robots.txt тоже выдерживает CRAWL_HOST_DELAY до следующего запроса
+    starts = [started for started, _ in site.requests]
+    assert all(later - earlier >= 0.09 for earlier, later in zip(starts, starts[1:]))
@@ -0,0 +1,64 @@
+"""
+Полнотекстовый поиск по истории: формы русских слов и префиксы.
+"""
+import uuid
+from datetime import datetime
+
+import pytest
+
+from backend.models.schemas import HistoryItem
+from backend.services.history_service import HistoryService, fts_query, stem
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    # history.json ищется в текущем каталоге: не трогаем файл проекта
+    monkeypatch.chdir(tmp_path)
+    service = HistoryService(db_path=str(tmp_path / "history.db"), retention_days=0)
+    service.initialize()
+    return service
+
+
+def _save(history: HistoryService, text: str) -> str:
+    item_id = str(uuid.uuid4())
+    history.save_history(HistoryItem(
+        id=item_id,
+        timestamp=datetime.now(),
+        request_type="text",
+        request_summary=text[:50],
+        response_summary="",
+        request_payload={"text": text},
+    ))
+    return item_id
+
+
+def test_stem_drops_russian_endings():
+    assert stem("доставка") == "доставк"
+    assert stem("Доставки") == "доставк"
+    assert stem("price") == "price"
+    assert stem("нет") == "нет"
+
+
+def test_fts_query_uses_stem_prefix():
+    assert fts_query("доставка быстрая") == '"доставк"* "быстр"*'
+    assert fts_query('достав* "x') == '"достав"* """x"*'
+
+
+def test_search_finds_inflected_forms(history):
+    genitive = _save(history, "Бесплатной доставки нет, только самовывоз")
+    accusative = _save(history, "Обещают доставку за один день")
+    _save(history, "Скидки на ноутбуки")
+
+    hits, total = history.search_history("доставка")
+
+    assert total == 2
+    assert {hit["id"] for hit in hits} == {genitive, accusative}
+
+
+def test_explicit_prefix_still_works(history):
+    item_id = _save(history, "Доставляем по всей России")
+
+    hits, total = history.search_history("достав*")
+
+    assert total == 1
+    assert hits[0]["id"] == item_id
@@ -0,0 +1,108 @@
+import asyncio
+import io
+
+import pytest
+from PIL import Image, ImageDraw
+
+from backend.services.cache_service import AnalysisCache
+from backend.services.image_service import ImageService, hamming
+from backend.services.openai_service import OpenAIService
+from backend.services.rate_limiter import RateLimiter
+from backend.services.similarity_index import SimilarityIndex
+
+
+def banner(width: int = 640, image_format: str = "PNG", **options) -> bytes:
+    image = Image.new("RGB", (640, 320), (30, 90, 160))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((40, 40, 400, 120), fill=(250, 210, 40))
+    draw.rectangle((420, 180, 600, 290), fill=(240, 240, 240))
+    draw.ellipse((60, 170, 220, 300), fill=(200, 40, 60))
+    if width != 640:
+        image = image.resize((width, width // 2), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def service():
+    openai = OpenAIService(
+        cache=AnalysisCache(max_items=100, ttl_seconds=60),
+        limiter=RateLimiter(rpm=0, tpm=0, max_in_flight=4),
+        similar=SimilarityIndex(threshold=0.8),
+    )
+    openai.calls = 0
+    complete = openai._complete_image_async
+
+    async def counting(image_bytes):
+        openai.calls += 1
+        return await complete(image_bytes)
+
+    openai._complete_image_async = counting
+    return openai
+
+
+def analyze(service: OpenAIService, *images) -> None:
+    images_service = ImageService()
+
+    async def scenario():
+        for image_bytes in images:
+            prepared = images_service.preprocess(image_bytes)
+            await service.analyze_image_async(prepared["data"], fingerprint=prepared["fingerprint"])
+
+    asyncio.run(scenario())
+
+
+def test_recompressed_copy_reuses_analysis(service):
+    original = banner()
+    copy = banner(width=480, image_format="JPEG", quality=60)
+    analyze(service, original, copy)
+    assert service.calls == 1
+    # Повтор копии попадает в кэш по точному ключу
+    prepared = ImageService().preprocess(copy)
+    assert service.cache.get(service._image_cache_key(prepared["data"])) is not None
+
+
+def test_same_phash_different_detail_is_analyzed_again(service):
+    fingerprint = {"phash": "0f0f0f0f0f0f0f0f", "detail": "0" * 64, "aspect": 2.0}
+    other = dict(fingerprint, detail="f" * 16 + "0" * 48)
+    assert hamming(fingerprint["detail"], other["detail"]) == 64
+
+    async def scenario():
+        await service.analyze_image_async(b"first banner", fingerprint=fingerprint)
+        await service.analyze_image_async(b"second banner", fingerprint=other)
+        await service.analyze_image_async(b"third banner", fingerprint=dict(fingerprint, aspect=1.0))
+
+    asyncio.run(scenario())
+    assert service.calls == 3
+
+
+
+def test_upload_limit_applies_to_streamed_body():
+    import httpx
+    from fastapi import FastAPI, Request
+
+    from backend.middleware import UploadLimitMiddleware
+
+    app = FastAPI()
+
+    @app.post("/analyze_image")
+    async def upload(request: Request):
+        return {"bytes": len(await request.body())}
+
+    app.add_middleware(UploadLimitMiddleware, max_bytes=1024 * 1024, paths=("/analyze_image",))
+
+    async def body(chunks: int):
+        # Без Content-Length: лимит проверяется по мере приёма тела
+        for _ in range(chunks):
+            yield b"x" * (512 * 1024)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as client:
+            small = await client.post("/analyze_image", content=body(2))
+            large = await client.post("/analyze_image", content=body(4))
+            return small, large
+
+    small, large = asyncio.run(scenario())
+    assert small.json() == {"bytes": 1024 * 1024}
+    assert large.status_code == 413
@@ -0,0 +1,110 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from backend.models.schemas import TextAnalysisResponse, CompetitorAnalysis
+from backend.services.job_service import JobService
+
+
+class SlowAnalysis:
+    """
+    Анализ, который выполняется дольше срока аренды задачи.
+    """
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.calls = 0
+
+    async def analyze_text(self, text: str) -> TextAnalysisResponse:
+        self.calls += 1
+        await asyncio.sleep(self.seconds)
+        return TextAnalysisResponse(success=True, analysis=CompetitorAnalysis(summary=text))
+
+
+@pytest.fixture
+def make_jobs(tmp_path):
+    def make(analysis=None, **kwargs):
+        jobs = JobService(analysis=analysis, db_path=str(tmp_path / "jobs.db"), **kwargs)
+        jobs.initialize()
+        return jobs
+    return make
+
+
+def test_lease_renewed_while_running(make_jobs):
+    analysis = SlowAnalysis(1.0)
+    jobs = make_jobs(analysis, workers=2, lease_seconds=0.3, poll_interval=0.05)
+
+    async def scenario():
+        await jobs.start()
+        try:
+            job = jobs.submit("text", {"text": "долгий анализ"})
+            return await jobs.wait(job["id"], timeout=5)
+        finally:
+            await jobs.stop()
+
+    job = asyncio.run(scenario())
+    assert job["status"] == "succeeded"
+    # Второй воркер не забрал задачу по истёкшей аренде
+    assert job["attempts"] == 1
+    assert analysis.calls == 1
+
+
+def test_finish_requires_lease(make_jobs):
+    jobs = make_jobs(lease_seconds=0.05)
+    jobs.submit("text", {"text": "текст"})
+    stale = jobs._claim()
+    time.sleep(0.1)
+    current = jobs._claim()
+    assert current["id"] == stale["id"]
+
+    assert not jobs._renew(stale)
+    assert not jobs._finish(stale, None, "старый воркер")
+    assert jobs._finish(current, {"success": True}, None)
+    assert jobs.get(stale["id"])["status"] == "succeeded"
+
+
+def test_wait_timeout_drops_event(make_jobs):
+    jobs = make_jobs(poll_interval=0.05)
+    job = jobs.submit("text", {"text": "текст"})
+    assert asyncio.run(jobs.wait(job["id"], timeout=0.1))["status"] == "queued"
+    assert jobs._finished == {}
+
+
+def test_expired_job_without_attempts_fails(make_jobs):
+    jobs = make_jobs(lease_seconds=0.05)
+    job = jobs.submit("text", {"text": "текст"}, max_attempts=2)
+    assert jobs._claim()["attempts"] == 1
+    time.sleep(0.1)
+    assert jobs._claim()["attempts"] == 2
+    time.sleep(0.1)
+    # Обе попытки закончились истечением аренды: задача больше не выдаётся
+    assert jobs._claim() is None
+    assert jobs.get(job["id"])["status"] == "failed"
+
+
+def test_worker_survives_finish_error(make_jobs, monkeypatch):
+    jobs = make_jobs(SlowAnalysis(0), workers=1, poll_interval=0.05)
+    finish = jobs._finish
+    failures = []
+
+    def flaky_finish(job, result, error):
+        if not failures:
+            failures.append(job["id"])
+            raise sqlite3.OperationalError("database is locked")
+        return finish(job, result, error)
+
+    monkeypatch.setattr(jobs, "_finish", flaky_finish)
+
+    async def scenario():
+        await jobs.start()
+        try:
+            first = jobs.submit("text", {"text": "первый"})
+            second = jobs.submit("text", {"text": "второй"})
+            return await jobs.wait(second["id"], timeout=5), first
+        finally:
+            await jobs.stop()
+
+    second, first = asyncio.run(scenario())
+    assert failures == [first["id"]]
+    assert second["status"] == "succeeded"
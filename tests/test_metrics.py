@@ -0,0 +1,18 @@
+from backend.services.browser_pool import get_browser_pool
+from backend.services.cache_service import get_analysis_cache
+from backend.services.http_cache import get_http_cache
+from backend.services.metrics import metrics
+from backend.services.rate_limiter import get_model_rate_limiter
+from backend.services.shared_store import get_shared_store
+from backend.services.similarity_index import get_similarity_index
+
+ACCESSORS = (
+    get_browser_pool, get_analysis_cache, get_http_cache, get_model_rate_limiter, get_shared_store, get_similarity_index,
+)
+
+
+def test_render_does_not_create_services():
+    missing = [accessor for accessor in ACCESSORS if accessor.existing() is None]
+    output = metrics.render()
+    assert "# TYPE browser_pool_in_use gauge" in output
+    assert [accessor for accessor in missing if accessor.existing() is not None] == []
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+
+import pytest
+
+from backend.services.cache_service import AnalysisCache
+from backend.services.openai_service import MODEL_TOKENS, OpenAIService
+from backend.services.rate_limiter import RateLimiter
+from backend.services.similarity_index import SimilarityIndex
+
+
+def tokens(kind: str) -> float:
+    return MODEL_TOKENS._values.get(MODEL_TOKENS._key({"kind": kind}), 0)
+
+
+@pytest.fixture
+def service():
+    return OpenAIService(
+        cache=AnalysisCache(max_items=10, ttl_seconds=60),
+        limiter=RateLimiter(rpm=0, tpm=0, max_in_flight=1, max_retries=0),
+        similar=SimilarityIndex(threshold=0.8),
+    )
+
+
+def test_tokens_counted_only_for_successful_calls(service):
+    async def failing():
+        raise RuntimeError("модель недоступна")
+
+    async def succeeding():
+        return "ok"
+
+    before = tokens("text")
+    with pytest.raises(RuntimeError):
+        asyncio.run(service._call_model("text", failing, 100))
+    assert tokens("text") == before
+
+    assert asyncio.run(service._call_model("text", succeeding, 100)) == "ok"
+    assert tokens("text") == before + 100
+
+
+class ThreadRecordingCache(AnalysisCache):
+    """
+    Кэш, запоминающий потоки, в которых вызывались get и set.
+    """
+    def __init__(self):
+        super().__init__(max_items=10, ttl_seconds=60)
+        self.threads = []
+
+    def get(self, key):
+        self.threads.append(threading.get_ident())
+        return super().get(key)
+
+    def set(self, key, value):
+        self.threads.append(threading.get_ident())
+        super().set(key, value)
+
+
+def test_async_paths_use_cache_off_event_loop():
+    cache = ThreadRecordingCache()
+    service = OpenAIService(
+        cache=cache,
+        limiter=RateLimiter(rpm=0, tpm=0, max_in_flight=1, max_retries=0),
+        similar=SimilarityIndex(threshold=0.8),
+    )
+
+    async def scenario():
+        await service.analyze_text_async("Доставка цветов по городу за два часа")
+        async for _ in service.stream_text_analysis("Ремонт ноутбуков с выездом мастера"):
+            pass
+        await service.analyze_image_async(b"image")
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(scenario())
+    assert cache.threads
+    assert loop_thread not in cache.threads
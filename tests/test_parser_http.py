@@ -0,0 +1,108 @@
+import time
+
+import httpx
+import pytest
+
+from backend.services.browser_pool import BrowserPool
+from backend.services.http_cache import HttpCache
+from backend.services.parser_service import PARSE_STAGE_SECONDS, ParserService
+
+PAGE = (
+    "<html><head><title>Конкурент</title></head><body>"
+    "<h1>Доставка цветов</h1>"
+    "<p>Доставляем букеты по всему городу за два часа, с открыткой и фотоотчётом.</p>"
+    '<a href="contacts.html">Контакты</a>'
+    "</body></html>"
+)
+
+
+class Site:
+    """
+    Сайт для MockTransport: /old перенаправляет на /new/, страница
+    отдаётся с ETag и отвечает 304 на If-None-Match.
+    """
+    def __init__(self, page: str = PAGE):
+        self.page = page.encode("utf-8")
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.url.path == "/old":
+            return httpx.Response(301, headers={"location": "https://example.test/new/"})
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"etag": '"v1"'})
+        return httpx.Response(
+            200, headers={"content-type": "text/html; charset=utf-8", "etag": '"v1"'}, content=self.page,
+        )
+
+
+@pytest.fixture
+def make_parser(tmp_path):
+    def make(site, **kwargs) -> ParserService:
+        parser = ParserService(
+            pool=BrowserPool(size=1, max_uses=1, lease_timeout=1, page_load_timeout=1),
+            http_cache=HttpCache(str(tmp_path / "http_cache")),
+            extract_fields="title,h1,first_paragraph",
+            **kwargs,
+        )
+        parser._http = httpx.Client(transport=httpx.MockTransport(site), follow_redirects=True)
+        return parser
+    return make
+
+
+def test_not_modified_resolves_links_against_final_url(make_parser):
+    site = Site()
+    parser = make_parser(site)
+    assert parser._parse_http("https://example.test/old")["h1"] == "Доставка цветов"
+
+    # Набора полей со ссылками в кэше нет: тело разбирается заново после 304
+    parsed = parser._parse_http("https://example.test/old", links=True)
+    assert site.requests[-1].headers["if-none-match"] == '"v1"'
+    assert "https://example.test/new/contacts.html" in parsed["links"]
+
+
+def test_truncated_body_is_not_cached(make_parser):
+    site = Site(PAGE.replace("</body>", "<p>" + "лишний текст " * 500 + "</p></body>"))
+    parser = make_parser(site, http_max_bytes=1024)
+    assert parser._parse_http("https://example.test/new/")["h1"] == "Доставка цветов"
+    assert parser.http_cache.lookup("https://example.test/new/") is None
+
+
+def test_eviction_counts_files_of_other_workers(tmp_path):
+    workers = [HttpCache(str(tmp_path / "http_cache"), max_bytes=4000) for _ in range(2)]
+    for cache in workers:
+        cache.RESCAN_SECONDS = 0
+    for i in range(6):
+        workers[i % 2].store(f"https://example.test/{i}", {"etag": f'"{i}"'}, b"x" * 1000)
+
+    # Каждый воркер записал меньше лимита, но вместе они его превысили
+    disk_bytes = sum(path.stat().st_size for path in (tmp_path / "http_cache").iterdir())
+    assert disk_bytes <= 4000
+    assert workers[0].lookup("https://example.test/5") is not None
+
+def _fetch_observations() -> tuple:
+    series = PARSE_STAGE_SECONDS._series.get(PARSE_STAGE_SECONDS._key({"tier": "http", "stage": "fetch"}))
+    return (series[1], series[2]) if series else (0.0, 0)
+
+
+def test_fetch_stage_measures_slow_response(make_parser):
+    def slow_body():
+        # Содержимое приходит тремя частями с паузами: до h1 и абзаца
+        # парсер дочитывает все части
+        for part in ("<html><head><title>Конкурент</title>", "</head><body>", PAGE[PAGE.index("<h1>"):]):
+            time.sleep(0.05)
+            yield part.encode("utf-8")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        time.sleep(0.1)
+        return httpx.Response(200, headers={"content-type": "text/html; charset=utf-8"}, content=slow_body())
+
+    parser = make_parser(handler)
+    total_before, count_before = _fetch_observations()
+    assert parser._parse_http("https://example.test/slow")["h1"] == "Доставка цветов"
+    total_after, count_after = _fetch_observations()
+
+    assert count_after == count_before + 1
+    fetch_seconds = total_after - total_before
+    assert fetch_seconds >= 0
+    assert 0.2 <= fetch_seconds < 1.0
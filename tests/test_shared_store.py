@@ -0,0 +1,43 @@
+import pytest
+
+from backend.services.shared_store import SharedStore, SQLiteSharedStore, create_shared_store
+
+
+class PartialStore(SharedStore):
+    def get(self, namespace, key):
+        return None
+
+
+def in_memory(url):
+    return {}
+
+
+def test_shared_store_is_abstract():
+    with pytest.raises(TypeError):
+        SharedStore()
+    # Реализация без части методов не создаётся
+    with pytest.raises(TypeError):
+        PartialStore()
+
+
+def test_factory_must_return_shared_store():
+    with pytest.raises(TypeError):
+        create_shared_store("memory://", factory=f"{__name__}:in_memory")
+
+
+def test_sqlite_store(tmp_path):
+    store = create_shared_store(f"sqlite:///{tmp_path / 'shared.db'}")
+    assert isinstance(store, SQLiteSharedStore)
+
+    store.set("analysis", "key", {"summary": "ок"}, ttl_seconds=60)
+    assert store.get("analysis", "key") == {"summary": "ок"}
+    store.clear("analysis")
+    assert store.get("analysis", "key") is None
+
+    assert store.reserve("rpm", 1, per_minute=2) == pytest.approx(1, abs=0.01)
+    assert store.reserve("rpm", 2, per_minute=2) == pytest.approx(-1, abs=0.01)
+
+    assert store.acquire_lease("scheduler", "first", ttl_seconds=60)
+    assert not store.acquire_lease("scheduler", "second", ttl_seconds=60)
+    store.release_lease("scheduler", "first")
+    assert store.acquire_lease("scheduler", "second", ttl_seconds=60)
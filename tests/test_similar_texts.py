@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+import pytest
+
+from backend.services.cache_service import AnalysisCache
+from backend.services.openai_service import OpenAIService
+from backend.services.rate_limiter import RateLimiter
+from backend.services.similarity_index import SimilarityIndex
+
+TEXT = (
+    "Интернет-магазин цветов «Флора» доставляет букеты по Москве за два часа, "
+    "дарит открытку к каждому заказу и присылает фото букета перед отправкой. "
+    "Постоянным клиентам скидка десять процентов, оплата картой или наличными курьеру."
+)
+NEAR_DUPLICATE = TEXT.replace("два часа", "три часа")
+
+
+class IndexInThreads(SimilarityIndex):
+    """
+    Индекс, который запоминает потоки, где считались сигнатуры.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = []
+
+    def signature(self, text: str):
+        self.threads.append(threading.current_thread())
+        return super().signature(text)
+
+
+@pytest.fixture
+def service():
+    return OpenAIService(
+        cache=AnalysisCache(max_items=100, ttl_seconds=60),
+        limiter=RateLimiter(rpm=0, tpm=0, max_in_flight=4),
+        similar=IndexInThreads(threshold=0.7),
+    )
+
+
+def test_similar_hit_fills_exact_key(service):
+    calls = []
+    complete = service._complete_text_async
+
+    async def counting(text):
+        calls.append(text)
+        return await complete(text)
+
+    service._complete_text_async = counting
+
+    async def scenario():
+        first = await service.analyze_text_async(TEXT)
+        second = await service.analyze_text_async(NEAR_DUPLICATE)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert calls == [TEXT]
+    assert second == first
+    assert service.cache.get(service._text_cache_key(NEAR_DUPLICATE)) == first.model_dump()
+
+
+def test_signature_computed_off_event_loop(service):
+    async def scenario():
+        await service.analyze_text_async(TEXT)
+        return [name async for name, _ in service.stream_text_analysis(NEAR_DUPLICATE)]
+
+    sections = asyncio.run(scenario())
+    assert "summary" in sections
+    assert len(service.similar.threads) == 2
+    assert threading.main_thread() not in service.similar.threads
@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+from backend.models.schemas import CompetitorAnalysis
+from backend.services.analysis_service import AnalysisService
+from backend.services.history_service import HistoryService
+
+
+class StubParser:
+    async def parse_async(self, url, full_text=False, links=False):
+        return {
+            "title": "Конкурент",
+            "h1": "Доставка цветов",
+            "first_paragraph": "Доставляем букеты по всему городу за два часа.",
+            "full_text": "Доставляем букеты по всему городу за два часа. " * 200,
+            "tier": "http",
+            "error": None,
+        }
+
+
+class SlowModel:
+    async def analyze_text_async(self, text):
+        await asyncio.sleep(0.3)
+        return CompetitorAnalysis(summary="Сильный сервис доставки")
+
+
+def test_deep_stream_sends_parsed_before_analysis(tmp_path, monkeypatch):
+    # history.json ищется в текущем каталоге: не трогаем файл проекта
+    monkeypatch.chdir(tmp_path)
+    service = AnalysisService(
+        openai=SlowModel(),
+        parser=StubParser(),
+        history=HistoryService(db_path=str(tmp_path / "history.db"), retention_days=0),
+        images=object(),
+    )
+
+    async def scenario():
+        started = time.perf_counter()
+        events = []
+        async for event in service.stream_parse("https://example.test/", deep=True):
+            events.append((event["event"], time.perf_counter() - started))
+        return events
+
+    events = asyncio.run(scenario())
+    names = [name for name, _ in events]
+    assert names[0] == "parsed"
+    assert names[-1] == "done"
+    assert "section" in names
+    # "parsed" приходит, не дожидаясь анализа фрагментов
+    assert events[0][1] < 0.2
+    assert events[-1][1] >= 0.3